@@ -3,6 +3,7 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
 
@@ -11,6 +12,15 @@ load_dotenv()
 
 # Import models
 from app.models import db
+from app.database import profile_settings, engine_options
+from app.cache import catalog_cache
+from app.featured import featured_products
+from app.forecast import inventory_forecast
+from app.passwords import password_hasher
+from app.identity import customer_cache, load_identity, identity_error
+from app.revocation import token_revocations, revoked_token_error
+from app.throttle import login_throttle
+from app.reviews import review_cache
 
 # Initialize extensions
 migrate = Migrate()
@@ -30,21 +40,113 @@ def create_app():
     db_host = os.getenv('DB_HOST', 'localhost')
     db_name = os.getenv('DB_NAME', 'mochamagic')
     
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}'
+    # DATABASE_URL replaces the MySQL URL (e.g. sqlite:///bench.db for local
+    # benchmarks); DB_PROFILE (development/testing/production, defaulting to
+    # FLASK_ENV, else production) picks SQL echo and pool settings, and the
+    # variables in ENV_OVERRIDES (app/database.py) override single ones
+    database_url = os.getenv('DATABASE_URL') or f'mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}'
+    db_settings = profile_settings(os.getenv('DB_PROFILE') or os.getenv('FLASK_ENV') or 'production', os.environ)
+    app.config['DB_PROFILE'] = db_settings['profile']
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url, db_settings)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ECHO'] = True  # Log SQL queries (disable in production)
+    app.config['SQLALCHEMY_ECHO'] = db_settings['echo']  # Logs every statement (development only)
+    
+    # Seconds a cached catalog snapshot may be served before it is rebuilt
+    app.config['CATALOG_CACHE_TTL'] = int(os.getenv('CATALOG_CACHE_TTL', 60))
+    
+    # Page size for list endpoints when the client sends no ?limit=
+    app.config['PAGINATION_DEFAULT_LIMIT'] = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 50))
+    app.config['PAGINATION_MAX_LIMIT'] = int(os.getenv('PAGINATION_MAX_LIMIT', 200))
+    
+    # Idempotency-Key handling for POST /api/orders (seconds)
+    app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+    app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    app.config['IDEMPOTENCY_POLL_INTERVAL'] = 0.05
+    app.config['IDEMPOTENCY_PURGE_INTERVAL'] = 300
+    
+    # Largest batch accepted by POST /api/orders/batch
+    app.config['ORDER_BATCH_MAX_SIZE'] = int(os.getenv('ORDER_BATCH_MAX_SIZE', 500))
+    # Oldest order_date a POS terminal may send for an order queued offline (hours)
+    app.config['ORDER_BATCH_MAX_AGE_HOURS'] = float(os.getenv('ORDER_BATCH_MAX_AGE_HOURS', 72))
+    
+    # Featured products: decayed sales ranking, recomputed in the background
+    app.config['FEATURED_WINDOW_DAYS'] = int(os.getenv('FEATURED_WINDOW_DAYS', 7))
+    app.config['FEATURED_HALF_LIFE_DAYS'] = float(os.getenv('FEATURED_HALF_LIFE_DAYS', 2))
+    app.config['FEATURED_REFRESH_INTERVAL'] = int(os.getenv('FEATURED_REFRESH_INTERVAL', 300))
+    
+    # Co-purchase recommendations kept per product (see build_recommendations.py)
+    app.config['RECOMMENDATIONS_TOP_K'] = int(os.getenv('RECOMMENDATIONS_TOP_K', 10))
+    
+    # Stock forecast: weeks of history, lead time for reorder points, and how
+    # long (seconds) a demand profile is reused
+    app.config['FORECAST_HISTORY_WEEKS'] = int(os.getenv('FORECAST_HISTORY_WEEKS', 4))
+    app.config['FORECAST_LEAD_TIME_HOURS'] = int(os.getenv('FORECAST_LEAD_TIME_HOURS', 24))
+    app.config['FORECAST_REFRESH_INTERVAL'] = int(os.getenv('FORECAST_REFRESH_INTERVAL', 300))
+    
+    # bcrypt cost for new hashes (older hashes are upgraded on login) and the
+    # process pool that runs it
+    app.config['BCRYPT_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+    app.config['PASSWORD_POOL_WORKERS'] = int(os.getenv('PASSWORD_POOL_WORKERS', os.cpu_count() or 2))
+    app.config['PASSWORD_POOL_QUEUE'] = int(os.getenv('PASSWORD_POOL_QUEUE', 2 * app.config['PASSWORD_POOL_WORKERS']))
+    
+    # Login attempts allowed per window, counted before any query or bcrypt
+    # work (set LOGIN_THROTTLE_REDIS_URL to share the counts between workers)
+    app.config['LOGIN_THROTTLE_WINDOW'] = int(os.getenv('LOGIN_THROTTLE_WINDOW', 60))
+    app.config['LOGIN_THROTTLE_PER_ACCOUNT'] = int(os.getenv('LOGIN_THROTTLE_PER_ACCOUNT', 5))
+    app.config['LOGIN_THROTTLE_PER_IP'] = int(os.getenv('LOGIN_THROTTLE_PER_IP', 30))
+    app.config['LOGIN_THROTTLE_MAX_KEYS'] = int(os.getenv('LOGIN_THROTTLE_MAX_KEYS', 100000))
+    app.config['LOGIN_THROTTLE_REDIS_URL'] = os.getenv('LOGIN_THROTTLE_REDIS_URL')
+    
+    # The throttle counts attempts per client IP (request.remote_addr). Behind
+    # a reverse proxy that is the proxy's address, so set TRUSTED_PROXY_HOPS
+    # to the number of proxies in front of the app to read the client IP from
+    # X-Forwarded-For; leave it at 0 when clients connect directly, or they
+    # could spoof the header
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+    if app.config['TRUSTED_PROXY_HOPS']:
+        hops = app.config['TRUSTED_PROXY_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    
+    # Ledger rows between reward balance snapshots (reconcile_rewards.py)
+    app.config['REWARD_SNAPSHOT_EVERY'] = int(os.getenv('REWARD_SNAPSHOT_EVERY', 100))
+    
+    # Reward points expire this many months after they are earned; tiers
+    # follow spend over the last TIER_WINDOW_MONTHS (expire_points.py)
+    app.config['POINTS_EXPIRY_MONTHS'] = int(os.getenv('POINTS_EXPIRY_MONTHS', 12))
+    app.config['TIER_WINDOW_MONTHS'] = int(os.getenv('TIER_WINDOW_MONTHS', 12))
+    
+    # Seconds a product's first review page and rating stats are cached
+    app.config['REVIEW_CACHE_TTL'] = int(os.getenv('REVIEW_CACHE_TTL', 30))
+    
+    # Seconds a customer's profile fields may be served from the identity cache
+    app.config['CUSTOMER_CACHE_TTL'] = int(os.getenv('CUSTOMER_CACHE_TTL', 30))
     
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    jwt.user_lookup_loader(load_identity)
+    jwt.user_lookup_error_loader(identity_error)
+    jwt.token_in_blocklist_loader(token_revocations.is_revoked)
+    jwt.revoked_token_loader(revoked_token_error)
+    token_revocations.init_app(app)
+    customer_cache.init_app(app)
+    catalog_cache.init_app(app)
+    review_cache.init_app(app)
+    featured_products.init_app(app)
+    inventory_forecast.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
     
     # Enable CORS for frontend
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:3000", "http://127.0.0.1:5500"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+            "expose_headers": ["Idempotent-Replayed"]
         }
     })
     
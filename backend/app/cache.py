@@ -0,0 +1,123 @@
+# app/cache.py
+import threading
+import time
+from app.models import db, Product, Category
+from app.search import SearchIndex
+
+
+class CatalogCache:
+    """
+    In-process cache of the serialized product catalog
+    - One snapshot per worker, rebuilt lazily on the first read after a change
+    - Admin writes call invalidate() which bumps the version
+    - Review writes only patch the product's rating fields in place
+      (refresh_ratings), so they do not force a rebuild
+    - Snapshots also expire after CATALOG_CACHE_TTL seconds so stock levels
+      and writes made by other workers are picked up
+    - Each snapshot carries the product search index built from it
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('CATALOG_CACHE_TTL', self.ttl)
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot['version'] == self.version
+            and time.monotonic() - snapshot['built_at'] < self.ttl
+        )
+
+    def get(self):
+        """Return the current catalog snapshot, rebuilding it if stale"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            with self._lock:
+                self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Another thread may have rebuilt it while we waited for the lock
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            snapshot = self._build(self.version)
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Drop the current snapshot (call after committing a catalog write)"""
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def refresh_ratings(self, product_id):
+        """
+        Re-read one product's rating aggregates into the current snapshot
+        (call after committing a review write); names and descriptions are
+        unchanged, so the search index stays valid
+        """
+        product = db.session.get(Product, product_id, populate_existing=True)
+        if product is None:
+            return
+        ratings = product.rating_dict()
+
+        # Under the lock so a rebuild running now is patched once it lands
+        with self._lock:
+            snapshot = self._snapshot
+            cached = snapshot['products_by_id'].get(product_id) if snapshot else None
+            if cached is not None:
+                cached.update(ratings)
+
+    def stats(self):
+        snapshot = self._snapshot
+        total = self.hits + self.misses
+        return {
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0,
+            'ttl': self.ttl,
+            'age_seconds': round(time.monotonic() - snapshot['built_at'], 2) if snapshot else None,
+            'product_count': len(snapshot['products']) if snapshot else 0,
+            'search_terms': len(snapshot['search'].terms) if snapshot else 0
+        }
+
+    def _build(self, version):
+        products = Product.eager_query().order_by(Product.product_id).all()
+        categories = Category.query.order_by(Category.category_id).all()
+
+        product_dicts = [product.to_dict() for product in products]
+
+        by_category = {}
+        for product in product_dicts:
+            by_category.setdefault(product['category_id'], []).append(product)
+
+        # Featured: top 8 in-stock products by stock level
+        in_stock = [p for p in product_dicts if (p['stock_quantity'] or 0) > 0]
+        featured = sorted(in_stock, key=lambda p: p['stock_quantity'], reverse=True)[:8]
+
+        return {
+            'version': version,
+            'built_at': time.monotonic(),
+            'products': product_dicts,
+            'products_by_id': {p['product_id']: p for p in product_dicts},
+            'products_by_category': by_category,
+            'categories': [category.to_dict() for category in categories],
+            'categories_by_id': {c.category_id: c.to_dict() for c in categories},
+            'featured': featured,
+            'search': SearchIndex(product_dicts)
+        }
+
+
+catalog_cache = CatalogCache()
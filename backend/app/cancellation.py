@@ -0,0 +1,100 @@
+# app/cancellation.py
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.orm import selectinload
+from app.models import db, Orders, OrderDetails, Payment, Customer, RewardTransaction
+from app.identity import customer_cache
+from app.inventory import restock
+from app.rollup import move_orders
+
+
+class CancellationConflict(RuntimeError):
+    """Raised when an order stopped being Pending while it was being cancelled"""
+
+
+def lock_pending_orders(query):
+    """Lock the Pending orders selected by query, with their payments loaded"""
+    return query.filter(Orders.status == 'Pending')\
+                .options(selectinload(Orders.payment))\
+                .order_by(Orders.order_id)\
+                .with_for_update()\
+                .all()
+
+
+def cancel_orders(orders):
+    """
+    Cancel Pending orders as a set, inside the caller's transaction
+    - One UPDATE ... CASE restocks every product across all orders
+    - One UPDATE ... CASE takes the earned points back per customer (never below 0)
+    - Order/payment statuses, ledger rows and rollups are written in bulk
+    The caller commits, or rolls back on CancellationConflict
+    """
+    if not orders:
+        return
+
+    order_ids = [order.order_id for order in orders]
+
+    # Conditional on Pending so a concurrent cancel/complete cannot be applied twice;
+    # this also takes the order row locks before anything else is touched
+    result = db.session.execute(
+        update(Orders)
+        .where(Orders.order_id.in_(order_ids), Orders.status == 'Pending')
+        .values(status='Cancelled')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(order_ids):
+        raise CancellationConflict('Some orders are no longer pending')
+
+    # Restock all lines of all orders at once
+    quantities = dict(
+        db.session.query(OrderDetails.product_id, func.sum(OrderDetails.quantity))
+                  .filter(OrderDetails.order_id.in_(order_ids))
+                  .group_by(OrderDetails.product_id)
+                  .all()
+    )
+    restock({product_id: int(quantity) for product_id, quantity in quantities.items()})
+
+    # Loaded objects still say Pending (synchronize_session=False), which is
+    # the status the rollups move the totals away from
+    move_orders(orders, 'Cancelled')
+
+    db.session.execute(
+        update(Payment)
+        .where(Payment.order_id.in_(order_ids))
+        .values(status='Refunded')
+        .execution_options(synchronize_session=False)
+    )
+
+    # Deduct the points each order earned (1 point per 100 PKR)
+    deductions = {}
+    ledger_rows = []
+    for order in orders:
+        points = int(order.total_amount / 100)
+        if points <= 0:
+            continue
+        deductions[order.customer_id] = deductions.get(order.customer_id, 0) + points
+        ledger_rows.append({
+            'customer_id': order.customer_id,
+            'order_id': order.order_id,
+            'entry_type': 'reversal',
+            'points_earned': 0,
+            'points_redeemed': points,
+            'description': f'Points deducted due to Order #{order.order_id} cancellation'
+        })
+
+    if deductions:
+        deduction = case(deductions, value=Customer.customer_id)
+        db.session.execute(
+            update(Customer)
+            .where(Customer.customer_id.in_(list(deductions)))
+            .values(reward_points=case(
+                (Customer.reward_points > deduction, Customer.reward_points - deduction),
+                else_=0
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(insert(RewardTransaction), ledger_rows)
+        customer_cache.invalidate_on_commit(*deductions)
+
+    # Keep the loaded objects in step with what was written
+    for order in orders:
+        db.session.expire(order)
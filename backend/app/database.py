@@ -0,0 +1,202 @@
+# app/database.py
+import threading
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+# Engine defaults per profile. Each server process has its own pool, so
+# processes x (pool_size + max_overflow) must stay below MySQL's
+# max_connections (151 by default)
+PROFILES = {
+    'development': {
+        'echo': True,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+        'connect_timeout': 10
+    },
+    'testing': {
+        'echo': False,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 5,
+        'pool_recycle': 3600,
+        'pool_pre_ping': False,
+        'connect_timeout': 5
+    },
+    'production': {
+        'echo': False,
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,  # well under MySQL's wait_timeout
+        'pool_pre_ping': True,
+        'connect_timeout': 5
+    }
+}
+PROFILE_ALIASES = {'dev': 'development', 'test': 'testing', 'prod': 'production'}
+
+
+def _flag(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Environment variables that override single profile settings
+ENV_OVERRIDES = (
+    ('echo', 'SQLALCHEMY_ECHO', _flag),
+    ('pool_size', 'DB_POOL_SIZE', int),
+    ('max_overflow', 'DB_MAX_OVERFLOW', int),
+    ('pool_timeout', 'DB_POOL_TIMEOUT', int),
+    ('pool_recycle', 'DB_POOL_RECYCLE', int),
+    ('pool_pre_ping', 'DB_POOL_PRE_PING', _flag),
+    ('connect_timeout', 'DB_CONNECT_TIMEOUT', int)
+)
+
+# Upper bounds (ms) of the checkout wait histogram; slower waits go to 'inf'
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def profile_settings(name, environ=None):
+    """
+    A profile's settings (accepts dev/test/prod too) with any ENV_OVERRIDES
+    found in environ applied
+    """
+    name = PROFILE_ALIASES.get(name, name)
+    if name not in PROFILES:
+        raise ValueError(f'Unknown database profile: {name} (use one of {", ".join(PROFILES)})')
+    settings = dict(PROFILES[name], profile=name)
+    for key, variable, cast in ENV_OVERRIDES:
+        if (environ or {}).get(variable):
+            settings[key] = cast(environ[variable])
+    return settings
+
+
+def engine_options(uri, settings):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the URI from profile settings
+    - Pools with a fixed size use MeteredQueuePool so checkouts are measured
+    - In-memory SQLite keeps Flask-SQLAlchemy's single shared connection,
+      which takes no sizing options
+    """
+    url = make_url(uri)
+    options = {
+        'pool_pre_ping': settings['pool_pre_ping'],
+        'pool_recycle': settings['pool_recycle']
+    }
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=settings['pool_size'],
+        max_overflow=settings['max_overflow'],
+        pool_timeout=settings['pool_timeout']
+    )
+    if url.get_backend_name() == 'mysql':
+        options['connect_args'] = {'connect_timeout': settings['connect_timeout']}
+    return options
+
+
+class PoolMetrics:
+    """
+    Per-worker counters for connection pool checkouts
+    - wait is the time spent in the pool's checkout, including opening a
+      new connection when the pool grows
+    - A checkout is saturated when it took the last connection the pool
+      may hand out (pool_size + max_overflow); timeouts are checkouts that
+      gave up after pool_timeout
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.saturated = 0
+            self.timeouts = 0
+            self.peak_checked_out = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_checkout(self, wait, checked_out, capacity):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.buckets[self._bucket(wait)] += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            if capacity is not None and checked_out >= capacity:
+                self.saturated += 1
+
+    def record_timeout(self, wait):
+        with self._lock:
+            self.timeouts += 1
+            self.max_wait = max(self.max_wait, wait)
+            self.buckets[self._bucket(wait)] += 1
+
+    def _bucket(self, wait):
+        wait_ms = wait * 1000
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                return i
+        return len(WAIT_BUCKETS_MS)
+
+    def stats(self, engine=None):
+        with self._lock:
+            stats = {
+                'checkouts': self.checkouts,
+                'saturated_checkouts': self.saturated,
+                'timeouts': self.timeouts,
+                'peak_checked_out': self.peak_checked_out,
+                'avg_wait_ms': round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'wait_histogram_ms': [
+                    {'le': bound, 'count': count}
+                    for bound, count in zip(WAIT_BUCKETS_MS + ('inf',), self.buckets)
+                ]
+            }
+
+        pool = engine.pool if engine is not None else None
+        if isinstance(pool, QueuePool):
+            capacity = pool_capacity(pool)
+            stats.update(
+                pool_size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                saturation=round(pool.checkedout() / capacity, 4) if capacity else None
+            )
+        elif pool is not None:
+            stats['pool_class'] = type(pool).__name__
+        return stats
+
+
+def pool_capacity(pool):
+    """Most connections the pool hands out at once (None when unbounded)"""
+    if pool._max_overflow < 0:
+        return None
+    return pool.size() + pool._max_overflow
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records every checkout in pool_metrics"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            pool_metrics.record_timeout(time.perf_counter() - started)
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started, self.checkedout(), pool_capacity(self))
+        return connection
+
+
+pool_metrics = PoolMetrics()
@@ -0,0 +1,133 @@
+# app/featured.py
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import db, DailySalesRollup
+
+
+class FeaturedProducts:
+    """
+    Products ranked by recent sales velocity, refreshed in the background
+    - Score: units sold on each of the last FEATURED_WINDOW_DAYS days, each
+      day weighted by 0.5 ** (age / FEATURED_HALF_LIFE_DAYS); cancelled
+      orders do not count
+    - Read from the daily sales rollups, so a refresh is one small query
+    - A daemon thread per worker recomputes the ranking every
+      FEATURED_REFRESH_INTERVAL seconds; reads only return the last ranking
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.window_days = 7
+        self.half_life_days = 2.0
+        self.interval = 300
+        self.refreshed_at = None
+        self._ranking = None
+        self._app = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self.size = app.config.setdefault('FEATURED_SIZE', self.size)
+        self.window_days = app.config.setdefault('FEATURED_WINDOW_DAYS', self.window_days)
+        self.half_life_days = app.config.setdefault('FEATURED_HALF_LIFE_DAYS', self.half_life_days)
+        self.interval = app.config.setdefault('FEATURED_REFRESH_INTERVAL', self.interval)
+
+    def compute(self, today=None):
+        """Return [(product_id, score), ...], best selling first"""
+        today = today or datetime.utcnow().date()  # Rollup dates are UTC days
+        first_day = today - timedelta(days=self.window_days - 1)
+
+        rows = db.session.query(
+            DailySalesRollup.rollup_date,
+            DailySalesRollup.product_id,
+            func.sum(DailySalesRollup.quantity)
+        ).filter(
+            DailySalesRollup.rollup_date >= first_day,
+            DailySalesRollup.rollup_date <= today,
+            DailySalesRollup.status != 'Cancelled'
+        ).group_by(DailySalesRollup.rollup_date, DailySalesRollup.product_id)\
+         .all()
+
+        scores = {}
+        for rollup_date, product_id, quantity in rows:
+            weight = 0.5 ** ((today - rollup_date).days / self.half_life_days)
+            scores[product_id] = scores.get(product_id, 0) + int(quantity or 0) * weight
+
+        ranking = sorted(
+            ((pid, round(score, 4)) for pid, score in scores.items() if score > 0),
+            key=lambda item: (-item[1], item[0])
+        )
+        # Keep some spares for products that have since gone out of stock
+        return ranking[:self.size * 4]
+
+    def refresh(self):
+        """Recompute the ranking now (needs an app context)"""
+        ranking = self.compute()
+        self._ranking = ranking
+        self.refreshed_at = time.time()
+        return ranking
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    db.session.rollback()
+                    self._app.logger.exception('Featured products refresh failed')
+
+    def _start(self):
+        with self._lock:
+            if self._ranking is not None:
+                return
+            # First read in this worker: compute synchronously, then hand over
+            # to the background thread
+            self.refresh()
+            if self.interval and self._app is not None:
+                self._thread = threading.Thread(target=self._run, name='featured-refresh', daemon=True)
+                self._thread.start()
+
+    def ranking(self):
+        """The precomputed ranking; only the first call in a worker queries"""
+        if self._ranking is None:
+            self._start()
+        return self._ranking
+
+    def pick(self, catalog):
+        """
+        Up to `size` in-stock product dicts from a catalog snapshot, best
+        selling first, topped up with the catalog's stock-based fallback
+        """
+        products_by_id = catalog['products_by_id']
+        featured = []
+        for product_id, _ in self.ranking():
+            product = products_by_id.get(product_id)
+            if product and (product['stock_quantity'] or 0) > 0:
+                featured.append(product)
+                if len(featured) == self.size:
+                    return featured
+
+        chosen = {p['product_id'] for p in featured}
+        for product in catalog['featured']:
+            if len(featured) == self.size:
+                break
+            if product['product_id'] not in chosen:
+                featured.append(product)
+        return featured
+
+    def stats(self):
+        return {
+            'refreshed_at': self.refreshed_at,
+            'interval': self.interval,
+            'window_days': self.window_days,
+            'half_life_days': self.half_life_days,
+            'ranked_products': len(self._ranking) if self._ranking is not None else 0,
+            'top': (self._ranking or [])[:self.size]
+        }
+
+
+featured_products = FeaturedProducts()
@@ -0,0 +1,186 @@
+# app/forecast.py
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, select
+from app.models import db, Orders, OrderDetails, Product
+from app.reports import date_bucket
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def _hour_slot(hours):
+    """Hour-of-week (Monday 00:00 = 0) for hours counted from the Unix epoch"""
+    weekday = (hours // 24 + 3) % 7  # 1970-01-01 was a Thursday
+    return weekday * 24 + hours % 24
+
+
+class InventoryForecast:
+    """
+    Predicts when each product runs out of stock
+    - Demand is profiled per product and hour of the week (168 slots) from
+      the last FORECAST_HISTORY_WEEKS weeks of non-cancelled order lines
+    - Each slot is exponentially smoothed across weeks (the most recent
+      week weighs most), giving a mean and variance per slot
+    - Projecting the profile forward from now gives hours to stockout, a
+      reorder point (lead time demand + safety stock) and an order size
+    - The profile is cached for FORECAST_REFRESH_INTERVAL seconds; stock
+      levels are read fresh on every call
+    """
+
+    def __init__(self):
+        self.history_weeks = 4
+        self.smoothing = 0.5
+        self.horizon_hours = HOURS_PER_WEEK
+        self.lead_time_hours = 24
+        self.service_z = 1.65
+        self.interval = 300
+        self._profile = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.history_weeks = config.setdefault('FORECAST_HISTORY_WEEKS', self.history_weeks)
+        self.smoothing = config.setdefault('FORECAST_SMOOTHING', self.smoothing)
+        self.horizon_hours = config.setdefault('FORECAST_HORIZON_HOURS', self.horizon_hours)
+        self.lead_time_hours = config.setdefault('FORECAST_LEAD_TIME_HOURS', self.lead_time_hours)
+        self.service_z = config.setdefault('FORECAST_SERVICE_Z', self.service_z)
+        self.interval = config.setdefault('FORECAST_REFRESH_INTERVAL', self.interval)
+
+    def _hourly_sales(self, now):
+        """(product_ids, hours since epoch, quantities) arrays, one entry per product and hour"""
+        since = now - timedelta(weeks=self.history_weeks)
+        hour = date_bucket(Orders.order_date, 'hour')
+        rows = db.session.execute(
+            select(OrderDetails.product_id, hour, func.sum(OrderDetails.quantity))
+            .join(Orders, Orders.order_id == OrderDetails.order_id)
+            .where(Orders.order_date >= since, Orders.status != 'Cancelled')
+            .group_by(OrderDetails.product_id, hour)
+        ).all()
+
+        product_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        hours = np.array([row[1].replace(' ', 'T') for row in rows], dtype='datetime64[h]').astype(np.int64)
+        quantities = np.fromiter((row[2] or 0 for row in rows), dtype=np.float64, count=len(rows))
+        return product_ids, hours, quantities
+
+    def build_profile(self, now=None):
+        """Smoothed demand mean and variance per product and hour of week"""
+        now = now or datetime.utcnow()
+        now_hour = np.datetime64(now, 'h').astype(np.int64)
+        product_ids, hours, quantities = self._hourly_sales(now)
+
+        # Rolling weeks back from now, so every slot is seen once per week
+        weeks = (now_hour - hours) // HOURS_PER_WEEK
+        recent = (weeks >= 0) & (weeks < self.history_weeks)
+        product_ids, hours, quantities, weeks = product_ids[recent], hours[recent], quantities[recent], weeks[recent]
+
+        # Each (product, hour) appears once, so weighted moments can be summed
+        # straight into product x slot arrays (E[x] and E[x^2] across weeks)
+        weights = self.smoothing * (1 - self.smoothing) ** np.arange(self.history_weeks)
+        weights /= weights.sum()
+        ids, index = np.unique(product_ids, return_inverse=True)
+        slots = _hour_slot(hours)
+        mean = np.zeros((len(ids), HOURS_PER_WEEK))
+        second_moment = np.zeros((len(ids), HOURS_PER_WEEK))
+        np.add.at(mean, (index, slots), weights[weeks] * quantities)
+        np.add.at(second_moment, (index, slots), weights[weeks] * quantities ** 2)
+        variance = np.maximum(second_moment - mean ** 2, 0)
+
+        return {
+            'built_at': time.monotonic(),
+            'now_hour': int(now_hour),
+            'index': {int(pid): i for i, pid in enumerate(ids)},
+            'mean': mean,
+            'variance': variance
+        }
+
+    def profile(self):
+        profile = self._profile
+        if profile is None or time.monotonic() - profile['built_at'] >= self.interval:
+            with self._lock:
+                profile = self._profile
+                if profile is None or time.monotonic() - profile['built_at'] >= self.interval:
+                    profile = self.build_profile()
+                    self._profile = profile
+        return profile
+
+    def invalidate(self):
+        self._profile = None
+
+    def forecast(self, now=None):
+        """One forecast dict per product, soonest stockout first"""
+        now = now or datetime.utcnow()
+        profile = self.profile()
+        products = db.session.execute(
+            select(Product.product_id, Product.name, Product.stock_quantity).order_by(Product.product_id)
+        ).all()
+        if not products:
+            return []
+
+        # Only products with recent sales need the projection
+        rows = np.array([profile['index'].get(p.product_id, -1) for p in products])
+        sold = np.flatnonzero(rows >= 0)
+        mean = profile['mean'][rows[sold]]
+        variance = profile['variance'][rows[sold]]
+        stock = np.array([max(products[i].stock_quantity or 0, 0) for i in sold], dtype=np.float64)
+
+        # Hour-of-week slots from the current hour to the end of the horizon
+        start = _hour_slot(np.datetime64(now, 'h').astype(np.int64))
+        slots = (start + np.arange(self.horizon_hours)) % HOURS_PER_WEEK
+        hourly = mean[:, slots]
+        cumulative = np.cumsum(hourly, axis=1)
+
+        # First hour whose cumulative demand uses up the stock, interpolated
+        runs_out = cumulative >= stock[:, None]
+        stocks_out = runs_out.any(axis=1)
+        hour = runs_out.argmax(axis=1)
+        picked = np.arange(len(sold))
+        demand_then = hourly[picked, hour]
+        before = cumulative[picked, hour] - demand_then
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(demand_then > 0, (stock - before) / demand_then, 0)
+        # Slots start on the hour; count from now instead
+        elapsed = now.minute / 60 + now.second / 3600
+        hours_to_stockout = np.where(stock <= 0, 0, np.maximum(hour + np.clip(fraction, 0, 1) - elapsed, 0))
+
+        lead = min(self.lead_time_hours, self.horizon_hours)
+        lead_demand = cumulative[:, lead - 1] if lead else np.zeros(len(sold))
+        safety_stock = self.service_z * np.sqrt(variance[:, slots[:lead]].sum(axis=1))
+        reorder_point = np.ceil(lead_demand + safety_stock)
+        order_quantity = np.ceil(np.maximum(cumulative[:, -1] + safety_stock - stock, 0))
+        daily_demand = mean.sum(axis=1) / 7
+
+        results = []
+        for product in products:
+            results.append({
+                'product_id': product.product_id,
+                'name': product.name,
+                'stock_quantity': product.stock_quantity,
+                'daily_demand': 0.0,
+                'lead_time_demand': 0.0,
+                'hours_to_stockout': 0.0 if (product.stock_quantity or 0) <= 0 else None,
+                'stockout_at': None,
+                'reorder_point': 0,
+                'needs_reorder': False,
+                'suggested_order_quantity': 0
+            })
+        for j, i in enumerate(sold):
+            stockout_hours = round(float(hours_to_stockout[j]), 1) if stocks_out[j] else None
+            results[i].update({
+                'daily_demand': round(float(daily_demand[j]), 2),
+                'lead_time_demand': round(float(lead_demand[j]), 2),
+                'hours_to_stockout': stockout_hours,
+                'reorder_point': int(reorder_point[j]),
+                'needs_reorder': bool(stock[j] <= reorder_point[j]),
+                'suggested_order_quantity': int(order_quantity[j])
+            })
+        for result in results:
+            if result['hours_to_stockout'] is not None:
+                result['stockout_at'] = (now + timedelta(hours=result['hours_to_stockout'])).isoformat()
+
+        results.sort(key=lambda r: (r['hours_to_stockout'] is None, r['hours_to_stockout'] or 0, r['product_id']))
+        return results
+
+
+inventory_forecast = InventoryForecast()
@@ -0,0 +1,214 @@
+# app/idempotency.py
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, current_app, make_response, g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app.models import db, IdempotencyRecord
+
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def _request_hash():
+    """Fingerprint of the request so a key cannot be reused for a different body"""
+    body = request.get_json(silent=True)
+    if body is None:
+        payload = request.get_data()
+    else:
+        payload = json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+def _claim(scope, key, request_hash):
+    """Insert a Processing record; returns True if this request now owns the key"""
+    now = datetime.utcnow()
+    db.session.add(IdempotencyRecord(
+        scope=scope,
+        idempotency_key=key,
+        request_hash=request_hash,
+        status='Processing',
+        created_at=now,
+        expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _load(scope, key):
+    """
+    The record as it is now, detached with its fields loaded, or None if
+    there is none; later reads of it never go back to the database (where
+    the row may have been released since)
+    """
+    record = db.session.get(IdempotencyRecord, (scope, key), populate_existing=True)
+    if record is not None:
+        db.session.expunge(record)  # The rollback would otherwise expire its fields
+    db.session.rollback()  # End the read so the next poll sees fresh data
+    return record
+
+
+def _release(scope, key, created_at=None):
+    """Delete a record so the key can be used again"""
+    query = IdempotencyRecord.query.filter_by(scope=scope, idempotency_key=key)
+    if created_at is not None:
+        # Only remove the exact record we looked at, not one re-claimed since
+        query = query.filter(IdempotencyRecord.created_at == created_at)
+    query.delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _store(scope, key, response):
+    """Mark the record Completed with the response, in the current transaction"""
+    IdempotencyRecord.query.filter_by(scope=scope, idempotency_key=key).update({
+        'status': 'Completed',
+        'response_code': response.status_code,
+        'response_body': response.get_data(as_text=True)
+    }, synchronize_session=False)
+
+
+def complete_request(response):
+    """
+    Store the response for the request's Idempotency-Key in the handler's
+    open transaction, so the record commits (or rolls back) together with
+    the handler's writes; call right before the handler commits. Does
+    nothing for requests sent without a key
+    """
+    claim = g.get('idempotency_claim')
+    if claim is not None:
+        _store(*claim, response)
+        g.idempotency_stored = True
+    return response
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record.response_body,
+        status=record.response_code,
+        mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def purge_expired():
+    """Delete expired records, at most once per IDEMPOTENCY_PURGE_INTERVAL per worker"""
+    global _last_purge
+    interval = current_app.config['IDEMPOTENCY_PURGE_INTERVAL']
+    if time.monotonic() - _last_purge < interval:
+        return
+    with _purge_lock:
+        if time.monotonic() - _last_purge < interval:
+            return
+        _last_purge = time.monotonic()
+
+    try:
+        IdempotencyRecord.query.filter(IdempotencyRecord.expires_at < datetime.utcnow())\
+                               .delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def idempotent(scope_name):
+    """
+    Decorator for POST handlers honouring the Idempotency-Key header
+    - The first request with a key runs the handler; a 2xx response is stored
+      (handlers that commit call complete_request() so the record is written
+      in the same transaction as their changes)
+    - Replays with the same key and body get the stored response back
+    - Duplicates arriving while the first is running wait for it to finish
+    - Reusing a key with a different body is rejected with 422
+    Use after @jwt_required() so keys are scoped to the caller
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return fn(*args, **kwargs)
+
+            if len(key) > 255:
+                return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+            config = current_app.config
+            scope = f'{scope_name}:{get_jwt_identity() or "anonymous"}'
+            request_hash = _request_hash()
+            deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_TIMEOUT']
+
+            while not _claim(scope, key, request_hash):
+                record = _load(scope, key)
+                if record is None:
+                    continue  # Released between our insert and read, try again
+
+                now = datetime.utcnow()
+                abandoned = (
+                    record.status == 'Processing'
+                    and record.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_TIMEOUT'])
+                )
+                if record.expires_at < now or abandoned:
+                    _release(scope, key, record.created_at)
+                    continue
+
+                if record.request_hash != request_hash:
+                    return jsonify({
+                        'error': 'Idempotency-Key was already used for a different request'
+                    }), 422
+
+                if record.status == 'Completed':
+                    return _replay(record)
+
+                if time.monotonic() >= deadline:
+                    return jsonify({
+                        'error': 'A request with this Idempotency-Key is still being processed'
+                    }), 409
+
+                time.sleep(config['IDEMPOTENCY_POLL_INTERVAL'])
+
+            purge_expired()
+
+            g.idempotency_claim = (scope, key)
+            g.idempotency_stored = False
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                _release(scope, key)
+                raise
+
+            if g.idempotency_stored and 200 <= response.status_code < 300:
+                return response
+
+            try:
+                if 200 <= response.status_code < 300:
+                    _store(scope, key, response)
+                    db.session.commit()
+                else:
+                    # Failed requests are not remembered so the client can retry
+                    db.session.rollback()
+                    _release(scope, key)
+            except Exception:
+                db.session.rollback()
+                # The handler's changes are already committed; a retry after
+                # IDEMPOTENCY_LOCK_TIMEOUT would run it again
+                current_app.logger.exception(
+                    'Could not store the response for Idempotency-Key %r (%s)', key, scope
+                )
+                return jsonify({
+                    'error': 'The request was processed but its Idempotency-Key could not be saved; '
+                             'check before retrying'
+                }), 500
+
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+# app/identity.py
+import threading
+import time
+from flask import current_app, jsonify
+from sqlalchemy import event
+from app.models import db, Customer, Admin
+
+
+class CustomerCache:
+    """
+    Short-lived per-worker cache of Customer.to_dict() (never the password hash)
+    - Read-only endpoints (profile, rewards balance) are served from here
+    - Writes call invalidate_on_commit(); the entry is dropped only once the
+      transaction commits
+    - Each invalidation stamps the customer with a new generation; a reader
+      captures generation() before loading the row and set() skips the
+      write if the customer was invalidated since, so a read that raced a
+      commit cannot re-cache the old row
+    - Entries expire after CUSTOMER_CACHE_TTL seconds, which bounds how long
+      writes made by other workers can go unseen
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generation = 0
+        self._invalidated = {}  # customer_id: generation of its last invalidation
+        self._floor = 0  # Highest generation dropped from _invalidated
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('CUSTOMER_CACHE_TTL', self.ttl)
+
+    def get(self, customer_id):
+        entry = self._entries.get(customer_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def generation(self):
+        """Pass to set() for data loaded after this call"""
+        return self._generation
+
+    def set(self, customer_id, data, generation):
+        with self._lock:
+            if self._invalidated.get(customer_id, self._floor) > generation:
+                return  # Invalidated while the data was being loaded
+            self._entries.pop(customer_id, None)
+            if len(self._entries) >= self.max_entries:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[customer_id] = (time.monotonic() + self.ttl, data)
+
+    def invalidate(self, customer_id):
+        with self._lock:
+            self._entries.pop(customer_id, None)
+            self._generation += 1
+            self._invalidated.pop(customer_id, None)
+            self._invalidated[customer_id] = self._generation
+            if len(self._invalidated) > self.max_entries:
+                # Forgetting the oldest stamp only makes set() more cautious
+                self._floor = self._invalidated.pop(next(iter(self._invalidated)))
+
+    def invalidate_on_commit(self, *customer_ids):
+        db.session.info.setdefault('stale_customers', set()).update(customer_ids)
+
+
+customer_cache = CustomerCache()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _drop_stale_customers(session):
+    for customer_id in session.info.pop('stale_customers', ()):
+        customer_cache.invalidate(customer_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_stale_customers(session):
+    session.info.pop('stale_customers', None)
+
+
+class CustomerIdentity:
+    """The customer behind the request's JWT (flask_jwt_extended.current_user)"""
+    is_admin = False
+
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        self._model = None
+        self._loaded = False
+        # Taken before the request reads anything, so it also covers a row
+        # loaded (or a transaction snapshot started) before profile() runs
+        self._generation = customer_cache.generation()
+
+    @property
+    def model(self):
+        """The Customer row, loaded at most once per request (None if deleted)"""
+        if not self._loaded:
+            self._model = db.session.get(Customer, self.customer_id)
+            self._loaded = True
+        return self._model
+
+    def profile(self):
+        """Customer.to_dict(), from the cache when fresh"""
+        data = customer_cache.get(self.customer_id)
+        if data is None and self.model is not None:
+            data = self.model.to_dict()
+            customer_cache.set(self.customer_id, data, self._generation)
+        return data
+
+
+class AdminIdentity:
+    """The admin behind the request's JWT (flask_jwt_extended.current_user)"""
+    is_admin = True
+
+    def __init__(self, admin_id):
+        self.admin_id = admin_id
+        self._model = None
+        self._loaded = False
+
+    @property
+    def model(self):
+        if not self._loaded:
+            self._model = db.session.get(Admin, self.admin_id)
+            self._loaded = True
+        return self._model
+
+
+def load_identity(jwt_header, jwt_data):
+    """
+    flask_jwt_extended user lookup: turn the token's identity into a
+    request-scoped identity object; rows are only queried when used
+    """
+    identity = str(jwt_data[current_app.config['JWT_IDENTITY_CLAIM']])
+    try:
+        if identity.startswith('admin_'):
+            return AdminIdentity(int(identity[len('admin_'):]))
+        return CustomerIdentity(int(identity))
+    except ValueError:
+        return None
+
+
+def identity_error(jwt_header, jwt_data):
+    return jsonify({'error': 'Invalid token identity'}), 401
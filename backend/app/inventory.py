@@ -0,0 +1,75 @@
+# app/inventory.py
+from sqlalchemy import case, update
+from app.models import db, Product
+
+
+def cart_quantities(items):
+    """
+    Collapse cart items into {product_id: total quantity}
+    Raises ValueError for missing ids or non-positive quantities
+    """
+    quantities = {}
+    for item in items:
+        if 'product_id' not in item:
+            raise ValueError('product_id is required for every item')
+        product_id = int(item['product_id'])
+        quantity = int(item.get('quantity', 1))
+        if quantity < 1:
+            raise ValueError('Quantity must be at least 1')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def lock_products(product_ids):
+    """
+    Load the products in one IN query, locking their rows (SELECT ... FOR UPDATE)
+    Rows are locked in product_id order so concurrent checkouts cannot deadlock
+    """
+    products = Product.query.filter(Product.product_id.in_(list(product_ids)))\
+                            .order_by(Product.product_id)\
+                            .with_for_update()\
+                            .all()
+    return {product.product_id: product for product in products}
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for {product_id: quantity} with a single conditional UPDATE
+    - Only rows that still have enough stock are touched
+    - Returns False if any product was short; the caller must roll back
+    """
+    if not quantities:
+        return True
+
+    delta = case(quantities, value=Product.product_id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.product_id.in_(list(quantities)), Product.stock_quantity >= delta)
+        .values(stock_quantity=Product.stock_quantity - delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+
+def find_shortage(quantities):
+    """Return (product, available) for the first product that cannot cover its quantity"""
+    products = Product.query.filter(Product.product_id.in_(list(quantities)))\
+                            .order_by(Product.product_id)\
+                            .all()
+    for product in products:
+        if (product.stock_quantity or 0) < quantities[product.product_id]:
+            return product, product.stock_quantity
+    return None, None
+
+
+def restock(quantities):
+    """Add {product_id: quantity} back to stock with a single UPDATE"""
+    if not quantities:
+        return
+
+    db.session.execute(
+        update(Product)
+        .where(Product.product_id.in_(list(quantities)))
+        .values(stock_quantity=Product.stock_quantity + case(quantities, value=Product.product_id))
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,221 @@
+# app/ledger.py
+from datetime import datetime
+from sqlalchemy import and_, case, func, insert, select, update
+from app.models import db, Customer, RewardTransaction, RewardSnapshot, JobCheckpoint
+from app.identity import customer_cache
+
+JOB_NAME = 'reward_reconcile'
+
+NET_POINTS = func.coalesce(RewardTransaction.points_earned, 0) - func.coalesce(RewardTransaction.points_redeemed, 0)
+
+
+def running_balances(customer_id, transactions):
+    """
+    {reward_id: balance after that transaction} for one page of a customer's
+    ledger, from the nearest snapshot before the page plus the rows between
+    """
+    if not transactions:
+        return {}
+    oldest = min(t.reward_id for t in transactions)
+    newest = max(t.reward_id for t in transactions)
+
+    snapshot = db.session.execute(
+        select(RewardSnapshot.last_reward_id, RewardSnapshot.balance)
+        .where(RewardSnapshot.customer_id == customer_id, RewardSnapshot.last_reward_id < oldest)
+        .order_by(RewardSnapshot.last_reward_id.desc())
+        .limit(1)
+    ).first()
+    after_id, balance = snapshot if snapshot else (0, 0)
+
+    # The page itself is re-read in ledger order, so a page sorted by
+    # date still gets balances that follow reward_id
+    rows = db.session.execute(
+        select(RewardTransaction.reward_id, NET_POINTS)
+        .where(
+            RewardTransaction.customer_id == customer_id,
+            RewardTransaction.reward_id > after_id,
+            RewardTransaction.reward_id <= newest
+        )
+        .order_by(RewardTransaction.reward_id)
+    ).all()
+
+    balances = {}
+    for reward_id, net in rows:
+        balance += net
+        balances[reward_id] = balance
+    return balances
+
+
+def _ledger_chunk(first_customer_id, last_customer_id, safe_reward_id):
+    """
+    One grouped query over a customer_id range: stored balance, latest
+    snapshot, net points of the ledger rows after it and how many of those
+    are settled (reward_id <= safe_reward_id)
+    """
+    latest = select(
+        RewardSnapshot.customer_id,
+        func.max(RewardSnapshot.last_reward_id).label('last_reward_id')
+    ).where(RewardSnapshot.customer_id.between(first_customer_id, last_customer_id))\
+     .group_by(RewardSnapshot.customer_id)\
+     .subquery()
+    snapshot = select(RewardSnapshot.customer_id, RewardSnapshot.last_reward_id, RewardSnapshot.balance)\
+        .join(latest, and_(
+            latest.c.customer_id == RewardSnapshot.customer_id,
+            latest.c.last_reward_id == RewardSnapshot.last_reward_id
+        )).subquery()
+
+    settled = RewardTransaction.reward_id <= safe_reward_id
+    return db.session.execute(
+        select(
+            Customer.customer_id,
+            func.coalesce(Customer.reward_points, 0),
+            func.coalesce(snapshot.c.last_reward_id, 0),
+            func.coalesce(snapshot.c.balance, 0),
+            func.coalesce(func.sum(NET_POINTS), 0),
+            func.count(case((settled, RewardTransaction.reward_id)))
+        )
+        .select_from(Customer)
+        .outerjoin(snapshot, snapshot.c.customer_id == Customer.customer_id)
+        .outerjoin(RewardTransaction, and_(
+            RewardTransaction.customer_id == Customer.customer_id,
+            RewardTransaction.reward_id > func.coalesce(snapshot.c.last_reward_id, 0)
+        ))
+        .where(Customer.customer_id.between(first_customer_id, last_customer_id))
+        .group_by(Customer.customer_id, Customer.reward_points, snapshot.c.last_reward_id, snapshot.c.balance)
+        .order_by(Customer.customer_id)
+    ).all()
+
+
+def _take_snapshots(due, safe_reward_id, snapshot_every, now):
+    """
+    Snapshot rows for customers with enough settled rows since their last
+    snapshot, one every snapshot_every rows so any history page is at most
+    that far from a snapshot
+    - due: {customer_id: (last snapshot reward_id, its balance)}
+    - Each ledger row is read here once, the first run it becomes settled
+    """
+    rows = db.session.execute(
+        select(RewardTransaction.customer_id, RewardTransaction.reward_id, NET_POINTS)
+        .where(
+            RewardTransaction.customer_id.in_(list(due)),
+            RewardTransaction.reward_id > min(last_id for last_id, balance in due.values()),
+            RewardTransaction.reward_id <= safe_reward_id
+        )
+        .order_by(RewardTransaction.customer_id, RewardTransaction.reward_id)
+    ).all()
+
+    snapshots = []
+    customer_id = None
+    for row_customer_id, reward_id, net in rows:
+        if row_customer_id != customer_id:
+            customer_id = row_customer_id
+            last_id, balance = due[customer_id]
+            count = 0
+        if reward_id <= last_id:
+            continue
+        balance += net
+        count += 1
+        if count % snapshot_every == 0:
+            snapshots.append({'customer_id': customer_id, 'last_reward_id': reward_id, 'balance': int(balance), 'taken_at': now})
+
+    if snapshots:
+        db.session.execute(insert(RewardSnapshot), snapshots)
+    return len(snapshots)
+
+
+def _fix_drift(drifted, now):
+    """
+    Set each drifted customer's balance to their ledger balance
+    - Guarded on the balance that was read, so a concurrent points change
+      wins and the customer is simply checked again next run
+    - A negative ledger (a cancellation deducted more than was left) gets
+      an adjustment row bringing it back to 0, which the balance then matches
+    Returns the number of balances updated
+    """
+    targets = {cid: max(ledger, 0) for cid, stored, ledger in drifted}
+    observed = {cid: stored for cid, stored, ledger in drifted}
+    result = db.session.execute(
+        update(Customer)
+        .where(
+            Customer.customer_id.in_(list(targets)),
+            func.coalesce(Customer.reward_points, 0) == case(observed, value=Customer.customer_id)
+        )
+        .values(reward_points=case(targets, value=Customer.customer_id))
+        .execution_options(synchronize_session=False)
+    )
+
+    adjustments = [{
+        'customer_id': cid,
+        'entry_type': 'adjustment',
+        'points_earned': -ledger,
+        'points_redeemed': 0,
+        'transaction_date': now,
+        'description': 'Reconciliation adjustment'
+    } for cid, stored, ledger in drifted if ledger < 0]
+    if adjustments:
+        db.session.execute(insert(RewardTransaction), adjustments)
+
+    customer_cache.invalidate_on_commit(*targets)
+    return result.rowcount
+
+
+def reconcile(fix=False, chunk_size=5000, snapshot_every=100, log=print):
+    """
+    Compare every Customer.reward_points with their ledger (earned minus
+    redeemed) and take new balance snapshots
+    - Customers are read in customer_id chunks, one grouped query and one
+      commit each; no ORM objects are loaded
+    - Ledger balance = latest snapshot + the rows after it
+    - Snapshots are taken every snapshot_every ledger rows; they only cover
+      rows up to the highest reward_id the previous run saw (kept in
+      JobCheckpoint), so a transaction that was still open then with a
+      lower reward_id has committed before its rows are snapshotted
+    - fix=True writes the ledger balance back (see _fix_drift)
+    Returns counts plus up to 100 drifted customers
+    """
+    now = datetime.utcnow()
+    checkpoint = db.session.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=JOB_NAME, last_id=0)
+        db.session.add(checkpoint)
+    safe_reward_id = checkpoint.last_id
+    high_water = db.session.execute(select(func.max(RewardTransaction.reward_id))).scalar() or 0
+
+    summary = {'customers': 0, 'drifted': 0, 'fixed': 0, 'snapshots': 0, 'drift': []}
+    after_customer_id = 0
+    while True:
+        chunk = select(Customer.customer_id)\
+            .where(Customer.customer_id > after_customer_id)\
+            .order_by(Customer.customer_id)\
+            .limit(chunk_size)\
+            .subquery()
+        last_customer_id = db.session.execute(select(func.max(chunk.c.customer_id))).scalar()
+        if last_customer_id is None:
+            break
+        rows = _ledger_chunk(after_customer_id + 1, last_customer_id, safe_reward_id)
+        after_customer_id = last_customer_id
+
+        drifted, due = [], {}
+        for customer_id, stored, last_id, base, tail, settled_count in rows:
+            ledger = int(base + tail)
+            if int(stored) != ledger:
+                drifted.append((customer_id, int(stored), ledger))
+            if settled_count >= snapshot_every:
+                due[customer_id] = (last_id, base)
+
+        snapshots = _take_snapshots(due, safe_reward_id, snapshot_every, now) if due else 0
+        if fix and drifted:
+            summary['fixed'] += _fix_drift(drifted, now)
+        db.session.commit()
+
+        summary['customers'] += len(rows)
+        summary['drifted'] += len(drifted)
+        summary['snapshots'] += snapshots
+        for customer_id, stored, ledger in drifted[:100 - len(summary['drift'])]:
+            summary['drift'].append({'customer_id': customer_id, 'reward_points': stored, 'ledger_balance': ledger})
+        log(f'Checked customers up to #{after_customer_id}: {len(drifted)} drifted, {snapshots} snapshots')
+
+    # The next run snapshots up to what this one saw
+    checkpoint.last_id = max(checkpoint.last_id, high_water)
+    db.session.commit()
+    return summary
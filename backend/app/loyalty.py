@@ -0,0 +1,193 @@
+# app/loyalty.py
+import calendar
+from datetime import datetime
+import numpy as np
+from sqlalchemy import and_, case, func, insert, select, update
+from sqlalchemy.orm import aliased
+from app.models import db, Customer, Orders, RewardTransaction, JobCheckpoint
+from app.identity import customer_cache
+
+JOB_NAME = 'points_expiry'
+
+# (tier, minimum spend in PKR over the tier window), lowest first
+TIERS = (
+    ('Bronze', 0),
+    ('Silver', 10000),
+    ('Gold', 25000),
+    ('Platinum', 50000)
+)
+
+
+def months_ago(moment, months):
+    """The same day and time `months` calendar months earlier (clamped to month end)"""
+    year, month = divmod(moment.year * 12 + moment.month - 1 - months, 12)
+    day = min(moment.day, calendar.monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+def expiring_points(balance, earned_before_cutoff, debited):
+    """
+    Points to expire per customer, oldest points used first
+    - Every debit (redemptions and earlier expiries) used up the oldest
+      points, so whatever was earned before the cutoff and not yet covered
+      by debits has expired
+    - earned_before_cutoff is net of cancellation reversals: those take back
+      what their order earned rather than spending the oldest points
+    - Never more than the current balance
+    """
+    return np.clip(np.minimum(earned_before_cutoff - debited, balance), 0, None)
+
+
+def assign_tiers(spend):
+    """Tier name per customer for an array of trailing spend"""
+    names = np.array([name for name, minimum in TIERS])
+    minimums = np.array([minimum for name, minimum in TIERS], dtype=np.float64)
+    return names[np.searchsorted(minimums, spend, side='right') - 1]
+
+
+def _process_chunk(first_customer_id, last_customer_id, expiry_cutoff, spend_since, now):
+    """
+    Expire points and reassign tiers for one customer_id range in the
+    current transaction; returns (points expired, customers expired, tiers changed)
+    """
+    in_range = Customer.customer_id.between(first_customer_id, last_customer_id)
+
+    # Lock only customers with points, and before reading their ledger: every
+    # points writer updates Customer first, so no ledger row can be added
+    # for them until this chunk commits
+    balances = dict(db.session.execute(
+        select(Customer.customer_id, Customer.reward_points)
+        .where(in_range, Customer.reward_points > 0)
+        .order_by(Customer.customer_id)
+        .with_for_update()
+    ).all())
+
+    expiries = {}
+    if balances:
+        # A reversal is netted against its order's earning row, so it only
+        # reduces the points earned before the cutoff if that row is older
+        reversal = RewardTransaction.entry_type == 'reversal'
+        earning = aliased(RewardTransaction)
+        earned_at = func.coalesce(earning.transaction_date, RewardTransaction.transaction_date)
+        ledger = db.session.execute(
+            select(
+                RewardTransaction.customer_id,
+                func.coalesce(func.sum(case(
+                    (reversal, case((earned_at < expiry_cutoff, -RewardTransaction.points_redeemed), else_=0)),
+                    (RewardTransaction.transaction_date < expiry_cutoff, RewardTransaction.points_earned),
+                    else_=0
+                )), 0),
+                func.coalesce(func.sum(case((reversal, 0), else_=RewardTransaction.points_redeemed)), 0)
+            )
+            .outerjoin(earning, and_(
+                reversal,
+                earning.order_id == RewardTransaction.order_id,
+                earning.entry_type == 'standard',
+                earning.points_earned > 0
+            ))
+            .where(RewardTransaction.customer_id.in_(list(balances)))
+            .group_by(RewardTransaction.customer_id)
+        ).all()
+        if ledger:
+            ids = np.fromiter((row[0] for row in ledger), dtype=np.int64, count=len(ledger))
+            earned = np.fromiter((row[1] for row in ledger), dtype=np.int64, count=len(ledger))
+            debited = np.fromiter((row[2] for row in ledger), dtype=np.int64, count=len(ledger))
+            balance = np.fromiter((balances[int(cid)] for cid in ids), dtype=np.int64, count=len(ids))
+            amounts = expiring_points(balance, earned, debited)
+            expiries = {int(cid): int(n) for cid, n in zip(ids, amounts) if n > 0}
+
+    if expiries:
+        db.session.execute(
+            update(Customer)
+            .where(Customer.customer_id.in_(list(expiries)))
+            .values(reward_points=Customer.reward_points - case(expiries, value=Customer.customer_id))
+            .execution_options(synchronize_session=False)
+        )
+        description = f'Points earned before {expiry_cutoff.date().isoformat()} expired'
+        db.session.execute(insert(RewardTransaction), [{
+            'customer_id': cid,
+            'entry_type': 'expiry',
+            'points_earned': 0,
+            'points_redeemed': points,
+            'transaction_date': now,
+            'description': description
+        } for cid, points in expiries.items()])
+
+    # Tiers from trailing spend on non-cancelled orders (no row locks needed)
+    spend = db.session.execute(
+        select(
+            Customer.customer_id,
+            Customer.tier,
+            func.coalesce(func.sum(Orders.total_amount), 0)
+        ).select_from(Customer)
+        .outerjoin(Orders, (Orders.customer_id == Customer.customer_id)
+                   & (Orders.order_date >= spend_since)
+                   & (Orders.status != 'Cancelled'))
+        .where(in_range)
+        .group_by(Customer.customer_id, Customer.tier)
+    ).all()
+    tiers = assign_tiers(np.fromiter((float(row[2]) for row in spend), dtype=np.float64, count=len(spend)))
+    changed = {row[0]: str(tier) for row, tier in zip(spend, tiers) if row[1] != tier}
+    if changed:
+        db.session.execute(
+            update(Customer)
+            .where(Customer.customer_id.in_(list(changed)))
+            .values(tier=case(changed, value=Customer.customer_id))
+            .execution_options(synchronize_session=False)
+        )
+
+    customer_cache.invalidate_on_commit(*expiries, *changed)
+    return sum(expiries.values()), len(expiries), len(changed)
+
+
+def run(expiry_months=12, tier_months=12, chunk_size=1000, restart=False, now=None, log=print):
+    """
+    Expire reward points older than expiry_months and re-tier customers by
+    spend over the last tier_months
+    - Works through customer_id ranges of chunk_size, one short transaction
+      each, recording progress in JobCheckpoint so an interrupted run resumes
+      where it stopped (restart=True starts from the first customer)
+    - Both steps are idempotent: already expired points count as debits,
+      so re-running a range changes nothing
+    """
+    now = now or datetime.utcnow()
+    expiry_cutoff = months_ago(now, expiry_months)
+    spend_since = months_ago(now, tier_months)
+
+    checkpoint = db.session.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=JOB_NAME, last_id=0)
+        db.session.add(checkpoint)
+    if restart:
+        checkpoint.last_id = 0
+    db.session.commit()
+    if checkpoint.last_id:
+        log(f'Resuming after customer #{checkpoint.last_id}')
+
+    totals = {'customers': 0, 'points_expired': 0, 'customers_expired': 0, 'tiers_changed': 0}
+    while True:
+        chunk = select(Customer.customer_id)\
+            .where(Customer.customer_id > checkpoint.last_id)\
+            .order_by(Customer.customer_id)\
+            .limit(chunk_size)\
+            .subquery()
+        first_id, last_id, count = db.session.execute(
+            select(func.min(chunk.c.customer_id), func.max(chunk.c.customer_id), func.count())
+        ).one()
+        if not count:
+            break
+
+        points, expired, changed = _process_chunk(first_id, last_id, expiry_cutoff, spend_since, now)
+        checkpoint.last_id = last_id
+        db.session.commit()
+
+        totals['customers'] += count
+        totals['points_expired'] += points
+        totals['customers_expired'] += expired
+        totals['tiers_changed'] += changed
+        log(f'Customers up to #{last_id}: {points} points expired for {expired}, {changed} tier changes')
+
+    # Finished: the next run starts from the beginning again
+    checkpoint.last_id = 0
+    db.session.commit()
+    return totals
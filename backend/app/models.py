@@ -1,10 +1,47 @@
 # app/models.py
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
 
 db = SQLAlchemy()
 
-class Customer(db.Model):
+
+class SerializerMixin:
+    """
+    Declares which relationships to_dict() reads so list endpoints can load
+    them up front instead of lazily, one query per row
+    - Paths are dotted relationship names, e.g. 'order_details.product'
+    - Many-to-one hops use joinedload, collections use selectinload
+    """
+    serialize_relations = ()
+    
+    @classmethod
+    def eager_options(cls):
+        """Loader options covering every relationship to_dict() touches"""
+        configure_mappers()  # backrefs only exist once mappers are configured
+        
+        options = []
+        for path in cls.serialize_relations:
+            option = None
+            model = cls
+            for name in path.split('.'):
+                attr = getattr(model, name)
+                loader = selectinload if attr.property.uselist else joinedload
+                if option is None:
+                    option = loader(attr)
+                else:
+                    option = getattr(option, loader.__name__)(attr)
+                model = attr.property.mapper.class_
+            options.append(option)
+        return options
+    
+    @classmethod
+    def eager_query(cls):
+        """cls.query with everything to_dict() needs loaded eagerly"""
+        return cls.query.options(*cls.eager_options())
+
+
+class Customer(SerializerMixin, db.Model):
     __tablename__ = 'Customer'
     
     customer_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -14,6 +51,7 @@ class Customer(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.String(255))
     reward_points = db.Column(db.Integer, default=0)
+    tier = db.Column(db.String(20), nullable=False, default='Bronze', server_default='Bronze')  # See app/loyalty.py
     
     # Relationships
     orders = db.relationship('Orders', backref='customer', cascade='all, delete-orphan')
@@ -27,11 +65,12 @@ class Customer(db.Model):
             'email': self.email,
             'phone': self.phone,
             'address': self.address,
-            'reward_points': self.reward_points
+            'reward_points': self.reward_points,
+            'tier': self.tier
         }
 
 
-class Category(db.Model):
+class Category(SerializerMixin, db.Model):
     __tablename__ = 'Category'
     
     category_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -47,7 +86,7 @@ class Category(db.Model):
         }
 
 
-class Product(db.Model):
+class Product(SerializerMixin, db.Model):
     __tablename__ = 'Product'
     
     product_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -58,10 +97,25 @@ class Product(db.Model):
     stock_quantity = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(255))
     
+    # Review aggregates, kept up to date by app/ratings.py
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        db.Index('ix_Product_category_id_price', 'category_id', 'price'),
+    )
+    
     # Relationships
     order_details = db.relationship('OrderDetails', backref='product')
     reviews = db.relationship('Review', backref='product', cascade='all, delete-orphan')
     
+    serialize_relations = ('category',)
+    
     def to_dict(self):
         return {
             'product_id': self.product_id,
@@ -71,11 +125,21 @@ class Product(db.Model):
             'description': self.description,
             'price': float(self.price),
             'stock_quantity': self.stock_quantity,
-            'image_url': self.image_url
+            'image_url': self.image_url,
+            **self.rating_dict()
+        }
+    
+    def rating_dict(self):
+        """The review aggregate fields of to_dict()"""
+        return {
+            'rating_count': self.rating_count or 0,
+            'rating_sum': self.rating_sum or 0,
+            'average_rating': round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0,
+            'rating_histogram': {str(star): getattr(self, f'rating_{star}') or 0 for star in range(1, 6)}
         }
 
 
-class Orders(db.Model):
+class Orders(SerializerMixin, db.Model):
     __tablename__ = 'Orders'
     
     order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -84,10 +148,18 @@ class Orders(db.Model):
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.Enum('Pending', 'Completed', 'Cancelled'), default='Pending')
     
+    __table_args__ = (
+        db.Index('ix_Orders_customer_id_order_date', 'customer_id', 'order_date'),
+        db.Index('ix_Orders_status_order_date', 'status', 'order_date'),
+        db.Index('ix_Orders_order_date', 'order_date'),
+    )
+    
     # Relationships
     order_details = db.relationship('OrderDetails', backref='order', cascade='all, delete-orphan')
     payment = db.relationship('Payment', backref='order', uselist=False, cascade='all, delete-orphan')
     
+    serialize_relations = ('order_details.product',)
+    
     def to_dict(self):
         return {
             'order_id': self.order_id,
@@ -99,15 +171,17 @@ class Orders(db.Model):
         }
 
 
-class OrderDetails(db.Model):
+class OrderDetails(SerializerMixin, db.Model):
     __tablename__ = 'OrderDetails'
     
     order_detail_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='RESTRICT'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     subtotal = db.Column(db.Numeric(10, 2), nullable=False)
     
+    serialize_relations = ('product',)
+    
     def to_dict(self):
         return {
             'order_detail_id': self.order_detail_id,
@@ -119,7 +193,7 @@ class OrderDetails(db.Model):
         }
 
 
-class Payment(db.Model):
+class Payment(SerializerMixin, db.Model):
     __tablename__ = 'Payment'
     
     payment_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -140,7 +214,7 @@ class Payment(db.Model):
         }
 
 
-class Review(db.Model):
+class Review(SerializerMixin, db.Model):
     __tablename__ = 'Review'
     
     review_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -152,8 +226,13 @@ class Review(db.Model):
     
     __table_args__ = (
         db.CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'),
+        db.UniqueConstraint('customer_id', 'product_id', name='uq_Review_customer_id_product_id'),
+        db.Index('ix_Review_product_id_review_date', 'product_id', 'review_date'),
+        db.Index('ix_Review_review_date', 'review_date'),
     )
     
+    serialize_relations = ('customer', 'product')
+    
     def to_dict(self):
         return {
             'review_id': self.review_id,
@@ -167,20 +246,31 @@ class Review(db.Model):
         }
 
 
-class RewardTransaction(db.Model):
+# entry_type: 'standard' (points earned or redeemed), 'reversal' (an order's
+# earned points taken back on cancellation), 'expiry' or 'adjustment'
+class RewardTransaction(SerializerMixin, db.Model):
     __tablename__ = 'RewardTransaction'
     
     reward_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id', onupdate='CASCADE', ondelete='SET NULL', name='fk_RewardTransaction_order_id'))
+    entry_type = db.Column(db.String(20), nullable=False, default='standard', server_default='standard')
     points_earned = db.Column(db.Integer, default=0)
     points_redeemed = db.Column(db.Integer, default=0)
     transaction_date = db.Column(db.DateTime, default=datetime.utcnow)
     description = db.Column(db.String(255))
     
+    __table_args__ = (
+        db.Index('ix_RewardTransaction_customer_id_transaction_date', 'customer_id', 'transaction_date'),
+        db.Index('ix_RewardTransaction_order_id', 'order_id'),
+    )
+    
     def to_dict(self):
         return {
             'reward_id': self.reward_id,
             'customer_id': self.customer_id,
+            'order_id': self.order_id,
+            'entry_type': self.entry_type,
             'points_earned': self.points_earned,
             'points_redeemed': self.points_redeemed,
             'transaction_date': self.transaction_date.isoformat(),
@@ -188,7 +278,26 @@ class RewardTransaction(db.Model):
         }
 
 
-class Admin(db.Model):
+# Ledger balance of a customer as of one RewardTransaction (see app/ledger.py);
+# history pages and reconciliation sum only the rows after the nearest snapshot
+class RewardSnapshot(SerializerMixin, db.Model):
+    __tablename__ = 'RewardSnapshot'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    last_reward_id = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(db.Integer, nullable=False, default=0)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'last_reward_id': self.last_reward_id,
+            'balance': self.balance,
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None
+        }
+
+
+class Admin(SerializerMixin, db.Model):
     __tablename__ = 'Admin'
     
     admin_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -201,4 +310,153 @@ class Admin(db.Model):
             'admin_id': self.admin_id,
             'username': self.username,
             'role': self.role
-        }
\ No newline at end of file
+        }
+
+
+# Per-day sales totals kept up to date by the order routes (see app/rollup.py)
+class DailySalesRollup(SerializerMixin, db.Model):
+    __tablename__ = 'DailySalesRollup'
+    
+    rollup_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.Enum('Pending', 'Completed', 'Cancelled'), primary_key=True)
+    category_id = db.Column(db.Integer)  # Category at the time of the last write
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'rollup_date': self.rollup_date.isoformat(),
+            'product_id': self.product_id,
+            'category_id': self.category_id,
+            'status': self.status,
+            'quantity': self.quantity,
+            'revenue': float(self.revenue),
+            'order_count': self.order_count
+        }
+
+
+# Per-day order totals; revenue is Orders.total_amount (fees and discounts included)
+class DailyOrderRollup(SerializerMixin, db.Model):
+    __tablename__ = 'DailyOrderRollup'
+    
+    rollup_date = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.Enum('Pending', 'Completed', 'Cancelled'), primary_key=True)
+    payment_method = db.Column(db.String(20), primary_key=True)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'rollup_date': self.rollup_date.isoformat(),
+            'status': self.status,
+            'payment_method': self.payment_method,
+            'revenue': float(self.revenue),
+            'order_count': self.order_count
+        }
+
+
+# Stored responses for POST requests sent with an Idempotency-Key header (see app/idempotency.py)
+class IdempotencyRecord(SerializerMixin, db.Model):
+    __tablename__ = 'IdempotencyRecord'
+    
+    scope = db.Column(db.String(100), primary_key=True)  # endpoint + caller identity
+    idempotency_key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.Enum('Processing', 'Completed'), nullable=False, default='Processing')
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def to_dict(self):
+        return {
+            'scope': self.scope,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'response_code': self.response_code,
+            'created_at': self.created_at.isoformat(),
+            'expires_at': self.expires_at.isoformat()
+        }
+
+
+# Orders that contain both products; product_id == other_product_id holds the
+# number of orders containing the product (see app/recommendations.py)
+class CoPurchaseCount(SerializerMixin, db.Model):
+    __tablename__ = 'CoPurchaseCount'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    other_product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Top-K "customers also bought" list per product, republished by each build
+class ProductRecommendation(SerializerMixin, db.Model):
+    __tablename__ = 'ProductRecommendation'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    recommended_product_id = db.Column(db.Integer, db.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'rank': self.rank,
+            'recommended_product_id': self.recommended_product_id,
+            'score': self.score
+        }
+
+
+# Progress marker for incremental batch jobs (last processed id per job)
+class JobCheckpoint(SerializerMixin, db.Model):
+    __tablename__ = 'JobCheckpoint'
+    
+    job_name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'job_name': self.job_name,
+            'last_id': self.last_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+# Latest RFM (recency, frequency, monetary) scores per customer (see app/segments.py)
+class CustomerSegment(SerializerMixin, db.Model):
+    __tablename__ = 'CustomerSegment'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True)
+    last_order_date = db.Column(db.DateTime)
+    recency_days = db.Column(db.Integer)
+    frequency = db.Column(db.Integer, nullable=False, default=0)
+    monetary = db.Column(db.Numeric(12, 2), nullable=False, default=0, index=True)
+    r_score = db.Column(db.Integer, nullable=False, default=0)
+    f_score = db.Column(db.Integer, nullable=False, default=0)
+    m_score = db.Column(db.Integer, nullable=False, default=0)
+    segment = db.Column(db.String(30), nullable=False, index=True)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    customer = db.relationship('Customer')
+    
+    serialize_relations = ('customer',)
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'name': self.customer.name if self.customer else None,
+            'email': self.customer.email if self.customer else None,
+            'last_order_date': self.last_order_date.isoformat() if self.last_order_date else None,
+            'recency_days': self.recency_days,
+            'frequency': self.frequency,
+            'monetary': float(self.monetary),
+            'r_score': self.r_score,
+            'f_score': self.f_score,
+            'm_score': self.m_score,
+            'rfm_score': f'{self.r_score}{self.f_score}{self.m_score}',
+            'segment': self.segment,
+            'computed_at': self.computed_at.isoformat()
+        }
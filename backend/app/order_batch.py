@@ -0,0 +1,333 @@
+# app/order_batch.py
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, insert, update
+from app.models import (db, Orders, OrderDetails, Payment, Customer, RewardTransaction,
+                        IdempotencyRecord)
+from app.inventory import cart_quantities, lock_products, reserve_stock
+from app.rollup import apply_orders
+from app.identity import customer_cache
+
+PAYMENT_METHODS = ('CreditCard', 'Cash', 'Online')
+
+
+class BatchOrderError(ValueError):
+    """Raised when a single order in a batch cannot be placed"""
+
+
+def _parse_order_date(value, is_admin, now):
+    """
+    When the order was taken: server time unless an admin (POS) token sends
+    order_date, which must be in the past and within ORDER_BATCH_MAX_AGE_HOURS
+    """
+    if not value:
+        return now
+    if not is_admin:
+        raise BatchOrderError('order_date can only be set by admin tokens')
+    try:
+        order_date = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise BatchOrderError(f'Invalid order_date: {value}')
+    if order_date.tzinfo is not None:
+        raise BatchOrderError('order_date must be a naive UTC timestamp')
+    if order_date > now:
+        raise BatchOrderError('order_date cannot be in the future')
+    max_age = timedelta(hours=current_app.config['ORDER_BATCH_MAX_AGE_HOURS'])
+    if order_date < now - max_age:
+        raise BatchOrderError(f'order_date is older than the {max_age.total_seconds() / 3600:g} hour offline limit')
+    return order_date
+
+
+def _plan_order(data, customer_id, products, stock_left, points_left, is_admin, now):
+    """
+    Validate one order against the running stock and points balances and
+    return what has to be written for it (nothing is written here)
+    """
+    order_date = _parse_order_date(data.get('order_date'), is_admin, now)
+
+    if not data.get('items'):
+        raise BatchOrderError('Order must contain at least one item')
+
+    payment_method = data.get('payment_method')
+    if not payment_method:
+        raise BatchOrderError('Payment method is required')
+    if payment_method not in PAYMENT_METHODS:
+        raise BatchOrderError(f'Invalid payment method. Must be one of: {list(PAYMENT_METHODS)}')
+
+    try:
+        quantities = cart_quantities(data['items'])
+        delivery_fee = Decimal(str(data.get('delivery_fee', 0)))
+        points_to_redeem = int(data.get('points_to_redeem', 0))
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise BatchOrderError(str(e))
+
+    total_amount = Decimal('0.00')
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if not product:
+            raise BatchOrderError(f'Product {product_id} not found')
+        if stock_left[product_id] < quantity:
+            raise BatchOrderError(
+                f'Insufficient stock for {product.name}. Available: {stock_left[product_id]}'
+            )
+        subtotal = product.price * quantity
+        total_amount += subtotal
+        lines.append((product, quantity, subtotal))
+
+    total_amount += delivery_fee
+
+    discount_amount = Decimal('0.00')
+    if points_to_redeem > 0:
+        if points_to_redeem < 100:
+            raise BatchOrderError('Minimum 100 points required to redeem rewards')
+        if points_left[customer_id] < points_to_redeem:
+            raise BatchOrderError(f'Insufficient points. Available: {points_left[customer_id]}')
+        discount_amount = Decimal(str(points_to_redeem))
+        total_amount = max(Decimal('0.00'), total_amount - discount_amount)
+
+    # Same rule as create_order: 1 point per 100 PKR of the pre-discount total
+    points_earned = int((total_amount + discount_amount) / 100)
+
+    # Commit the running balances only once the whole order is valid
+    for product, quantity, _ in lines:
+        stock_left[product.product_id] -= quantity
+    points_left[customer_id] += points_earned - points_to_redeem
+
+    return {
+        'customer_id': customer_id,
+        'order_date': order_date,
+        'payment_method': payment_method,
+        'total_amount': total_amount,
+        'discount_amount': discount_amount,
+        'points_earned': points_earned,
+        'points_redeemed': points_to_redeem,
+        'lines': lines
+    }
+
+
+def ingest_orders(orders_data, identity):
+    """
+    Place a batch of orders in one transaction
+    - Products and customers are loaded (and row locked) with one query each
+    - Stock and reward balances are changed with one UPDATE each
+    - Details, payments, ledger rows and rollups are written with executemany
+    - Each order carries a client_id; ids already ingested are not placed again
+    Returns one result per input order, in input order
+    """
+    is_admin = str(identity).startswith('admin_')
+    scope = f'orders-batch:{identity}'
+    ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+
+    results = [None] * len(orders_data)
+    pending = []  # (index, client_id, data, customer_id)
+    seen = set()
+
+    for index, data in enumerate(orders_data):
+        client_id = data.get('client_id') if isinstance(data, dict) else None
+        if not client_id:
+            results[index] = {'client_id': client_id, 'status': 'error', 'error': 'client_id is required'}
+            continue
+        client_id = str(client_id)
+        if client_id in seen:
+            results[index] = {'client_id': client_id, 'status': 'error', 'error': 'Duplicate client_id in batch'}
+            continue
+        seen.add(client_id)
+
+        try:
+            requested = int(data['customer_id']) if data.get('customer_id') else None
+        except (ValueError, TypeError):
+            results[index] = {'client_id': client_id, 'status': 'error', 'error': 'Invalid customer_id'}
+            continue
+
+        # Admin tokens place orders for any customer, customers only for themselves
+        if is_admin:
+            if requested is None:
+                results[index] = {'client_id': client_id, 'status': 'error', 'error': 'customer_id is required'}
+                continue
+            customer_id = requested
+        else:
+            customer_id = int(identity)
+            if requested is not None and requested != customer_id:
+                results[index] = {'client_id': client_id, 'status': 'error', 'error': 'Cannot place orders for another customer'}
+                continue
+        pending.append((index, client_id, data, customer_id))
+
+    # Orders already ingested by an earlier (retried) batch
+    if pending:
+        existing = IdempotencyRecord.query.filter(
+            IdempotencyRecord.scope == scope,
+            IdempotencyRecord.idempotency_key.in_([p[1] for p in pending]),
+            IdempotencyRecord.expires_at >= datetime.utcnow()
+        ).all()
+        stored = {record.idempotency_key: record for record in existing}
+        fresh = []
+        for index, client_id, data, customer_id in pending:
+            if client_id in stored:
+                result = json.loads(stored[client_id].response_body)
+                result['status'] = 'duplicate'
+                results[index] = result
+            else:
+                fresh.append((index, client_id, data, customer_id))
+        pending = fresh
+
+    if not pending:
+        return results
+
+    # One locking read for every product and customer referenced by the batch
+    product_ids = set()
+    for _, _, data, _ in pending:
+        for item in data.get('items') or []:
+            try:
+                product_ids.add(int(item['product_id']))
+            except (KeyError, ValueError, TypeError):
+                pass
+    products = lock_products(product_ids)
+    customer_ids = sorted({p[3] for p in pending})
+    customers = {c.customer_id: c for c in Customer.query.filter(Customer.customer_id.in_(customer_ids))
+                                                         .order_by(Customer.customer_id)
+                                                         .with_for_update()
+                                                         .all()}
+
+    stock_left = {pid: product.stock_quantity or 0 for pid, product in products.items()}
+    points_left = {cid: customer.reward_points or 0 for cid, customer in customers.items()}
+
+    now = datetime.utcnow()
+    planned = []
+    for index, client_id, data, customer_id in pending:
+        if customer_id not in customers:
+            results[index] = {'client_id': client_id, 'status': 'error', 'error': 'Customer not found'}
+            continue
+        try:
+            plan = _plan_order(data, customer_id, products, stock_left, points_left, is_admin, now)
+        except BatchOrderError as e:
+            results[index] = {'client_id': client_id, 'status': 'error', 'error': str(e)}
+            continue
+        planned.append((index, client_id, plan))
+
+    if not planned:
+        db.session.rollback()
+        return results
+
+    # Orders need their ids, so they are flushed together first
+    new_orders = []
+    for _, _, plan in planned:
+        order = Orders(
+            customer_id=plan['customer_id'],
+            order_date=plan['order_date'],
+            total_amount=plan['total_amount'],
+            status='Pending'
+        )
+        new_orders.append(order)
+    db.session.add_all(new_orders)
+    db.session.flush()
+
+    detail_rows, payment_rows, reward_rows = [], [], []
+    stock_delta, points_delta = {}, {}
+    rollup_entries = []
+
+    for order, (_, _, plan) in zip(new_orders, planned):
+        for product, quantity, subtotal in plan['lines']:
+            detail_rows.append({
+                'order_id': order.order_id,
+                'product_id': product.product_id,
+                'quantity': quantity,
+                'subtotal': subtotal
+            })
+            stock_delta[product.product_id] = stock_delta.get(product.product_id, 0) + quantity
+
+        payment_rows.append({
+            'order_id': order.order_id,
+            'payment_date': plan['order_date'],
+            'payment_method': plan['payment_method'],
+            'amount': plan['total_amount'],
+            'status': 'Pending' if plan['payment_method'] == 'Cash' else 'Paid'
+        })
+
+        customer_id = plan['customer_id']
+        if plan['points_redeemed']:
+            reward_rows.append({
+                'customer_id': customer_id,
+                'order_id': order.order_id,
+                'points_earned': 0,
+                'points_redeemed': plan['points_redeemed'],
+                'transaction_date': now,
+                'description': f'Redeemed {plan["points_redeemed"]} points for discount on Order #{order.order_id}'
+            })
+        if plan['points_earned']:
+            reward_rows.append({
+                'customer_id': customer_id,
+                'order_id': order.order_id,
+                'points_earned': plan['points_earned'],
+                'points_redeemed': 0,
+                'transaction_date': now,
+                'description': f'Points earned from Order #{order.order_id}'
+            })
+        points_delta[customer_id] = points_delta.get(customer_id, 0) \
+            + plan['points_earned'] - plan['points_redeemed']
+
+        rollup_entries.append((order, 'Pending', plan['payment_method'], [
+            (product.product_id, product.category_id, quantity, subtotal)
+            for product, quantity, subtotal in plan['lines']
+        ]))
+
+    db.session.execute(insert(OrderDetails), detail_rows)
+    db.session.execute(insert(Payment), payment_rows)
+    if reward_rows:
+        db.session.execute(insert(RewardTransaction), reward_rows)
+
+    if not reserve_stock(stock_delta):
+        # Rows are locked, so this only happens on databases without FOR UPDATE
+        raise RuntimeError('Stock changed while the batch was being placed, please retry')
+
+    points_delta = {cid: delta for cid, delta in points_delta.items() if delta}
+    if points_delta:
+        db.session.execute(
+            update(Customer)
+            .where(Customer.customer_id.in_(list(points_delta)))
+            .values(reward_points=Customer.reward_points + case(points_delta, value=Customer.customer_id))
+            .execution_options(synchronize_session=False)
+        )
+        customer_cache.invalidate_on_commit(*points_delta)
+
+    apply_orders(rollup_entries)
+
+    # Remember the client ids in the same transaction so a retried batch is a no-op
+    order_dicts = {}
+    idempotency_rows = []
+    for order, (index, client_id, plan) in zip(new_orders, planned):
+        result = {
+            'client_id': client_id,
+            'status': 'created',
+            'order_id': order.order_id,
+            'points_earned': plan['points_earned'],
+            'points_redeemed': plan['points_redeemed'],
+            'discount_amount': float(plan['discount_amount'])
+        }
+        results[index] = result
+        order_dicts[order.order_id] = result
+        idempotency_rows.append({
+            'scope': scope,
+            'idempotency_key': client_id,
+            'request_hash': '',
+            'status': 'Completed',
+            'response_code': 201,
+            'response_body': json.dumps(result),
+            'created_at': now,
+            'expires_at': now + ttl
+        })
+    IdempotencyRecord.query.filter(
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.idempotency_key.in_([row['idempotency_key'] for row in idempotency_rows])
+    ).delete(synchronize_session=False)  # Expired records for reused client ids
+    db.session.execute(insert(IdempotencyRecord), idempotency_rows)
+
+    db.session.commit()
+
+    # Attach the full orders with one eager query
+    for order in Orders.eager_query().filter(Orders.order_id.in_(list(order_dicts))).all():
+        order_dicts[order.order_id]['order'] = order.to_dict()
+
+    return results
@@ -0,0 +1,98 @@
+# app/pagination.py
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from flask import request, current_app
+from sqlalchemy import and_, or_
+
+
+class PaginationError(ValueError):
+    """Raised when the limit or cursor query parameter cannot be used"""
+
+
+def encode_cursor(values):
+    """Encode the sort key values of the last row into an opaque cursor"""
+    values = [
+        v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into sort key values typed like the columns"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise PaginationError('Invalid cursor')
+
+    decoded = []
+    for value, column in zip(values, columns):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (ValueError, TypeError):
+                raise PaginationError('Invalid cursor')
+        if value is not None and column.type.python_type is Decimal:
+            try:
+                value = Decimal(value)
+            except (InvalidOperation, TypeError):
+                raise PaginationError('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def get_limit():
+    """Read ?limit= bounded by PAGINATION_MAX_LIMIT"""
+    default = current_app.config.get('PAGINATION_DEFAULT_LIMIT', 50)
+    maximum = current_app.config.get('PAGINATION_MAX_LIMIT', 200)
+
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        raise PaginationError('limit must be an integer')
+
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def _after(columns, values, descending):
+    """WHERE clause selecting rows that sort after the given key values"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, *columns, descending=True):
+    """
+    Paginate a query on (columns...) using ?limit= and ?cursor=
+    - The last column must be unique (normally the primary key)
+    - Returns (items, next_cursor); next_cursor is None on the last page
+    """
+    limit = get_limit()
+    cursor = request.args.get('cursor')
+
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return rows, next_cursor
@@ -0,0 +1,141 @@
+# app/passwords.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool already has as much work as it may queue"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking on a bounded process pool
+    - Request workers only wait on the pool, so a burst of logins cannot
+      pin them all on bcrypt CPU time
+    - At most PASSWORD_POOL_WORKERS + PASSWORD_POOL_QUEUE jobs are in flight;
+      beyond that PasswordHasherBusy is raised at once (routes answer 503)
+    - BCRYPT_ROUNDS sets the cost of new hashes; needs_rehash() reports
+      stored hashes made with another cost
+    - A pool broken by a dead worker is replaced and the job retried once
+    - PASSWORD_POOL_WORKERS = 0 hashes inline (scripts, single-user setups)
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = os.cpu_count() or 2
+        self.queue = self.workers * 2
+        self.timeout = 10
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.setdefault('BCRYPT_ROUNDS', self.rounds)
+        self.workers = app.config.setdefault('PASSWORD_POOL_WORKERS', self.workers)
+        self.queue = app.config.setdefault('PASSWORD_POOL_QUEUE', self.workers * 2)
+        self.timeout = app.config.setdefault('PASSWORD_POOL_TIMEOUT', self.timeout)
+
+    def _pool(self):
+        """(executor, slots); created on first use so each server process gets its own pool"""
+        with self._lock:
+            if self._executor is None:
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor, self._slots
+
+    def _reset(self, broken):
+        """Drop a pool whose worker died; the next _pool() call starts a new one"""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._slots = None
+
+    def _submit(self, fn, *args):
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many logins in progress, please try again shortly')
+        try:
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset(executor)
+            raise
+        # The slot frees up when the job finishes, even if the caller gave up;
+        # it belongs to this pool, not to one that replaces it
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy('Password check timed out, please try again shortly')
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        # A killed worker (OOM, segfault) breaks the whole pool; start a new
+        # one and retry the job once before giving up with a 503
+        try:
+            return self._submit(fn, *args)
+        except BrokenProcessPool:
+            pass
+        try:
+            return self._submit(fn, *args)
+        except BrokenProcessPool:
+            raise PasswordHasherBusy('Password hashing is restarting, please try again shortly')
+
+    def hash_password(self, password):
+        return self._run(_hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def check_password(self, password, hashed):
+        return self._run(_check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        """True if hashed was made with a different cost than BCRYPT_ROUNDS"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def upgrade(self, account, password):
+        """
+        Re-hash account.password at the current cost after a successful check
+        Returns True if it changed (the caller commits); a busy pool just
+        leaves the upgrade for a later login
+        """
+        if not self.needs_rehash(account.password):
+            return False
+        try:
+            account.password = self.hash_password(password)
+        except PasswordHasherBusy:
+            return False
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._slots = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,75 @@
+# app/points.py
+from sqlalchemy import func, insert, select, update
+from app.models import db, Customer, RewardTransaction
+from app.identity import customer_cache
+
+
+class InsufficientPoints(ValueError):
+    """Raised when a customer does not have enough points to redeem"""
+
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f'Insufficient points. Available: {available}')
+
+
+def change_points(customer_id, entries, order_id=None):
+    """
+    Apply reward point changes atomically and return the new balance
+    - entries: [(points_earned, points_redeemed, description), ...], all for
+      order_id when given
+    - One conditional UPDATE changes the balance by earned - redeemed, and
+      only if the current balance covers everything being redeemed
+    - The matching RewardTransaction rows are inserted in the same transaction
+    Raises InsufficientPoints (the caller rolls back) if the balance is too low
+    """
+    entries = [(earned, redeemed, description) for earned, redeemed, description in entries
+               if earned or redeemed]
+    if not entries:
+        return None
+
+    earned = sum(e[0] for e in entries)
+    redeemed = sum(e[1] for e in entries)
+    balance = func.coalesce(Customer.reward_points, 0)
+
+    stmt = update(Customer)\
+        .where(Customer.customer_id == customer_id, balance >= redeemed)\
+        .values(reward_points=balance + earned - redeemed)\
+        .execution_options(synchronize_session=False)
+
+    returning = db.session.get_bind().dialect.update_returning
+    if returning:
+        result = db.session.execute(stmt.returning(Customer.reward_points)).first()
+        new_balance = result[0] if result else None
+        updated = result is not None
+    else:
+        updated = db.session.execute(stmt).rowcount == 1
+        new_balance = None
+
+    if not updated:
+        available = db.session.execute(
+            select(Customer.reward_points).where(Customer.customer_id == customer_id)
+        ).scalar()
+        raise InsufficientPoints(available or 0)
+
+    if new_balance is None:
+        # The row is locked by our UPDATE, so this read cannot race
+        new_balance = db.session.execute(
+            select(Customer.reward_points).where(Customer.customer_id == customer_id)
+        ).scalar()
+
+    db.session.execute(insert(RewardTransaction), [{
+        'customer_id': customer_id,
+        'order_id': order_id,
+        'points_earned': points_earned,
+        'points_redeemed': points_redeemed,
+        'description': description
+    } for points_earned, points_redeemed, description in entries])
+
+    customer_cache.invalidate_on_commit(customer_id)
+
+    # Loaded Customer objects would otherwise keep the old balance
+    customer = db.session.identity_map.get(db.session.identity_key(Customer, customer_id))
+    if customer is not None:
+        db.session.expire(customer, ['reward_points'])
+
+    return new_balance
@@ -0,0 +1,131 @@
+# app/query_plans.py
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, func
+from app.models import db, Admin, Customer, Orders, Review
+
+# (method, path, caller, tables the endpoint may walk in index order)
+# Each endpoint is called through the test client and every SELECT it runs
+# is explained, so the check follows the routes' real queries. Unfiltered
+# listings walk an index newest-first and stop after one page, which is
+# fine; anywhere else reading a whole table or index counts as a full scan.
+# Products are served from the catalog snapshot, which reads the whole
+# catalog on purpose, so they are not checked
+PLAN_CHECKS = (
+    ('GET', '/api/orders', 'customer', ()),
+    ('GET', '/api/admin/orders', 'admin', ('Orders',)),
+    ('GET', '/api/admin/orders?status=Pending', 'admin', ()),
+    ('GET', '/api/admin/reports/sales?include_orders=true', 'admin', ()),
+    ('GET', '/api/reviews', None, ('Review',)),
+    ('GET', '/api/admin/reviews', 'admin', ('Review',)),
+    ('GET', '/api/reviews/product/{product_id}', None, ()),
+    ('GET', '/api/reviews/customer', 'customer', ()),
+    ('GET', '/api/rewards/', 'customer', ()),
+    ('GET', '/api/admin/customers', 'admin', ('Customer',)),
+    ('POST', '/api/auth/login', None, ()),
+    ('POST', '/api/admin/login', None, ())
+)
+
+# Bodies for the login checks (unknown accounts: one query, no bcrypt work)
+LOGIN_BODIES = {
+    '/api/auth/login': {'email': 'plan-check@example.com', 'password': 'x'},
+    '/api/admin/login': {'username': 'plan-check', 'password': 'x'}
+}
+
+
+class PlanCheckError(RuntimeError):
+    """Raised when the database lacks what the plan check needs to call an endpoint"""
+
+
+def _sample(column, default=1):
+    """A real value for path parameters and callers so the planner sees a typical lookup"""
+    return db.session.query(func.min(column)).scalar() or default
+
+
+def _headers(caller):
+    if caller == 'customer':
+        identity = str(_sample(Orders.customer_id, _sample(Customer.customer_id)))
+        return {'Authorization': f'Bearer {create_access_token(identity=identity)}'}
+    if caller == 'admin':
+        admin = Admin.query.order_by(Admin.admin_id).first()
+        if admin is None:
+            raise PlanCheckError('No admin account to call the admin endpoints with: create an admin first (init_db.py)')
+        token = create_access_token(
+            identity=f'admin_{admin.admin_id}',
+            additional_claims={'admin_id': admin.admin_id, 'role': admin.role}
+        )
+        return {'Authorization': f'Bearer {token}'}
+    return {}
+
+
+def capture_selects(app, method, path, headers=None, json=None):
+    """Call an endpoint; returns (status code, [(SELECT sql, parameters), ...] it ran)"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and (statement, parameters) not in statements:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = app.test_client().open(path, method=method, headers=headers, json=json)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response.status_code, statements
+
+
+def explain(statement, parameters=()):
+    """The database's plan for a SQL statement, one string per step"""
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings().all()
+    if dialect == 'mysql':
+        return [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".strip()
+                for row in rows]
+    return [row['QUERY PLAN'] for row in rows]
+
+
+def full_scans(plan, walks=()):
+    """
+    Tables of this app the plan reads in full (derived tables are ignored)
+    - walks: tables that may be read in index order, as long as the plan
+      does not also sort them afterwards
+    """
+    tables = set(db.metadata.tables)
+    sorted_afterwards = any('TEMP B-TREE' in step or 'filesort' in step for step in plan)
+    scanned = []
+    for step in plan:
+        words = step.replace('"', '').replace('`', '').split()
+        if words[:1] == ['SCAN'] and len(words) > 1:                # SQLite
+            if not (words[1] in walks and not sorted_afterwards):
+                scanned.append(words[1])
+        elif len(words) > 1 and 'type=ALL' in words:                # MySQL, no index
+            scanned.append(words[0].rstrip(':'))
+        elif len(words) > 1 and 'type=index' in words:              # MySQL, whole index
+            if not (words[0].rstrip(':') in walks and not sorted_afterwards):
+                scanned.append(words[0].rstrip(':'))
+        elif 'Seq Scan on' in step:                                   # PostgreSQL
+            scanned.append(step.split('Seq Scan on', 1)[1].split()[0].replace('"', ''))
+    return [table for table in scanned if table in tables]
+
+
+def check_plans(app, checks=PLAN_CHECKS):
+    """
+    [(endpoint, status code, [(sql, plan, fully scanned tables), ...]), ...]
+    for every check (call inside an app context)
+    """
+    results = []
+    for method, path, caller, walks in checks:
+        path = path.format(product_id=_sample(Review.product_id))
+        status, statements = capture_selects(
+            app, method, path, headers=_headers(caller), json=LOGIN_BODIES.get(path)
+        )
+        plans = []
+        for statement, parameters in statements:
+            plan = explain(statement, parameters)
+            plans.append((statement, plan, full_scans(plan, walks)))
+        results.append((f'{method} {path}', status, plans))
+    return results
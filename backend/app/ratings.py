@@ -0,0 +1,67 @@
+# app/ratings.py
+from sqlalchemy import func, update
+from app.models import db, Product, Review
+
+STARS = range(1, 6)
+
+
+def apply_rating(product_id, added=None, removed=None):
+    """
+    Adjust a product's review aggregates with one UPDATE
+    - added: rating of a review being created (or the new rating on edit)
+    - removed: rating of a review being deleted (or the old rating on edit)
+    Call in the same transaction as the review write
+    """
+    if added == removed:
+        return
+
+    delta = (1 if added else 0) - (1 if removed else 0)
+    values = {
+        'rating_count': Product.rating_count + delta,
+        'rating_sum': Product.rating_sum + (added or 0) - (removed or 0)
+    }
+    if added:
+        column = Product.__table__.c[f'rating_{added}']
+        values[column.key] = column + 1
+    if removed:
+        column = Product.__table__.c[f'rating_{removed}']
+        values[column.key] = column - 1
+
+    db.session.execute(
+        update(Product)
+        .where(Product.product_id == product_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    # A loaded Product would otherwise keep its old totals
+    product = db.session.identity_map.get(db.session.identity_key(Product, product_id))
+    if product is not None:
+        db.session.expire(product, list(values))
+
+
+def rebuild_ratings():
+    """Recompute every product's aggregates from the Review table"""
+    stats = {}
+    rows = db.session.query(Review.product_id, Review.rating, func.count())\
+                     .group_by(Review.product_id, Review.rating)\
+                     .all()
+    for product_id, rating, count in rows:
+        row = stats.setdefault(product_id, {f'rating_{star}': 0 for star in STARS})
+        row[f'rating_{rating}'] = count
+
+    reset = {'rating_count': 0, 'rating_sum': 0}
+    reset.update({f'rating_{star}': 0 for star in STARS})
+    Product.query.update(reset, synchronize_session=False)
+
+    if stats:
+        db.session.execute(update(Product), [
+            dict(
+                row,
+                product_id=product_id,
+                rating_count=sum(row[f'rating_{star}'] for star in STARS),
+                rating_sum=sum(star * row[f'rating_{star}'] for star in STARS)
+            )
+            for product_id, row in stats.items()
+        ])
+    return len(stats)
@@ -0,0 +1,154 @@
+# app/recommendations.py
+from datetime import datetime, timedelta
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, insert, select
+from app.models import db, Orders, OrderDetails, CoPurchaseCount, ProductRecommendation, JobCheckpoint
+from app.rollup import upsert_counters
+
+JOB_NAME = 'co_purchase'
+
+
+def _int_array(rows, width):
+    """rows x width int64 array (np.array on Row objects is many times slower)"""
+    values = np.fromiter((value for row in rows for value in row), dtype=np.int64, count=len(rows) * width)
+    return values.reshape(len(rows), width)
+
+
+def _line_items(after_order_id, last_order_id):
+    """(order_ids, product_ids) arrays for the lines of non-cancelled orders in the id range"""
+    rows = db.session.execute(
+        select(OrderDetails.order_id, OrderDetails.product_id)
+        .join(Orders, Orders.order_id == OrderDetails.order_id)
+        .where(
+            OrderDetails.order_id > after_order_id,
+            OrderDetails.order_id <= last_order_id,
+            Orders.status != 'Cancelled'
+        )
+    ).all()
+    pairs = _int_array(rows, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def co_purchase_counts(order_ids, product_ids):
+    """
+    Count, for every pair of products, the orders containing both
+    - X is the binary order x product matrix, X.T @ X the co-purchase matrix
+    - The diagonal is the number of orders containing each product
+    Returns (product_ids, other_product_ids, counts) arrays
+    """
+    _, order_index = np.unique(order_ids, return_inverse=True)
+    x = sparse.coo_matrix(
+        (np.ones(len(order_index), dtype=np.int32), (order_index, product_ids)),
+        shape=(int(order_index.max()) + 1, int(product_ids.max()) + 1)
+    ).tocsr()
+    x.data[:] = 1  # Several lines of one product still count as one order
+    counts = (x.T @ x).tocoo()
+    return counts.row, counts.col, counts.data
+
+
+def add_counts(product_ids, other_product_ids, counts):
+    upsert_counters(CoPurchaseCount, [
+        {'product_id': int(p), 'other_product_id': int(o), 'order_count': int(n)}
+        for p, o, n in zip(product_ids, other_product_ids, counts)
+    ], keys=['product_id', 'other_product_id'], counters=['order_count'])
+
+
+def top_k(product_ids, other_product_ids, counts, k):
+    """
+    Rank every product's co-purchases by cosine affinity
+    count(a and b) / sqrt(count(a) * count(b)) and keep the best k
+    Returns (product_ids, ranks, recommended_ids, scores) arrays
+    """
+    size = int(max(product_ids.max(), other_product_ids.max())) + 1
+    totals = np.zeros(size, dtype=np.float64)
+    diagonal = product_ids == other_product_ids
+    totals[product_ids[diagonal]] = counts[diagonal]
+
+    pairs = ~diagonal
+    p, o, n = product_ids[pairs], other_product_ids[pairs], counts[pairs].astype(np.float64)
+    scores = n / np.sqrt(totals[p] * totals[o])
+
+    # Group by product, best score first, lower id breaking ties
+    order = np.lexsort((o, -scores, p))
+    p, o, scores = p[order], o[order], scores[order]
+
+    group_start = np.flatnonzero(np.r_[True, p[1:] != p[:-1]])
+    group_size = np.diff(np.r_[group_start, len(p)])
+    ranks = np.arange(len(p)) - np.repeat(group_start, group_size)
+
+    keep = ranks < k
+    return p[keep], ranks[keep] + 1, o[keep], scores[keep]
+
+
+def publish(k):
+    """Recompute the top-k table from the stored counts"""
+    rows = db.session.execute(
+        select(CoPurchaseCount.product_id, CoPurchaseCount.other_product_id, CoPurchaseCount.order_count)
+        .where(CoPurchaseCount.order_count > 0)
+    ).all()
+
+    ProductRecommendation.query.delete(synchronize_session=False)
+    if not rows:
+        return 0
+
+    counts = _int_array(rows, 3)
+    product_ids, ranks, recommended_ids, scores = top_k(counts[:, 0], counts[:, 1], counts[:, 2], k)
+    if len(product_ids):
+        db.session.execute(insert(ProductRecommendation), [
+            {'product_id': int(p), 'rank': int(r), 'recommended_product_id': int(o), 'score': round(float(s), 6)}
+            for p, r, o, s in zip(product_ids, ranks, recommended_ids, scores)
+        ])
+    return len(product_ids)
+
+
+def build(full=False, top_k_size=10, chunk_orders=100000, settle_minutes=5, log=print):
+    """
+    Fold orders placed since the last run into the co-purchase counts, then
+    republish the top-k table
+    - full=True clears the counts and starts again from the first order
+    - Orders are read in order_id chunks, each committed with the checkpoint
+    - Only orders older than settle_minutes are counted, so an order still
+      being placed with a lower order_id cannot be skipped by the checkpoint
+    - Orders cancelled after they were counted stay counted until a full rebuild
+    """
+    checkpoint = db.session.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=JOB_NAME, last_id=0)
+        db.session.add(checkpoint)
+    if full:
+        CoPurchaseCount.query.delete(synchronize_session=False)
+        checkpoint.last_id = 0
+
+    last_order_id = db.session.query(func.max(Orders.order_id))\
+                              .filter(Orders.order_date <= datetime.utcnow() - timedelta(minutes=settle_minutes))\
+                              .scalar() or 0
+    processed = 0
+
+    while checkpoint.last_id < last_order_id:
+        chunk_end = min(checkpoint.last_id + chunk_orders, last_order_id)
+        order_ids, product_ids = _line_items(checkpoint.last_id, chunk_end)
+        if len(order_ids):
+            add_counts(*co_purchase_counts(order_ids, product_ids))
+            processed += len(order_ids)
+        checkpoint.last_id = chunk_end
+        db.session.commit()
+        log(f'Counted orders up to #{chunk_end} ({processed} line items)')
+
+    published = publish(top_k_size)
+    db.session.commit()
+    log(f'Published {published} recommendations')
+    return {'line_items': processed, 'last_order_id': checkpoint.last_id, 'recommendations': published}
+
+
+def recommend(product_ids, limit):
+    """
+    [(product_id, score), ...] for products bought together with any of
+    product_ids (scores are summed across them), excluding product_ids
+    """
+    rows = ProductRecommendation.query.filter(ProductRecommendation.product_id.in_(list(product_ids))).all()
+    scores = {}
+    for row in rows:
+        if row.recommended_product_id not in product_ids:
+            scores[row.recommended_product_id] = scores.get(row.recommended_product_id, 0) + row.score
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -0,0 +1,277 @@
+# app/reports.py
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import db, Orders, OrderDetails, Product, Category, Payment, DailySalesRollup, DailyOrderRollup
+
+TIME_BUCKETS = ('day', 'week', 'month')
+GROUPINGS = TIME_BUCKETS + ('product', 'category', 'payment_method')
+
+
+def _to_float(value):
+    return round(float(value), 2) if value is not None else 0.0
+
+
+def _midnight(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+def parse_bound(value):
+    """Parse a start_date/end_date query parameter (ISO date or datetime)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+
+
+def date_bucket(column, bucket):
+    """
+    SQL expression truncating a datetime column to day/week/month
+    ('hour' gives a 'YYYY-MM-DD HH:00' string, used by the stock forecast)
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        if bucket == 'hour':
+            return func.strftime('%Y-%m-%d %H:00', column)
+        if bucket == 'day':
+            return func.date(column)
+        if bucket == 'week':
+            # Monday of the week
+            return func.date(column, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m', column)
+
+    if dialect == 'mysql':
+        if bucket == 'hour':
+            return func.date_format(column, '%Y-%m-%d %H:00')
+        if bucket == 'day':
+            return func.date(column)
+        if bucket == 'week':
+            # SUBDATE(date, n) subtracts n days; WEEKDAY() is 0 on Monday
+            return func.date(func.subdate(column, func.weekday(column)))
+        return func.date_format(column, '%Y-%m')
+
+    # PostgreSQL and others that support date_trunc
+    truncated = func.date_trunc(bucket, column)
+    if bucket == 'hour':
+        return func.to_char(truncated, 'YYYY-MM-DD HH24:00')
+    if bucket == 'month':
+        return func.to_char(truncated, 'YYYY-MM')
+    return func.date(truncated)
+
+
+def completed_orders_filter(start=None, end=None, end_inclusive=True):
+    """WHERE clauses selecting Completed orders in a date range"""
+    clauses = [Orders.status == 'Completed']
+    if start is not None:
+        clauses.append(Orders.order_date >= start)
+    if end is not None:
+        clauses.append(Orders.order_date <= end if end_inclusive else Orders.order_date < end)
+    return clauses
+
+
+def split_range(start, end, today=None):
+    """
+    Split the report range [start, end] into
+    - whole closed days served from the rollup tables: (first_day, last_day)
+      or None, where first_day is None when the range is unbounded
+    - ranges still read from raw orders: [(start, end, end_inclusive), ...]
+    Today is never rolled up since its orders are still changing
+    """
+    today = today or datetime.utcnow().date()
+
+    first_day = None
+    if start is not None:
+        first_day = start.date() if start == _midnight(start.date()) else start.date() + timedelta(days=1)
+
+    last_day = today - timedelta(days=1)
+    if end is not None:
+        # A day is whole only if the next midnight is still inside the range
+        last_day = min(last_day, end.date() - timedelta(days=1))
+
+    if first_day is not None and first_day > last_day:
+        return None, [(start, end, True)]
+
+    raw_ranges = []
+    if start is not None and start < _midnight(first_day):
+        raw_ranges.append((start, _midnight(first_day), False))
+    raw_ranges.append((_midnight(last_day + timedelta(days=1)), end, True))
+
+    return (first_day, last_day), raw_ranges
+
+
+def _rollup_filter(model, rollup_days):
+    first_day, last_day = rollup_days
+    clauses = [model.status == 'Completed', model.rollup_date <= last_day]
+    if first_day is not None:
+        clauses.append(model.rollup_date >= first_day)
+    return clauses
+
+
+def _merge(rows, key_size):
+    """Sum the metric columns of rows that share the same key"""
+    merged = {}
+    for row in rows:
+        key, metrics = tuple(row[:key_size]), row[key_size:]
+        if key in merged:
+            merged[key] = [a + (b or 0) for a, b in zip(merged[key], metrics)]
+        else:
+            merged[key] = [m or 0 for m in metrics]
+    return merged
+
+
+def sales_totals(start=None, end=None):
+    """Total revenue, order count and average order value"""
+    rollup_days, raw_ranges = split_range(start, end)
+
+    rows = []
+    if rollup_days:
+        rows.append(db.session.query(
+            func.sum(DailyOrderRollup.revenue),
+            func.sum(DailyOrderRollup.order_count)
+        ).filter(*_rollup_filter(DailyOrderRollup, rollup_days)).one())
+
+    for lo, hi, inclusive in raw_ranges:
+        rows.append(db.session.query(
+            func.sum(Orders.total_amount),
+            func.count(Orders.order_id)
+        ).filter(*completed_orders_filter(lo, hi, inclusive)).one())
+
+    revenue, count = _merge(rows, 0).get((), [0, 0])
+    count = int(count)
+
+    return {
+        'total_revenue': _to_float(revenue),
+        'total_orders': count,
+        'average_order_value': _to_float(revenue / count) if count else 0
+    }
+
+
+def _order_lines(lo, hi, inclusive):
+    """Raw line totals with one row per (order, product)"""
+    return db.session.query(
+        OrderDetails.product_id.label('product_id'),
+        Product.category_id.label('category_id'),
+        func.sum(OrderDetails.quantity).label('quantity'),
+        func.sum(OrderDetails.subtotal).label('revenue')
+    ).select_from(OrderDetails)\
+     .join(Orders, Orders.order_id == OrderDetails.order_id)\
+     .join(Product, Product.product_id == OrderDetails.product_id)\
+     .filter(*completed_orders_filter(lo, hi, inclusive))\
+     .group_by(Orders.order_id, OrderDetails.product_id, Product.category_id)\
+     .subquery()
+
+
+def sales_breakdown(group_by, start=None, end=None):
+    """
+    Revenue grouped by a time bucket, product, category or payment method
+    For product/category, 'orders' counts orders containing the product
+    """
+    if group_by not in GROUPINGS:
+        raise ValueError(f'Invalid group_by. Must be one of: {list(GROUPINGS)}')
+
+    rollup_days, raw_ranges = split_range(start, end)
+    rows = []
+
+    if group_by in TIME_BUCKETS:
+        if rollup_days:
+            bucket = date_bucket(DailyOrderRollup.rollup_date, group_by)
+            rows += db.session.query(
+                bucket,
+                func.sum(DailyOrderRollup.revenue),
+                func.sum(DailyOrderRollup.order_count)
+            ).filter(*_rollup_filter(DailyOrderRollup, rollup_days)).group_by(bucket).all()
+
+        for lo, hi, inclusive in raw_ranges:
+            bucket = date_bucket(Orders.order_date, group_by)
+            rows += db.session.query(
+                bucket,
+                func.sum(Orders.total_amount),
+                func.count(Orders.order_id)
+            ).filter(*completed_orders_filter(lo, hi, inclusive)).group_by(bucket).all()
+
+        merged = _merge([(str(r[0]),) + tuple(r[1:]) for r in rows], 1)
+        return [{
+            'period': period,
+            'revenue': _to_float(revenue),
+            'orders': int(count)
+        } for (period,), (revenue, count) in sorted(merged.items())]
+
+    if group_by == 'payment_method':
+        if rollup_days:
+            rows += db.session.query(
+                DailyOrderRollup.payment_method,
+                func.sum(DailyOrderRollup.revenue),
+                func.sum(DailyOrderRollup.order_count)
+            ).filter(*_rollup_filter(DailyOrderRollup, rollup_days))\
+             .group_by(DailyOrderRollup.payment_method).all()
+
+        for lo, hi, inclusive in raw_ranges:
+            method = func.coalesce(Payment.payment_method, 'Unknown')
+            rows += db.session.query(
+                method,
+                func.sum(Orders.total_amount),
+                func.count(Orders.order_id)
+            ).select_from(Orders)\
+             .outerjoin(Payment, Payment.order_id == Orders.order_id)\
+             .filter(*completed_orders_filter(lo, hi, inclusive))\
+             .group_by(method).all()
+
+        merged = _merge(rows, 1)
+        breakdown = [{
+            'payment_method': method,
+            'revenue': _to_float(revenue),
+            'orders': int(count)
+        } for (method,), (revenue, count) in merged.items()]
+        return sorted(breakdown, key=lambda r: r['revenue'], reverse=True)
+
+    # Product and category breakdowns
+    if group_by == 'product':
+        rollup_key, line_key = DailySalesRollup.product_id, 'product_id'
+    else:
+        rollup_key, line_key = DailySalesRollup.category_id, 'category_id'
+
+    if rollup_days:
+        rows += db.session.query(
+            rollup_key,
+            func.sum(DailySalesRollup.quantity),
+            func.sum(DailySalesRollup.revenue),
+            func.sum(DailySalesRollup.order_count)
+        ).filter(*_rollup_filter(DailySalesRollup, rollup_days))\
+         .group_by(rollup_key).all()
+
+    for lo, hi, inclusive in raw_ranges:
+        lines = _order_lines(lo, hi, inclusive)
+        key = lines.c[line_key]
+        rows += db.session.query(
+            key,
+            func.sum(lines.c.quantity),
+            func.sum(lines.c.revenue),
+            func.count()
+        ).group_by(key).all()
+
+    merged = _merge(rows, 1)
+
+    if group_by == 'product':
+        names = dict(db.session.query(Product.product_id, Product.name)
+                               .filter(Product.product_id.in_([k for (k,) in merged])).all())
+        breakdown = [{
+            'product_id': product_id,
+            'product_name': names.get(product_id),
+            'quantity': int(quantity),
+            'revenue': _to_float(revenue),
+            'orders': int(count)
+        } for (product_id,), (quantity, revenue, count) in merged.items()]
+    else:
+        names = dict(db.session.query(Category.category_id, Category.category_name)
+                               .filter(Category.category_id.in_([k for (k,) in merged if k is not None])).all())
+        breakdown = [{
+            'category_id': category_id,
+            'category_name': names.get(category_id),
+            'quantity': int(quantity),
+            'revenue': _to_float(revenue),
+            'orders': int(count)
+        } for (category_id,), (quantity, revenue, count) in merged.items()]
+
+    return sorted(breakdown, key=lambda r: r['revenue'], reverse=True)
@@ -0,0 +1,100 @@
+# app/reviews.py
+import threading
+import time
+from app.models import db, Review, Customer, Product
+
+
+def review_rows():
+    """
+    Query of review rows with only the customer and product names joined in
+    (Rows, not Review objects; serialize with review_dict)
+    """
+    return db.session.query(
+        Review.review_id,
+        Review.customer_id,
+        Customer.name.label('customer_name'),
+        Review.product_id,
+        Product.name.label('product_name'),
+        Review.rating,
+        Review.comment,
+        Review.review_date
+    ).join(Customer, Customer.customer_id == Review.customer_id)\
+     .join(Product, Product.product_id == Review.product_id)
+
+
+def review_dict(row):
+    """Same shape as Review.to_dict()"""
+    return {
+        'review_id': row.review_id,
+        'customer_id': row.customer_id,
+        'customer_name': row.customer_name,
+        'product_id': row.product_id,
+        'product_name': row.product_name,
+        'rating': row.rating,
+        'comment': row.comment,
+        'review_date': row.review_date.isoformat()
+    }
+
+
+class ProductReviewCache:
+    """
+    Short-lived per-worker cache of each product's first review page and
+    rating distribution (the response of GET /api/reviews/product/<id>)
+    - Keyed by product and page size; later pages always hit the database
+    - Review writes call invalidate(product_id) after committing; a page
+      built from reads that started before the invalidation is not stored
+    - Entries expire after REVIEW_CACHE_TTL seconds, which bounds how long
+      writes made by other workers can go unseen
+    """
+
+    def __init__(self, ttl=30, max_products=5000):
+        self.ttl = ttl
+        self.max_products = max_products
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('REVIEW_CACHE_TTL', self.ttl)
+
+    def version(self, product_id):
+        return self._versions.get(product_id, 0)
+
+    def get(self, product_id, limit):
+        entry = self._entries.get(product_id, {}).get(limit)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != self.version(product_id):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[2]
+
+    def set(self, product_id, limit, version, data):
+        """Store data read while the product was at `version` (from version())"""
+        with self._lock:
+            if version != self.version(product_id):
+                return
+            if product_id not in self._entries and len(self._entries) >= self.max_products:
+                # Drop the oldest product (dicts keep insertion order)
+                self._entries.pop(next(iter(self._entries)))
+            self._entries.setdefault(product_id, {})[limit] = (time.monotonic() + self.ttl, version, data)
+
+    def invalidate(self, product_id):
+        """Drop a product's cached pages (call after committing a review write)"""
+        with self._lock:
+            self._versions[product_id] = self.version(product_id) + 1
+            self._entries.pop(product_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'products': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0,
+            'ttl': self.ttl
+        }
+
+
+review_cache = ProductReviewCache()
@@ -0,0 +1,75 @@
+# app/revocation.py
+import threading
+import time
+from flask import jsonify
+
+
+class TokenRevocations:
+    """
+    In-memory revocation list checked on every JWT-protected request
+    - revoke(claims) rejects a single token by its jti (logout)
+    - revoke_admin(admin_id) rejects every token issued to that admin up to now
+    - Both checks are dict lookups; entries are pruned once the tokens they
+      cover would have expired anyway, so memory tracks live tokens only
+    - Held per worker process: a revocation reaches the other workers only
+      if they share this process (tokens still expire after JWT_ACCESS_TOKEN_EXPIRES)
+    """
+
+    def __init__(self, prune_interval=60):
+        self.prune_interval = prune_interval
+        self.max_age = 15 * 60
+        self._tokens = {}   # jti -> expiry (unix time)
+        self._admins = {}   # admin_id -> (revoked at, expiry of the last token covered)
+        self._next_prune = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+        if expires:
+            self.max_age = int(expires.total_seconds()) if hasattr(expires, 'total_seconds') else int(expires)
+
+    def revoke(self, jwt_data):
+        """Revoke the token the claims came from"""
+        expires = jwt_data.get('exp', time.time() + self.max_age)
+        with self._lock:
+            self._tokens[jwt_data['jti']] = expires
+        self._prune()
+
+    def revoke_admin(self, admin_id):
+        """Revoke every token already issued to admin_id"""
+        now = time.time()
+        with self._lock:
+            self._admins[admin_id] = (now, now + self.max_age)
+        self._prune()
+
+    def is_revoked(self, jwt_header, jwt_data):
+        """flask_jwt_extended token_in_blocklist_loader"""
+        if jwt_data.get('jti') in self._tokens:
+            return True
+        admin_id = jwt_data.get('admin_id')
+        if admin_id is not None:
+            revoked = self._admins.get(admin_id)
+            # iat has whole-second resolution, so a token issued in the same
+            # second as the revocation counts as revoked
+            if revoked is not None and jwt_data.get('iat', 0) <= revoked[0]:
+                return True
+        return False
+
+    def _prune(self):
+        now = time.time()
+        if now < self._next_prune:
+            return
+        with self._lock:
+            self._next_prune = now + self.prune_interval
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+            self._admins = {aid: entry for aid, entry in self._admins.items() if entry[1] > now}
+
+    def stats(self):
+        return {'revoked_tokens': len(self._tokens), 'revoked_admins': len(self._admins)}
+
+
+token_revocations = TokenRevocations()
+
+
+def revoked_token_error(jwt_header, jwt_data):
+    return jsonify({'error': 'Token has been revoked'}), 401
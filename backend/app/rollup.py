@@ -0,0 +1,250 @@
+# app/rollup.py
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert
+from app.models import db, Orders, OrderDetails, Product, Payment, DailySalesRollup, DailyOrderRollup
+from app.reports import date_bucket
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def upsert_counters(model, rows, keys, counters, replace=()):
+    """
+    Insert rows, adding the counter columns onto any existing row
+    - MySQL uses ON DUPLICATE KEY UPDATE, SQLite/PostgreSQL ON CONFLICT
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = _dialect()
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        updates = {c: table.c[c] + stmt.inserted[c] for c in counters}
+        updates.update({c: stmt.inserted[c] for c in replace})
+        db.session.execute(stmt.on_duplicate_key_update(updates), rows)
+        return
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        updates = {c: table.c[c] + stmt.excluded[c] for c in counters}
+        updates.update({c: stmt.excluded[c] for c in replace})
+        db.session.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates), rows)
+        return
+
+    # Fallback for other databases: read-modify-write through the ORM
+    for row in rows:
+        existing = db.session.get(model, tuple(row[k] for k in keys))
+        if existing is None:
+            db.session.add(model(**row))
+            continue
+        for c in counters:
+            setattr(existing, c, getattr(existing, c) + row[c])
+        for c in replace:
+            setattr(existing, c, row[c])
+
+
+def _order_lines(order_ids):
+    """Line totals grouped by order and product, for many orders in one query"""
+    rows = db.session.query(
+        OrderDetails.order_id,
+        OrderDetails.product_id,
+        Product.category_id,
+        func.sum(OrderDetails.quantity),
+        func.sum(OrderDetails.subtotal)
+    ).join(Product, Product.product_id == OrderDetails.product_id)\
+     .filter(OrderDetails.order_id.in_(list(order_ids)))\
+     .group_by(OrderDetails.order_id, OrderDetails.product_id, Product.category_id)\
+     .all()
+
+    lines = {}
+    for order_id, product_id, category_id, quantity, subtotal in rows:
+        lines.setdefault(order_id, []).append((product_id, category_id, quantity, subtotal))
+    return lines
+
+
+def _payment_method(order):
+    return order.payment.payment_method if order.payment else 'Unknown'
+
+
+def apply_orders(entries, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) order totals with one upsert per table
+    entries: (order, status, payment_method, lines) where lines holds one
+    (product_id, category_id, quantity, subtotal) tuple per product
+    Call inside the transaction that changes the orders, after a flush
+    """
+    line_totals = {}
+    order_totals = {}
+
+    for order, status, payment_method, lines in entries:
+        rollup_date = order.order_date.date()
+
+        for product_id, category_id, quantity, subtotal in lines:
+            row = line_totals.setdefault((rollup_date, product_id, status), {
+                'rollup_date': rollup_date,
+                'product_id': product_id,
+                'status': status,
+                'category_id': category_id,
+                'quantity': 0,
+                'revenue': 0,
+                'order_count': 0
+            })
+            row['category_id'] = category_id
+            row['quantity'] += sign * int(quantity)
+            row['revenue'] += sign * subtotal
+            row['order_count'] += sign
+
+        row = order_totals.setdefault((rollup_date, status, payment_method), {
+            'rollup_date': rollup_date,
+            'status': status,
+            'payment_method': payment_method,
+            'revenue': 0,
+            'order_count': 0
+        })
+        row['revenue'] += sign * order.total_amount
+        row['order_count'] += sign
+
+    upsert_counters(
+        DailySalesRollup, list(line_totals.values()),
+        keys=['rollup_date', 'product_id', 'status'],
+        counters=['quantity', 'revenue', 'order_count'],
+        replace=['category_id']
+    )
+    upsert_counters(
+        DailyOrderRollup, list(order_totals.values()),
+        keys=['rollup_date', 'status', 'payment_method'],
+        counters=['revenue', 'order_count']
+    )
+
+
+def record_order(order):
+    """Count a newly created order under its current status"""
+    lines = _order_lines([order.order_id]).get(order.order_id, [])
+    apply_orders([(order, order.status or 'Pending', _payment_method(order), lines)])
+
+
+def move_orders(orders, new_status):
+    """Move the totals of orders from their current status to new_status"""
+    orders = [order for order in orders if order.status != new_status]
+    if not orders:
+        return
+
+    lines = _order_lines([order.order_id for order in orders])
+    apply_orders([
+        (order, order.status, _payment_method(order), lines.get(order.order_id, []))
+        for order in orders
+    ], sign=-1)
+    apply_orders([
+        (order, new_status, _payment_method(order), lines.get(order.order_id, []))
+        for order in orders
+    ])
+
+
+def move_order(order, old_status, new_status):
+    """Move an order's totals from one status to another"""
+    if old_status == new_status:
+        return
+    lines = _order_lines([order.order_id]).get(order.order_id, [])
+    payment_method = _payment_method(order)
+    apply_orders([(order, old_status, payment_method, lines)], sign=-1)
+    apply_orders([(order, new_status, payment_method, lines)])
+
+
+def rebuild_range(first_day, last_day):
+    """
+    Recompute both rollup tables for the days [first_day, last_day] from raw
+    orders with INSERT ... SELECT (no ORM objects are loaded)
+    """
+    day_start = datetime.combine(first_day, datetime.min.time())
+    day_end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+
+    DailySalesRollup.query.filter(
+        DailySalesRollup.rollup_date >= first_day,
+        DailySalesRollup.rollup_date <= last_day
+    ).delete(synchronize_session=False)
+    DailyOrderRollup.query.filter(
+        DailyOrderRollup.rollup_date >= first_day,
+        DailyOrderRollup.rollup_date <= last_day
+    ).delete(synchronize_session=False)
+
+    in_range = [Orders.order_date >= day_start, Orders.order_date < day_end]
+
+    # One row per (order, product) first so order_count counts orders, not lines
+    lines = db.session.query(
+        date_bucket(Orders.order_date, 'day').label('rollup_date'),
+        OrderDetails.product_id.label('product_id'),
+        Orders.status.label('status'),
+        Product.category_id.label('category_id'),
+        func.sum(OrderDetails.quantity).label('quantity'),
+        func.sum(OrderDetails.subtotal).label('revenue')
+    ).select_from(OrderDetails)\
+     .join(Orders, Orders.order_id == OrderDetails.order_id)\
+     .join(Product, Product.product_id == OrderDetails.product_id)\
+     .filter(*in_range)\
+     .group_by(Orders.order_id, OrderDetails.product_id, Orders.status, Product.category_id,
+               date_bucket(Orders.order_date, 'day'))\
+     .subquery()
+
+    sales = db.session.query(
+        lines.c.rollup_date,
+        lines.c.product_id,
+        lines.c.status,
+        func.max(lines.c.category_id),
+        func.sum(lines.c.quantity),
+        func.sum(lines.c.revenue),
+        func.count()
+    ).group_by(lines.c.rollup_date, lines.c.product_id, lines.c.status)
+
+    db.session.execute(insert(DailySalesRollup.__table__).from_select(
+        ['rollup_date', 'product_id', 'status', 'category_id', 'quantity', 'revenue', 'order_count'],
+        sales
+    ))
+
+    day = date_bucket(Orders.order_date, 'day')
+    payment_method = func.coalesce(Payment.payment_method, 'Unknown')
+    orders = db.session.query(
+        day,
+        Orders.status,
+        payment_method,
+        func.sum(Orders.total_amount),
+        func.count(Orders.order_id)
+    ).select_from(Orders)\
+     .outerjoin(Payment, Payment.order_id == Orders.order_id)\
+     .filter(*in_range)\
+     .group_by(day, Orders.status, payment_method)
+
+    db.session.execute(insert(DailyOrderRollup.__table__).from_select(
+        ['rollup_date', 'status', 'payment_method', 'revenue', 'order_count'],
+        orders
+    ))
+
+
+def rebuild(first_day=None, last_day=None, chunk_days=31, log=print):
+    """Rebuild the rollups chunk by chunk, committing after each chunk"""
+    if first_day is None or last_day is None:
+        oldest, newest = db.session.query(func.min(Orders.order_date), func.max(Orders.order_date)).one()
+        if oldest is None:
+            log('No orders to roll up')
+            return
+        first_day = first_day or oldest.date()
+        last_day = last_day or newest.date()
+
+    chunk_start = first_day
+    while chunk_start <= last_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_day)
+        try:
+            rebuild_range(chunk_start, chunk_end)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        log(f'Rolled up {chunk_start} .. {chunk_end}')
+        chunk_start = chunk_end + timedelta(days=1)
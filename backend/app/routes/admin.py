@@ -1,22 +1,44 @@
 # app/routes/admin.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, create_access_token
-from app.models import db, Admin, Product, Category, Orders, Customer, Review
+from flask import Blueprint, request, jsonify, current_app
+from functools import wraps
+from flask_jwt_extended import create_access_token, verify_jwt_in_request, get_jwt
+from app.models import db, Admin, Product, Category, Orders, Customer, Review, CustomerSegment
+from app.cache import catalog_cache
+from app.featured import featured_products
+from app.forecast import inventory_forecast
+from app.segments import refresh_segments
+from app.pagination import keyset_paginate, PaginationError
+from app.reports import GROUPINGS, parse_bound, sales_totals, sales_breakdown, completed_orders_filter
+from app.rollup import move_order
+from app.cancellation import cancel_orders, lock_pending_orders, CancellationConflict
+from app.ratings import apply_rating
+from app.reviews import review_rows, review_dict, review_cache
+from app.passwords import password_hasher, PasswordHasherBusy
+from app.revocation import token_revocations
+from app.throttle import login_throttle
+from app.database import pool_metrics
 from sqlalchemy import func
-import bcrypt
 
 admin_bp = Blueprint('admin', __name__)
 
-# Admin authentication decorator (to be used after jwt_required)
-def admin_required(fn):
-    """Decorator to check if user is admin (add after @jwt_required)"""
-    from functools import wraps
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        # This is a placeholder - implement proper admin check
-        # For now, we'll assume admin endpoints require admin JWT
-        return fn(*args, **kwargs)
-    return wrapper
+# Admin authentication decorator (use instead of @jwt_required)
+def admin_required(*roles):
+    """
+    Like @jwt_required(), but only for admin tokens (optionally only the
+    given roles); authorizes from the token claims without loading Admin
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            claims = get_jwt()
+            if claims.get('admin_id') is None:
+                return jsonify({'error': 'Admin access required'}), 403
+            if roles and claims.get('role') not in roles:
+                return jsonify({'error': 'Insufficient role'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
 
 
 @admin_bp.route('/login', methods=['POST'])
@@ -28,18 +50,30 @@ def admin_login():
         if not data.get('username') or not data.get('password'):
             return jsonify({'error': 'Username and password are required'}), 400
         
+        # Throttle before any query or bcrypt work
+        wait = login_throttle.check('admin', request.remote_addr, data['username'])
+        if wait:
+            return jsonify({'error': 'Too many login attempts, please try again later'}), 429, {'Retry-After': str(wait)}
+        
         admin = Admin.query.filter_by(username=data['username']).first()
         
         if not admin:
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        if not bcrypt.checkpw(
-            data['password'].encode('utf-8'),
-            admin.password.encode('utf-8')
-        ):
+        if not password_hasher.check_password(data['password'], admin.password):
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        access_token = create_access_token(identity=f'admin_{admin.admin_id}')
+        # Upgrade hashes made with an older BCRYPT_ROUNDS
+        if password_hasher.upgrade(admin, data['password']):
+            db.session.commit()
+        
+        login_throttle.succeeded('admin', request.remote_addr, data['username'])
+        
+        # Role and id travel in the token so admin routes need no lookup
+        access_token = create_access_token(
+            identity=f'admin_{admin.admin_id}',
+            additional_claims={'admin_id': admin.admin_id, 'role': admin.role}
+        )
         
         return jsonify({
             'message': 'Login successful',
@@ -47,13 +81,43 @@ def admin_login():
             'admin': admin.to_dict()
         }), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/logout', methods=['POST'])
+@admin_required()
+def admin_logout():
+    """Revoke the token used for this request"""
+    try:
+        token_revocations.revoke(get_jwt())
+        return jsonify({'message': 'Logged out'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/admins/<int:admin_id>/revoke-tokens', methods=['POST'])
+@admin_required('Manager')
+def revoke_admin_tokens(admin_id):
+    """Revoke every token issued so far to an admin (Manager only)"""
+    try:
+        token_revocations.revoke_admin(admin_id)
+        return jsonify({
+            'message': f'Tokens issued to admin {admin_id} revoked',
+            'revocations': token_revocations.stats()
+        }), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 # ===== PRODUCT MANAGEMENT =====
 @admin_bp.route('/products', methods=['POST'])
-@jwt_required()
+@admin_required()
 def add_product():
     """Add a new product"""
     try:
@@ -75,6 +139,7 @@ def add_product():
         
         db.session.add(new_product)
         db.session.commit()
+        catalog_cache.invalidate()
         
         return jsonify({
             'message': 'Product added successfully',
@@ -87,7 +152,7 @@ def add_product():
 
 
 @admin_bp.route('/products/<int:product_id>', methods=['PUT'])
-@jwt_required()
+@admin_required()
 def update_product(product_id):
     """Update product details"""
     try:
@@ -113,6 +178,7 @@ def update_product(product_id):
             product.image_url = data['image_url']
         
         db.session.commit()
+        catalog_cache.invalidate()
         
         return jsonify({
             'message': 'Product updated successfully',
@@ -125,7 +191,7 @@ def update_product(product_id):
 
 
 @admin_bp.route('/products/<int:product_id>', methods=['DELETE'])
-@jwt_required()
+@admin_required()
 def delete_product(product_id):
     """Delete a product"""
     try:
@@ -136,6 +202,7 @@ def delete_product(product_id):
         
         db.session.delete(product)
         db.session.commit()
+        catalog_cache.invalidate()
         
         return jsonify({'message': 'Product deleted successfully'}), 200
         
@@ -146,7 +213,7 @@ def delete_product(product_id):
 
 # ===== CATEGORY MANAGEMENT =====
 @admin_bp.route('/categories', methods=['POST'])
-@jwt_required()
+@admin_required()
 def add_category():
     """Add a new category"""
     try:
@@ -164,6 +231,7 @@ def add_category():
         
         db.session.add(new_category)
         db.session.commit()
+        catalog_cache.invalidate()
         
         return jsonify({
             'message': 'Category added successfully',
@@ -175,32 +243,91 @@ def add_category():
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/cache/catalog', methods=['GET'])
+@admin_required()
+def get_catalog_cache_stats():
+    """Get catalog and review cache hit/miss counters for this worker"""
+    return jsonify({'catalog_cache': catalog_cache.stats(), 'review_cache': review_cache.stats()}), 200
+
+
+@admin_bp.route('/db/pool', methods=['GET'])
+@admin_required()
+def get_pool_stats():
+    """Get connection pool checkout waits and saturation for this worker"""
+    return jsonify({'profile': current_app.config['DB_PROFILE'], 'pool': pool_metrics.stats(db.engine)}), 200
+
+
+@admin_bp.route('/featured', methods=['GET'])
+@admin_required()
+def get_featured_ranking():
+    """Get the sales-velocity ranking behind /api/products/featured"""
+    return jsonify({'featured': featured_products.stats()}), 200
+
+
+@admin_bp.route('/featured/refresh', methods=['POST'])
+@admin_required()
+def refresh_featured_ranking():
+    """Recompute the featured ranking now instead of waiting for the refresher"""
+    try:
+        featured_products.refresh()
+        return jsonify({'featured': featured_products.stats()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/inventory/forecast', methods=['GET'])
+@admin_required()
+def get_inventory_forecast():
+    """Get predicted stockouts and reorder points (?alerts_only=true, ?refresh=true)"""
+    try:
+        if request.args.get('refresh', '').lower() == 'true':
+            inventory_forecast.invalidate()
+        
+        products = inventory_forecast.forecast()
+        if request.args.get('alerts_only', '').lower() == 'true':
+            products = [p for p in products if p['needs_reorder']]
+        
+        return jsonify({
+            'products': products,
+            'count': len(products),
+            'lead_time_hours': inventory_forecast.lead_time_hours,
+            'horizon_hours': inventory_forecast.horizon_hours
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ===== ORDER MANAGEMENT =====
 @admin_bp.route('/orders', methods=['GET'])
-@jwt_required()
+@admin_required()
 def get_all_orders():
-    """Get all orders with optional status filter"""
+    """Get orders with optional status filter (paginated, newest first)"""
     try:
         status = request.args.get('status')
         
-        query = Orders.query
+        query = Orders.eager_query()
         
         if status:
             query = query.filter_by(status=status)
         
-        orders = query.order_by(Orders.order_date.desc()).all()
+        orders, next_cursor = keyset_paginate(query, Orders.order_date, Orders.order_id)
         
         return jsonify({
             'orders': [order.to_dict() for order in orders],
-            'count': len(orders)
+            'count': len(orders),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @admin_bp.route('/orders/<int:order_id>/status', methods=['PUT'])
-@jwt_required()
+@admin_required()
 def update_order_status(order_id):
     """Update order status"""
     try:
@@ -218,6 +345,8 @@ def update_order_status(order_id):
         if data['status'] not in valid_statuses:
             return jsonify({'error': f'Invalid status. Must be one of: {valid_statuses}'}), 400
         
+        # Move the order's totals in the daily rollups in the same transaction
+        move_order(order, order.status, data['status'])
         order.status = data['status']
         db.session.commit()
         
@@ -231,77 +360,261 @@ def update_order_status(order_id):
         return jsonify({'error': str(e)}), 500
 
 
-# ===== SALES REPORTS =====
-@admin_bp.route('/reports/sales', methods=['GET'])
-@jwt_required()
-def get_sales_report():
-    """Generate sales report"""
+@admin_bp.route('/orders/cancel', methods=['POST'])
+@admin_required()
+def bulk_cancel_orders():
+    """
+    Cancel many Pending orders in one transaction
+    - Body: {"order_ids": [...]} and/or {"start_date": ..., "end_date": ...}
+      (e.g. everything placed after a store closed early)
+    - Orders that are not Pending are reported as skipped
+    """
     try:
-        # Get date range from query params
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        data = request.get_json() or {}
+        order_ids = data.get('order_ids')
         
-        query = Orders.query.filter_by(status='Completed')
+        try:
+            start_date = parse_bound(data.get('start_date'))
+            end_date = parse_bound(data.get('end_date'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if start_date:
+        if not order_ids and start_date is None and end_date is None:
+            return jsonify({'error': 'order_ids or a date range is required'}), 400
+        
+        query = Orders.query
+        if order_ids:
+            if not isinstance(order_ids, list):
+                return jsonify({'error': 'order_ids must be a list'}), 400
+            try:
+                order_ids = [int(order_id) for order_id in order_ids]
+            except (ValueError, TypeError):
+                return jsonify({'error': 'order_ids must be integers'}), 400
+            query = query.filter(Orders.order_id.in_(order_ids))
+        if start_date is not None:
             query = query.filter(Orders.order_date >= start_date)
-        if end_date:
+        if end_date is not None:
             query = query.filter(Orders.order_date <= end_date)
         
-        orders = query.all()
+        try:
+            orders = lock_pending_orders(query)
+            cancelled_ids = [order.order_id for order in orders]
+            cancel_orders(orders)
+            db.session.commit()
+        except CancellationConflict as e:
+            db.session.rollback()
+            return jsonify({'error': f'{e}, please retry'}), 409
+        except Exception as e:
+            db.session.rollback()
+            raise e
         
-        # Calculate statistics
-        total_revenue = sum(float(order.total_amount) for order in orders)
-        total_orders = len(orders)
-        avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+        skipped_ids = sorted(set(order_ids or []) - set(cancelled_ids))
         
         return jsonify({
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
-            'average_order_value': round(avg_order_value, 2),
-            'orders': [order.to_dict() for order in orders]
+            'message': f'{len(cancelled_ids)} orders cancelled',
+            'cancelled_order_ids': cancelled_ids,
+            'skipped_order_ids': skipped_ids,
+            'count': len(cancelled_ids)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ===== SALES REPORTS =====
+@admin_bp.route('/reports/sales', methods=['GET'])
+@admin_required()
+def get_sales_report():
+    """
+    Generate sales report
+    - Totals are aggregated in SQL, from the daily rollups for closed days
+      and from raw orders for today
+    - ?group_by=day|week|month|product|category|payment_method adds a breakdown
+    - ?include_orders=true adds a page of the matching orders
+    """
+    try:
+        # Get date range from query params
+        try:
+            start_date = parse_bound(request.args.get('start_date'))
+            end_date = parse_bound(request.args.get('end_date'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        group_by = request.args.get('group_by')
+        include_orders = request.args.get('include_orders', 'false').lower() == 'true'
+        
+        if group_by and group_by not in GROUPINGS:
+            return jsonify({'error': f'Invalid group_by. Must be one of: {list(GROUPINGS)}'}), 400
+        
+        report = sales_totals(start_date, end_date)
+        
+        if group_by:
+            report['group_by'] = group_by
+            report['breakdown'] = sales_breakdown(group_by, start_date, end_date)
+        
+        if include_orders:
+            query = Orders.eager_query().filter(*completed_orders_filter(start_date, end_date))
+            orders, next_cursor = keyset_paginate(query, Orders.order_date, Orders.order_id)
+            report['orders'] = [order.to_dict() for order in orders]
+            report['next_cursor'] = next_cursor
+        
+        return jsonify(report), 200
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ===== CUSTOMER MANAGEMENT =====
 @admin_bp.route('/customers', methods=['GET'])
-@jwt_required()
+@admin_required()
 def get_all_customers():
-    """Get all customers"""
+    """Get customers (paginated by customer_id)"""
     try:
-        customers = Customer.query.all()
+        customers, next_cursor = keyset_paginate(
+            Customer.query, Customer.customer_id, descending=False
+        )
         
         return jsonify({
             'customers': [customer.to_dict() for customer in customers],
-            'count': len(customers)
+            'count': len(customers),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+SEGMENT_SORTS = {
+    'monetary': (CustomerSegment.monetary, True),
+    'frequency': (CustomerSegment.frequency, True),
+    'recency': (CustomerSegment.recency_days, False)
+}
+
+
+@admin_bp.route('/customers/segments', methods=['GET'])
+@admin_required()
+def get_customer_segments():
+    """
+    Get customers with their RFM scores (paginated)
+    Filters: segment, min_monetary, min_frequency, min_recency_days, max_recency_days
+    Sort: monetary (default) or frequency, highest first; recency, most recent first
+    """
+    try:
+        sort = request.args.get('sort', 'monetary')
+        if sort not in SEGMENT_SORTS:
+            return jsonify({'error': f'Invalid sort. Must be one of: {list(SEGMENT_SORTS)}'}), 400
+        
+        query = CustomerSegment.eager_query()
+        
+        segment = request.args.get('segment')
+        if segment:
+            query = query.filter(CustomerSegment.segment == segment)
+        
+        min_monetary = request.args.get('min_monetary', type=float)
+        if min_monetary is not None:
+            query = query.filter(CustomerSegment.monetary >= min_monetary)
+        min_frequency = request.args.get('min_frequency', type=int)
+        if min_frequency is not None:
+            query = query.filter(CustomerSegment.frequency >= min_frequency)
+        min_recency = request.args.get('min_recency_days', type=int)
+        if min_recency is not None:
+            query = query.filter(CustomerSegment.recency_days >= min_recency)
+        max_recency = request.args.get('max_recency_days', type=int)
+        if max_recency is not None:
+            query = query.filter(CustomerSegment.recency_days <= max_recency)
+        
+        column, descending = SEGMENT_SORTS[sort]
+        if sort == 'recency':
+            # Customers without orders have no recency to sort on
+            query = query.filter(CustomerSegment.recency_days.isnot(None))
+        
+        segments, next_cursor = keyset_paginate(
+            query, column, CustomerSegment.customer_id, descending=descending
+        )
+        
+        return jsonify({
+            'customers': [segment.to_dict() for segment in segments],
+            'count': len(segments),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/customers/segments/summary', methods=['GET'])
+@admin_required()
+def get_customer_segment_summary():
+    """Get customer counts per segment and when they were computed"""
+    try:
+        rows = db.session.query(
+            CustomerSegment.segment,
+            func.count(CustomerSegment.customer_id),
+            func.sum(CustomerSegment.monetary)
+        ).group_by(CustomerSegment.segment).all()
+        computed_at = db.session.query(func.max(CustomerSegment.computed_at)).scalar()
+        
+        return jsonify({
+            'segments': [{
+                'segment': segment,
+                'customers': count,
+                'monetary': float(monetary or 0)
+            } for segment, count, monetary in rows],
+            'computed_at': computed_at.isoformat() if computed_at else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/customers/segments/refresh', methods=['POST'])
+@admin_required()
+def refresh_customer_segments():
+    """Recompute RFM scores for every customer"""
+    try:
+        counts = refresh_segments()
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Customer segments refreshed',
+            'segments': counts
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ===== REVIEW MANAGEMENT =====
 @admin_bp.route('/reviews', methods=['GET'])
-@jwt_required()
+@admin_required()
 def get_all_reviews():
-    """Get all reviews"""
+    """Get reviews (paginated, newest first)"""
     try:
-        reviews = Review.query.order_by(Review.review_date.desc()).all()
+        reviews, next_cursor = keyset_paginate(
+            review_rows(), Review.review_date, Review.review_id
+        )
         
         return jsonify({
-            'reviews': [review.to_dict() for review in reviews],
-            'count': len(reviews)
+            'reviews': [review_dict(review) for review in reviews],
+            'count': len(reviews),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @admin_bp.route('/reviews/<int:review_id>', methods=['DELETE'])
-@jwt_required()
+@admin_required()
 def delete_review_admin(review_id):
     """Delete a review (admin can delete any review)"""
     try:
@@ -310,8 +623,12 @@ def delete_review_admin(review_id):
         if not review:
             return jsonify({'error': 'Review not found'}), 404
         
+        product_id = review.product_id
+        apply_rating(product_id, removed=review.rating)
         db.session.delete(review)
         db.session.commit()
+        catalog_cache.refresh_ratings(product_id)
+        review_cache.invalidate(product_id)
         
         return jsonify({'message': 'Review deleted successfully'}), 200
         
@@ -1,8 +1,10 @@
 # app/routes/auth.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, current_user
 from app.models import db, Customer
-import bcrypt
+from app.passwords import password_hasher, PasswordHasherBusy
+from app.identity import customer_cache
+from app.throttle import login_throttle
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -22,11 +24,8 @@ def register():
         if Customer.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email already registered'}), 400
         
-        # Hash password
-        hashed_password = bcrypt.hashpw(
-            data['password'].encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        # Hash password (on the hashing pool)
+        hashed_password = password_hasher.hash_password(data['password'])
         
         # Create new customer
         new_customer = Customer(
@@ -46,6 +45,9 @@ def register():
             'customer': new_customer.to_dict()
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -61,6 +63,11 @@ def login():
         if not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Email and password are required'}), 400
         
+        # Throttle before any query or bcrypt work
+        wait = login_throttle.check('customer', request.remote_addr, data['email'])
+        if wait:
+            return jsonify({'error': 'Too many login attempts, please try again later'}), 429, {'Retry-After': str(wait)}
+        
         # Find customer
         customer = Customer.query.filter_by(email=data['email']).first()
         
@@ -68,12 +75,15 @@ def login():
             return jsonify({'error': 'Invalid email or password'}), 401
         
         # Verify password
-        if not bcrypt.checkpw(
-            data['password'].encode('utf-8'),
-            customer.password.encode('utf-8')
-        ):
+        if not password_hasher.check_password(data['password'], customer.password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Upgrade hashes made with an older BCRYPT_ROUNDS
+        if password_hasher.upgrade(customer, data['password']):
+            db.session.commit()
+        
+        login_throttle.succeeded('customer', request.remote_addr, data['email'])
+        
         # Create JWT token - convert customer_id to string for JWT compatibility
         access_token = create_access_token(identity=str(customer.customer_id))
         
@@ -83,6 +93,9 @@ def login():
             'customer': customer.to_dict()
         }), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -92,13 +105,13 @@ def login():
 def get_profile():
     """Get current customer profile"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
-        customer = Customer.query.get(customer_id)
+        # Served from the short-lived customer cache when possible
+        customer = current_user.profile()
         
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        return jsonify({'customer': customer.to_dict()}), 200
+        return jsonify({'customer': customer}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -109,8 +122,7 @@ def get_profile():
 def update_profile():
     """Update customer profile"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
-        customer = Customer.query.get(customer_id)
+        customer = current_user.model
         
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
@@ -125,6 +137,7 @@ def update_profile():
         if 'address' in data:
             customer.address = data['address']
         
+        customer_cache.invalidate_on_commit(customer.customer_id)
         db.session.commit()
         
         return jsonify({
@@ -142,8 +155,7 @@ def update_profile():
 def change_password():
     """Change customer password"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
-        customer = Customer.query.get(customer_id)
+        customer = current_user.model
         
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
@@ -155,23 +167,20 @@ def change_password():
             return jsonify({'error': 'Old and new passwords are required'}), 400
         
         # Verify old password
-        if not bcrypt.checkpw(
-            data['old_password'].encode('utf-8'),
-            customer.password.encode('utf-8')
-        ):
+        if not password_hasher.check_password(data['old_password'], customer.password):
             return jsonify({'error': 'Incorrect old password'}), 401
         
         # Hash new password
-        hashed_password = bcrypt.hashpw(
-            data['new_password'].encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        hashed_password = password_hasher.hash_password(data['new_password'])
         
         customer.password = hashed_password
         db.session.commit()
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
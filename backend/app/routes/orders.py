@@ -1,9 +1,16 @@
 # app/routes/orders.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Orders, OrderDetails, Payment, Product, Customer, RewardTransaction
+from flask import Blueprint, request, jsonify, current_app, make_response
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
+from app.models import db, Orders, OrderDetails, Payment
+from app.pagination import keyset_paginate, PaginationError
+from app.rollup import record_order
+from app.cancellation import cancel_orders, CancellationConflict
+from app.inventory import cart_quantities, lock_products, reserve_stock, find_shortage
+from app.idempotency import idempotent, complete_request
+from app.points import change_points, InsufficientPoints
+from app.order_batch import ingest_orders
+from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
-from datetime import datetime
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -14,6 +21,7 @@ def handle_options():
 
 @orders_bp.route('/', methods=['POST'], strict_slashes=False)
 @jwt_required()
+@idempotent('orders')
 def create_order():
     """
     Create a new order with transaction handling
@@ -21,10 +29,12 @@ def create_order():
     - Creates order and order details
     - Records payment
     - Awards reward points
+    - Updates the daily sales rollups
+    - Honours the Idempotency-Key header so retries do not duplicate the order
     """
     print("create_order", request.get_json())
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
+        customer_id = current_user.customer_id
         data = request.get_json()
         
         # Validate required fields
@@ -39,20 +49,27 @@ def create_order():
             total_amount = Decimal('0.00')
             order_items = []
             
+            try:
+                quantities = cart_quantities(data['items'])
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+            
+            # Fetch every product in the cart in one query, locking the rows
+            products = lock_products(quantities)
+            
             # Validate items and calculate total
-            for item in data['items']:
-                product = Product.query.get(item['product_id'])
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
                 
                 if not product:
-                    return jsonify({'error': f'Product {item["product_id"]} not found'}), 404
-                
-                quantity = int(item['quantity'])
+                    db.session.rollback()
+                    return jsonify({'error': f'Product {product_id} not found'}), 404
                 
                 # Check stock availability
                 if product.stock_quantity < quantity:
-                    return jsonify({
-                        'error': f'Insufficient stock for {product.name}. Available: {product.stock_quantity}'
-                    }), 400
+                    error = f'Insufficient stock for {product.name}. Available: {product.stock_quantity}'
+                    db.session.rollback()
+                    return jsonify({'error': error}), 400
                 
                 subtotal = product.price * quantity
                 total_amount += subtotal
@@ -68,7 +85,7 @@ def create_order():
             total_amount += delivery_fee
             
             # Get customer (needed for points redemption and/or earning)
-            customer = Customer.query.get(customer_id)
+            customer = current_user.model
             if not customer:
                 return jsonify({'error': 'Customer not found'}), 404
             
@@ -84,7 +101,7 @@ def create_order():
                         'error': 'Minimum 100 points required to redeem rewards'
                     }), 400
                 
-                # Check if customer has enough points
+                # Check if customer has enough points (re-checked atomically below)
                 if customer.reward_points < points_to_redeem:
                     return jsonify({
                         'error': f'Insufficient points. Available: {customer.reward_points}'
@@ -95,19 +112,7 @@ def create_order():
                 
                 # Apply discount to total (ensure total doesn't go negative)
                 total_amount = max(Decimal('0.00'), total_amount - discount_amount)
-                
-                # Deduct points
-                customer.reward_points -= points_to_redeem
                 points_redeemed = points_to_redeem
-                
-                # Record reward transaction for redemption
-                redemption_transaction = RewardTransaction(
-                    customer_id=customer_id,
-                    points_earned=0,
-                    points_redeemed=points_to_redeem,
-                    description=f'Redeemed {points_to_redeem} points for discount on Order'
-                )
-                db.session.add(redemption_transaction)
             
             # Create order
             new_order = Orders(
@@ -118,7 +123,7 @@ def create_order():
             db.session.add(new_order)
             db.session.flush()  # Get order_id without committing
             
-            # Create order details and update stock
+            # Create order details
             for item in order_items:
                 order_detail = OrderDetails(
                     order_id=new_order.order_id,
@@ -127,9 +132,16 @@ def create_order():
                     subtotal=item['subtotal']
                 )
                 db.session.add(order_detail)
-                
-                # Update product stock
-                item['product'].stock_quantity -= item['quantity']
+            
+            # Update product stock in one conditional UPDATE; if another checkout
+            # took the stock since we read it, nothing is sold
+            if not reserve_stock(quantities):
+                db.session.rollback()
+                product, available = find_shortage(quantities)
+                name = product.name if product else 'an item in your order'
+                return jsonify({
+                    'error': f'Insufficient stock for {name}. Available: {available}'
+                }), 400
             
             # Create payment record
             payment = Payment(
@@ -145,29 +157,34 @@ def create_order():
             original_total = total_amount + discount_amount
             points_earned = int(original_total / 100)
             
-            if points_earned > 0:
-                # Update customer reward points
-                customer.reward_points += points_earned
-                
-                # Record reward transaction
-                reward_transaction = RewardTransaction(
-                    customer_id=customer_id,
-                    points_earned=points_earned,
-                    points_redeemed=0,
-                    description=f'Points earned from Order #{new_order.order_id}'
-                )
-                db.session.add(reward_transaction)
+            # Deduct redeemed and add earned points in one conditional UPDATE,
+            # recording both reward transactions
+            try:
+                change_points(customer_id, [
+                    (0, points_redeemed, f'Redeemed {points_redeemed} points for discount on Order #{new_order.order_id}'),
+                    (points_earned, 0, f'Points earned from Order #{new_order.order_id}')
+                ], order_id=new_order.order_id)
+            except InsufficientPoints as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
             
-            # Commit transaction
-            db.session.commit()
+            # Add the order to the daily sales rollups
+            db.session.flush()
+            record_order(new_order)
             
-            return jsonify({
+            response = make_response(jsonify({
                 'message': 'Order placed successfully',
                 'order': new_order.to_dict(),
                 'points_earned': points_earned,
                 'points_redeemed': points_redeemed,
                 'discount_amount': float(discount_amount)
-            }), 201
+            }), 201)
+            
+            # Store the Idempotency-Key response with the order, then commit
+            complete_request(response)
+            db.session.commit()
+            
+            return response
             
         except Exception as e:
             db.session.rollback()
@@ -177,22 +194,68 @@ def create_order():
         return jsonify({'error': str(e)}), 500
 
 
+@orders_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_orders_batch():
+    """
+    Place a batch of orders queued by a POS terminal while offline
+    - Body: {"orders": [{"client_id": ..., "items": [...], "payment_method": ...}, ...]}
+    - Admin (POS) tokens may also send customer_id and order_date (UTC, within
+      ORDER_BATCH_MAX_AGE_HOURS); reward ledger rows are stamped with server time
+    - Invalid orders are reported individually, the rest are placed together
+    - client_ids already placed are returned as duplicates, not placed twice
+    """
+    try:
+        data = request.get_json() or {}
+        orders = data.get('orders')
+        
+        if not isinstance(orders, list) or len(orders) == 0:
+            return jsonify({'error': 'orders must be a non-empty list'}), 400
+        
+        max_size = current_app.config['ORDER_BATCH_MAX_SIZE']
+        if len(orders) > max_size:
+            return jsonify({'error': f'A batch can contain at most {max_size} orders'}), 400
+        
+        try:
+            results = ingest_orders(orders, get_jwt_identity())
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Some orders in this batch are being placed by another request, please retry'}), 409
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        
+        return jsonify({
+            'results': results,
+            'created': sum(1 for r in results if r['status'] == 'created'),
+            'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+            'failed': sum(1 for r in results if r['status'] == 'error')
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @orders_bp.route('/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def get_customer_orders():
-    """Get all orders for the logged-in customer"""
+    """Get orders for the logged-in customer (paginated, newest first)"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
+        customer_id = current_user.customer_id
         
-        orders = Orders.query.filter_by(customer_id=customer_id)\
-                             .order_by(Orders.order_date.desc())\
-                             .all()
+        orders, next_cursor = keyset_paginate(
+            Orders.eager_query().filter_by(customer_id=customer_id),
+            Orders.order_date, Orders.order_id
+        )
         
         return jsonify({
             'orders': [order.to_dict() for order in orders],
-            'count': len(orders)
+            'count': len(orders),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -202,9 +265,9 @@ def get_customer_orders():
 def get_order_details(order_id):
     """Get details of a specific order"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
+        customer_id = current_user.customer_id
         
-        order = Orders.query.filter_by(
+        order = Orders.eager_query().filter_by(
             order_id=order_id,
             customer_id=customer_id
         ).first()
@@ -223,7 +286,7 @@ def get_order_details(order_id):
 def cancel_order(order_id):
     """Cancel an order (only if status is Pending)"""
     try:
-        customer_id = int(get_jwt_identity())  # Convert string to int
+        customer_id = current_user.customer_id
         
         order = Orders.query.filter_by(
             order_id=order_id,
@@ -236,45 +299,24 @@ def cancel_order(order_id):
         if order.status != 'Pending':
             return jsonify({'error': 'Only pending orders can be cancelled'}), 400
         
-        # Start transaction to restore stock
+        # Start transaction to restore stock, refund and take back points
         try:
-            # Restore product stock
-            for detail in order.order_details:
-                product = Product.query.get(detail.product_id)
-                if product:
-                    product.stock_quantity += detail.quantity
-            
-            # Update order status
-            order.status = 'Cancelled'
-            
-            # Update payment status
-            if order.payment:
-                order.payment.status = 'Refunded'
-            
-            # Deduct reward points if they were earned
-            points_to_deduct = int(order.total_amount / 100)
-            if points_to_deduct > 0:
-                customer = Customer.query.get(customer_id)
-                customer.reward_points = max(0, customer.reward_points - points_to_deduct)
-                
-                reward_transaction = RewardTransaction(
-                    customer_id=customer_id,
-                    points_earned=0,
-                    points_redeemed=points_to_deduct,
-                    description=f'Points deducted due to Order #{order_id} cancellation'
-                )
-                db.session.add(reward_transaction)
-            
+            cancel_orders([order])
             db.session.commit()
             
-            return jsonify({
-                'message': 'Order cancelled successfully',
-                'order': order.to_dict()
-            }), 200
-            
+        except CancellationConflict:
+            db.session.rollback()
+            return jsonify({'error': 'Only pending orders can be cancelled'}), 400
         except Exception as e:
             db.session.rollback()
             raise e
+        
+        order = Orders.eager_query().filter_by(order_id=order_id).first()
+        
+        return jsonify({
+            'message': 'Order cancelled successfully',
+            'order': order.to_dict()
+        }), 200
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,8 @@
 # app/routes/products.py
-from flask import Blueprint, request, jsonify
-from app.models import db, Product, Category
-from sqlalchemy import or_
+from flask import Blueprint, request, jsonify, current_app
+from app.cache import catalog_cache
+from app.featured import featured_products
+from app.recommendations import recommend
 
 products_bp = Blueprint('products', __name__)
 
@@ -12,41 +13,43 @@ def handle_options():
 
 @products_bp.route('/', methods=['GET'], strict_slashes=False)
 def get_all_products():
-    """Get all products with optional filtering"""
+    """Get all products with optional filtering and sorting"""
     try:
         # Get query parameters
         category_id = request.args.get('category_id', type=int)
         search = request.args.get('search', '')
         min_price = request.args.get('min_price', type=float)
         max_price = request.args.get('max_price', type=float)
+        sort = request.args.get('sort')
         
-        # Base query
-        query = Product.query
+        if sort not in (None, '', 'rating'):
+            return jsonify({'error': 'Invalid sort. Must be: rating'}), 400
         
-        # Apply filters
-        if category_id:
-            query = query.filter(Product.category_id == category_id)
+        catalog = catalog_cache.get()
         
+        # Everything is served from the cached catalog; searches use its
+        # inverted index and come back ranked by relevance
         if search:
-            query = query.filter(
-                or_(
-                    Product.name.ilike(f'%{search}%'),
-                    Product.description.ilike(f'%{search}%')
-                )
-            )
+            products_by_id = catalog['products_by_id']
+            products = [products_by_id[pid] for pid in catalog['search'].search(search)]
+            if category_id:
+                products = [p for p in products if p['category_id'] == category_id]
+        elif category_id:
+            products = catalog['products_by_category'].get(category_id, [])
+        else:
+            products = catalog['products']
         
         if min_price is not None:
-            query = query.filter(Product.price >= min_price)
-        
+            products = [p for p in products if p['price'] >= min_price]
         if max_price is not None:
-            query = query.filter(Product.price <= max_price)
+            products = [p for p in products if p['price'] <= max_price]
         
-        # Execute query
-        products = query.all()
-        print("------------ products: ", products)
+        # Highest rated first, more reviews breaking ties
+        if sort == 'rating':
+            products = sorted(products, key=lambda p: (-p['average_rating'], -p['rating_count'], p['product_id']))
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'count': len(products)
         }), 200
         
@@ -58,12 +61,12 @@ def get_all_products():
 def get_product(product_id):
     """Get a single product by ID"""
     try:
-        product = Product.query.get(product_id)
+        product = catalog_cache.get()['products_by_id'].get(product_id)
         
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        return jsonify({'product': product.to_dict()}), 200
+        return jsonify({'product': product}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -73,10 +76,10 @@ def get_product(product_id):
 def get_categories():
     """Get all product categories"""
     try:
-        categories = Category.query.all()
+        categories = catalog_cache.get()['categories']
         
         return jsonify({
-            'categories': [category.to_dict() for category in categories]
+            'categories': categories
         }), 200
         
     except Exception as e:
@@ -87,16 +90,17 @@ def get_categories():
 def get_products_by_category(category_id):
     """Get all products in a specific category"""
     try:
-        category = Category.query.get(category_id)
+        catalog = catalog_cache.get()
+        category = catalog['categories_by_id'].get(category_id)
         
         if not category:
             return jsonify({'error': 'Category not found'}), 404
         
-        products = Product.query.filter_by(category_id=category_id).all()
+        products = catalog['products_by_category'].get(category_id, [])
         
         return jsonify({
-            'category': category.to_dict(),
-            'products': [product.to_dict() for product in products],
+            'category': category,
+            'products': products,
             'count': len(products)
         }), 200
         
@@ -106,16 +110,70 @@ def get_products_by_category(category_id):
 
 @products_bp.route('/featured', methods=['GET'])
 def get_featured_products():
-    """Get featured/popular products (top 8 by stock or custom logic)"""
+    """Get featured/popular products (top 8 by recent sales velocity)"""
     try:
-        # Get products with highest stock (you can customize this logic)
-        products = Product.query.filter(Product.stock_quantity > 0)\
-                                 .order_by(Product.stock_quantity.desc())\
-                                 .limit(8)\
-                                 .all()
+        # Ranking is precomputed in the background, product data comes
+        # from the cached catalog
+        products = featured_products.pick(catalog_cache.get())
+        
+        return jsonify({
+            'products': products
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _recommended_products(product_ids):
+    """Catalog entries for the products most often bought with product_ids"""
+    limit = min(request.args.get('limit', 4, type=int), current_app.config['RECOMMENDATIONS_TOP_K'])
+    products_by_id = catalog_cache.get()['products_by_id']
+    
+    products = []
+    for product_id, score in recommend(set(product_ids), current_app.config['RECOMMENDATIONS_TOP_K']):
+        product = products_by_id.get(product_id)
+        if product and (product['stock_quantity'] or 0) > 0:
+            products.append(dict(product, score=round(score, 4)))
+            if len(products) == limit:
+                break
+    return products
+
+
+@products_bp.route('/<int:product_id>/recommendations', methods=['GET'])
+def get_product_recommendations(product_id):
+    """Get products customers also bought with this product"""
+    try:
+        if product_id not in catalog_cache.get()['products_by_id']:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        products = _recommended_products([product_id])
+        
+        return jsonify({
+            'product_id': product_id,
+            'products': products
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@products_bp.route('/recommendations', methods=['GET'])
+def get_cart_recommendations():
+    """Get upsell suggestions for a cart (?product_ids=1,2,3)"""
+    try:
+        try:
+            product_ids = [int(pid) for pid in request.args.get('product_ids', '').split(',') if pid.strip()]
+        except ValueError:
+            return jsonify({'error': 'product_ids must be a comma separated list of ids'}), 400
+        
+        if not product_ids:
+            return jsonify({'error': 'product_ids is required'}), 400
+        
+        products = _recommended_products(product_ids)
         
         return jsonify({
-            'products': [product.to_dict() for product in products]
+            'product_ids': product_ids,
+            'products': products
         }), 200
         
     except Exception as e:
@@ -1,21 +1,31 @@
 # app/routes/reviews.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Review, Product, Customer
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Review, Product
+from app.pagination import keyset_paginate, get_limit, PaginationError
+from app.reviews import review_rows, review_dict, review_cache
+from app.ratings import apply_rating
+from app.cache import catalog_cache
 
 reviews_bp = Blueprint('reviews', __name__)
 
 @reviews_bp.route('/', methods=['GET'], strict_slashes=False)
 def get_all_reviews():
-    """Get all reviews"""
+    """Get reviews (paginated, newest first)"""
     try:
-        reviews = Review.query.order_by(Review.review_date.desc()).all()
+        reviews, next_cursor = keyset_paginate(
+            review_rows(), Review.review_date, Review.review_id
+        )
         
         return jsonify({
-            'reviews': [review.to_dict() for review in reviews],
-            'count': len(reviews)
+            'reviews': [review_dict(review) for review in reviews],
+            'count': len(reviews),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -25,7 +35,7 @@ def get_all_reviews():
 def create_review():
     """Submit a product review"""
     try:
-        customer_id = get_jwt_identity()
+        customer_id = current_user.customer_id
         data = request.get_json()
         
         # Validate required fields
@@ -44,25 +54,25 @@ def create_review():
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        # Check if customer already reviewed this product
-        existing_review = Review.query.filter_by(
-            customer_id=customer_id,
-            product_id=data['product_id']
-        ).first()
-        
-        if existing_review:
-            return jsonify({'error': 'You have already reviewed this product'}), 400
-        
-        # Create review
+        # Create review; the (customer_id, product_id) unique constraint
+        # rejects a second review, even from concurrent requests
         new_review = Review(
             customer_id=customer_id,
-            product_id=data['product_id'],
+            product_id=product.product_id,
             rating=rating,
             comment=data.get('comment', '')
         )
         
         db.session.add(new_review)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'You have already reviewed this product'}), 400
+        apply_rating(product.product_id, added=rating)
         db.session.commit()
+        catalog_cache.refresh_ratings(product.product_id)
+        review_cache.invalidate(product.product_id)
         
         return jsonify({
             'message': 'Review submitted successfully',
@@ -76,30 +86,49 @@ def create_review():
 
 @reviews_bp.route('/product/<int:product_id>', methods=['GET'])
 def get_product_reviews(product_id):
-    """Get all reviews for a specific product"""
+    """Get reviews for a specific product (paginated, newest first)"""
     try:
-        # Check if product exists
-        product = Product.query.get(product_id)
+        limit = get_limit()
+        first_page = not request.args.get('cursor')
+        
+        # The first page and rating stats are cached briefly per product
+        if first_page:
+            cached = review_cache.get(product_id, limit)
+            if cached is not None:
+                return jsonify(cached), 200
+            version = review_cache.version(product_id)
+        
+        # Rating stats come from the product's stored aggregates
+        product = db.session.query(
+            Product.name, Product.rating_count, Product.rating_sum,
+            *[Product.__table__.c[f'rating_{star}'] for star in range(1, 6)]
+        ).filter(Product.product_id == product_id).first()
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        reviews = Review.query.filter_by(product_id=product_id)\
-                              .order_by(Review.review_date.desc())\
-                              .all()
-        
-        # Calculate average rating
-        avg_rating = 0
-        if reviews:
-            avg_rating = sum(review.rating for review in reviews) / len(reviews)
+        reviews, next_cursor = keyset_paginate(
+            review_rows().filter(Review.product_id == product_id),
+            Review.review_date, Review.review_id
+        )
         
-        return jsonify({
+        rating_count = product.rating_count or 0
+        result = {
             'product_id': product_id,
             'product_name': product.name,
-            'reviews': [review.to_dict() for review in reviews],
+            'reviews': [review_dict(review) for review in reviews],
             'count': len(reviews),
-            'average_rating': round(avg_rating, 2)
-        }), 200
-        
+            'next_cursor': next_cursor,
+            'rating_count': rating_count,
+            'average_rating': round((product.rating_sum or 0) / rating_count, 2) if rating_count else 0,
+            'rating_histogram': {str(star): getattr(product, f'rating_{star}') or 0 for star in range(1, 6)}
+        }
+        if first_page:
+            review_cache.set(product_id, limit, version, result)
+        
+        return jsonify(result), 200
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -107,19 +136,23 @@ def get_product_reviews(product_id):
 @reviews_bp.route('/customer', methods=['GET'])
 @jwt_required()
 def get_customer_reviews():
-    """Get all reviews by the logged-in customer"""
+    """Get reviews by the logged-in customer (paginated, newest first)"""
     try:
-        customer_id = get_jwt_identity()
+        customer_id = current_user.customer_id
         
-        reviews = Review.query.filter_by(customer_id=customer_id)\
-                              .order_by(Review.review_date.desc())\
-                              .all()
+        reviews, next_cursor = keyset_paginate(
+            review_rows().filter(Review.customer_id == customer_id),
+            Review.review_date, Review.review_id
+        )
         
         return jsonify({
-            'reviews': [review.to_dict() for review in reviews],
-            'count': len(reviews)
+            'reviews': [review_dict(review) for review in reviews],
+            'count': len(reviews),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -129,7 +162,7 @@ def get_customer_reviews():
 def update_review(review_id):
     """Update a review (only by the review author)"""
     try:
-        customer_id = get_jwt_identity()
+        customer_id = current_user.customer_id
         
         review = Review.query.filter_by(
             review_id=review_id,
@@ -146,6 +179,7 @@ def update_review(review_id):
             rating = int(data['rating'])
             if rating < 1 or rating > 5:
                 return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+            apply_rating(review.product_id, added=rating, removed=review.rating)
             review.rating = rating
         
         # Update comment if provided
@@ -153,6 +187,9 @@ def update_review(review_id):
             review.comment = data['comment']
         
         db.session.commit()
+        if 'rating' in data:
+            catalog_cache.refresh_ratings(review.product_id)
+        review_cache.invalidate(review.product_id)
         
         return jsonify({
             'message': 'Review updated successfully',
@@ -169,7 +206,7 @@ def update_review(review_id):
 def delete_review(review_id):
     """Delete a review (only by the review author)"""
     try:
-        customer_id = get_jwt_identity()
+        customer_id = current_user.customer_id
         
         review = Review.query.filter_by(
             review_id=review_id,
@@ -179,8 +216,12 @@ def delete_review(review_id):
         if not review:
             return jsonify({'error': 'Review not found'}), 404
         
+        product_id = review.product_id
+        apply_rating(product_id, removed=review.rating)
         db.session.delete(review)
         db.session.commit()
+        catalog_cache.refresh_ratings(product_id)
+        review_cache.invalidate(product_id)
         
         return jsonify({'message': 'Review deleted successfully'}), 200
         
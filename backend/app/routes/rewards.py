@@ -1,7 +1,10 @@
 # app/routes/rewards.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Customer, RewardTransaction
+from flask_jwt_extended import jwt_required, current_user
+from app.models import db, RewardTransaction
+from app.pagination import keyset_paginate, PaginationError
+from app.points import change_points, InsufficientPoints
+from app.ledger import running_balances
 
 rewards_bp = Blueprint('rewards', __name__)
 
@@ -10,23 +13,31 @@ rewards_bp = Blueprint('rewards', __name__)
 def get_rewards():
     """Get customer's reward points and transaction history"""
     try:
-        customer_id = get_jwt_identity()
+        customer_id = current_user.customer_id
         
-        customer = Customer.query.get(customer_id)
+        # Balance comes from the customer cache (dropped on every points write)
+        customer = current_user.profile()
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        # Get reward transactions
-        transactions = RewardTransaction.query.filter_by(customer_id=customer_id)\
-                                              .order_by(RewardTransaction.transaction_date.desc())\
-                                              .all()
+        # Get reward transactions (paginated, newest first)
+        transactions, next_cursor = keyset_paginate(
+            RewardTransaction.query.filter_by(customer_id=customer_id),
+            RewardTransaction.transaction_date, RewardTransaction.reward_id
+        )
+        
+        # Running balance per row: nearest ledger snapshot + the rows after it
+        balances = running_balances(customer_id, transactions)
         
         return jsonify({
-            'reward_points': customer.reward_points,
-            'transactions': [t.to_dict() for t in transactions],
-            'transactions_count': len(transactions)
+            'reward_points': customer['reward_points'],
+            'transactions': [dict(t.to_dict(), balance_after=balances.get(t.reward_id)) for t in transactions],
+            'transactions_count': len(transactions),
+            'next_cursor': next_cursor
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -39,7 +50,6 @@ def redeem_points():
     Points can be redeemed at 1 point = 1 PKR discount
     """
     try:
-        customer_id = get_jwt_identity()
         data = request.get_json()
         
         # Validate points
@@ -48,35 +58,27 @@ def redeem_points():
         
         points_to_redeem = int(data['points'])
         
-        customer = Customer.query.get(customer_id)
+        customer = current_user.model
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        # Check if customer has enough points
-        if customer.reward_points < points_to_redeem:
-            return jsonify({
-                'error': f'Insufficient points. Available: {customer.reward_points}'
-            }), 400
-        
-        # Deduct points
-        customer.reward_points -= points_to_redeem
-        
-        # Record transaction
-        reward_transaction = RewardTransaction(
-            customer_id=customer_id,
-            points_earned=0,
-            points_redeemed=points_to_redeem,
-            description=f'Redeemed {points_to_redeem} points for discount'
-        )
+        # Deduct points and record the transaction in one atomic step;
+        # fails if the balance no longer covers the redemption
+        try:
+            remaining_points = change_points(customer.customer_id, [
+                (0, points_to_redeem, f'Redeemed {points_to_redeem} points for discount')
+            ])
+        except InsufficientPoints as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         
-        db.session.add(reward_transaction)
         db.session.commit()
         
         return jsonify({
             'message': 'Points redeemed successfully',
             'points_redeemed': points_to_redeem,
             'discount_amount': points_to_redeem,  # 1 point = 1 PKR
-            'remaining_points': customer.reward_points
+            'remaining_points': remaining_points
         }), 200
         
     except Exception as e:
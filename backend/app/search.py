@@ -0,0 +1,134 @@
+# app/search.py
+import math
+import re
+from bisect import bisect_left
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Field weights: a hit in the name counts more than one in the description
+FIELD_WEIGHTS = (('name', 3.0), ('category_name', 2.0), ('description', 1.0))
+
+# How much each kind of term match is worth relative to an exact match
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+
+# Tokens of at least this many characters may be one / two edits off
+ONE_EDIT_LENGTH = 4
+TWO_EDIT_LENGTH = 8
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _max_edits(term):
+    if term.isdigit() or len(term) < ONE_EDIT_LENGTH:
+        return 0
+    return 2 if len(term) >= TWO_EDIT_LENGTH else 1
+
+
+def _deletes(term, edits):
+    """term plus every variant of it with up to `edits` characters removed"""
+    variants = {term}
+    frontier = {term}
+    for _ in range(edits):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """
+    Inverted index over product name, description and category name
+    - Built from the serialized products of a catalog snapshot
+    - Every query token must match; a token matches a term exactly, as a
+      prefix (type-ahead) or, for longer tokens, within one or two edits
+    - Results are ranked by field weight x idf x match quality
+    """
+
+    def __init__(self, products):
+        self.postings = {}  # term -> {product_id: field weight}
+        for product in products:
+            weights = {}
+            for field, weight in FIELD_WEIGHTS:
+                for term in tokenize(product.get(field)):
+                    weights[term] = max(weights.get(term, 0), weight)
+            for term, weight in weights.items():
+                self.postings.setdefault(term, {})[product['product_id']] = weight
+
+        self.terms = sorted(self.postings)
+        self.idf = {
+            term: math.log(1 + len(products) / len(ids))
+            for term, ids in self.postings.items()
+        }
+
+        # Deletion neighbourhood: terms within n edits share a variant with
+        # at most n characters removed from each side
+        self.variants = {}
+        for term in self.terms:
+            for variant in _deletes(term, _max_edits(term)):
+                self.variants.setdefault(variant, []).append(term)
+
+    def _prefixed(self, token):
+        terms = self.terms
+        index = bisect_left(terms, token)
+        while index < len(terms) and terms[index].startswith(token):
+            yield terms[index]
+            index += 1
+
+    def _fuzzy(self, token, edits):
+        candidates = set()
+        for variant in _deletes(token, edits):
+            candidates.update(self.variants.get(variant, ()))
+        return [term for term in candidates if _edit_distance(token, term, edits) <= edits]
+
+    def _expand(self, token):
+        """Map each term the token matches to its match quality"""
+        matches = {term: PREFIX for term in self._prefixed(token)}
+        if token in self.postings:
+            matches[token] = EXACT
+        edits = _max_edits(token)
+        if edits:
+            for term in self._fuzzy(token, edits):
+                matches.setdefault(term, FUZZY)
+        return matches
+
+    def search(self, text):
+        """Return matching product ids, best match first"""
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in dict.fromkeys(tokens):
+            token_scores = {}
+            for term, quality in self._expand(token).items():
+                idf = self.idf[term]
+                for product_id, weight in self.postings[term].items():
+                    score = weight * idf * quality
+                    if score > token_scores.get(product_id, 0):
+                        token_scores[product_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {pid: score + token_scores[pid] for pid, score in scores.items()
+                          if pid in token_scores}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda pid: (-scores[pid], pid))
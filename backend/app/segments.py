@@ -0,0 +1,97 @@
+# app/segments.py
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, insert, and_
+from app.models import db, Customer, Orders, CustomerSegment
+
+# Checked in order, the first match wins; r/f/m are 1-5 quintile scores
+SEGMENTS = (
+    'Champions',          # bought recently, often and a lot
+    'Lapsed High-Value',  # big spenders who have not ordered in a while
+    'At Risk',            # used to order often, not recently
+    'Hibernating',        # not recent, not frequent
+    'Loyal',              # order often
+    'New',                # first order was recent
+    'Promising',          # recent but not yet frequent
+    'Needs Attention',    # everyone else with orders
+    'No Orders'
+)
+
+
+def quintile_scores(values):
+    """Score values 1-5 by quintile (5 = highest); equal values get equal scores"""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ordered = np.sort(values)
+    share = np.searchsorted(ordered, values, side='right') / len(values)
+    return np.clip(np.ceil(share * 5), 1, 5).astype(np.int64)
+
+
+def classify(r, f, m, frequency):
+    """Segment name per customer from the score arrays"""
+    ordered = frequency > 0
+    conditions = [
+        (r >= 4) & (f >= 4) & (m >= 4),
+        (r <= 2) & (m >= 4),
+        (r <= 2) & (f >= 3),
+        r <= 2,
+        f >= 4,
+        (r >= 4) & (frequency == 1),
+        (r >= 3) & (f <= 2),
+        np.ones(len(r), dtype=bool)
+    ]
+    conditions = [condition & ordered for condition in conditions]
+    return np.select(conditions, list(SEGMENTS[:-1]), default=SEGMENTS[-1])
+
+
+def refresh_segments(now=None):
+    """
+    Recompute every customer's RFM scores and replace the segment table
+    - One aggregate query over non-cancelled orders (outer joined so
+      customers without orders get the 'No Orders' segment)
+    - Scores are quintiles among customers who have ordered
+    Returns {segment: customer count}
+    """
+    now = now or datetime.utcnow()
+    rows = db.session.query(
+        Customer.customer_id,
+        func.max(Orders.order_date),
+        func.count(Orders.order_id),
+        func.coalesce(func.sum(Orders.total_amount), 0)
+    ).select_from(Customer)\
+     .outerjoin(Orders, and_(Orders.customer_id == Customer.customer_id, Orders.status != 'Cancelled'))\
+     .group_by(Customer.customer_id)\
+     .all()
+
+    customer_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    last_orders = [row[1] for row in rows]
+    frequency = np.array([row[2] for row in rows], dtype=np.int64)
+    monetary = np.array([float(row[3]) for row in rows], dtype=np.float64)
+    recency = np.array([(now - last).days if last else -1 for last in last_orders], dtype=np.int64)
+
+    ordered = frequency > 0
+    r = np.zeros(len(rows), dtype=np.int64)
+    f = np.zeros(len(rows), dtype=np.int64)
+    m = np.zeros(len(rows), dtype=np.int64)
+    r[ordered] = quintile_scores(-recency[ordered])  # fewer days since last order scores higher
+    f[ordered] = quintile_scores(frequency[ordered])
+    m[ordered] = quintile_scores(monetary[ordered])
+    segments = classify(r, f, m, frequency)
+
+    CustomerSegment.query.delete(synchronize_session=False)
+    if len(rows):
+        db.session.execute(insert(CustomerSegment), [{
+            'customer_id': int(customer_ids[i]),
+            'last_order_date': last_orders[i],
+            'recency_days': int(recency[i]) if ordered[i] else None,
+            'frequency': int(frequency[i]),
+            'monetary': round(float(monetary[i]), 2),
+            'r_score': int(r[i]),
+            'f_score': int(f[i]),
+            'm_score': int(m[i]),
+            'segment': str(segments[i]),
+            'computed_at': now
+        } for i in range(len(rows))])
+
+    names, counts = np.unique(segments, return_counts=True)
+    return {str(name): int(count) for name, count in zip(names, counts)}
@@ -0,0 +1,169 @@
+# app/throttle.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def _slide(bucket, previous, current, now_bucket):
+    """Roll a key's two fixed-window counters forward to now_bucket"""
+    if bucket == now_bucket:
+        return previous, current
+    if bucket == now_bucket - 1:
+        return current, 0
+    return 0, 0
+
+
+def _retry_after(previous, current, limit, elapsed):
+    """Windows to wait until previous * (1 - elapsed) + current drops below limit"""
+    if current < limit:
+        return 1 - (limit - current) / previous - elapsed
+    # Only once this window becomes the previous one
+    return 1 - elapsed + max(1 - limit / current, 0)
+
+
+class MemoryBackend:
+    """
+    Sliding-window counters in this process's memory
+    - Each key keeps three ints: its window number and the attempt counts of
+      that window and the one before (the "sliding window counter" estimate)
+    - At most max_keys keys are kept; the least recently hit key is evicted
+      first, which only forgets attempts older than anything still tracked
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        """Count an attempt; returns 0 if allowed, else seconds (at least 1) until one would be"""
+        now_bucket, offset = divmod(now, window)
+        elapsed = offset / window
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                previous = current = 0
+                if len(self._counters) >= self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                previous, current = _slide(entry[0], entry[1], entry[2], now_bucket)
+                self._counters.move_to_end(key)
+
+            if previous * (1 - elapsed) + current >= limit:
+                self._counters[key] = (now_bucket, previous, current)
+                return max(_retry_after(previous, current, limit, elapsed) * window, 1)
+            self._counters[key] = (now_bucket, previous, current + 1)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class RedisBackend:
+    """
+    The same counters kept in Redis, so every worker shares one view
+    - Needs the redis package; each hit is one EVALSHA round trip
+    - Keys expire two windows after their last hit
+    """
+
+    SCRIPT = """
+    local now_bucket = tonumber(ARGV[1])
+    local elapsed = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    local ttl = tonumber(ARGV[4])
+    local entry = redis.call('HMGET', KEYS[1], 'b', 'p', 'c')
+    local bucket, previous, current = tonumber(entry[1]), tonumber(entry[2]) or 0, tonumber(entry[3]) or 0
+    if bucket == nil then
+        previous, current = 0, 0
+    elseif bucket == now_bucket - 1 then
+        previous, current = current, 0
+    elseif bucket ~= now_bucket then
+        previous, current = 0, 0
+    end
+    local allowed = previous * (1 - elapsed) + current < limit
+    if allowed then
+        current = current + 1
+    end
+    redis.call('HSET', KEYS[1], 'b', now_bucket, 'p', previous, 'c', current)
+    redis.call('EXPIRE', KEYS[1], ttl)
+    if allowed then
+        return {1, previous, current}
+    end
+    return {0, previous, current}
+    """
+
+    def __init__(self, url=None, client=None, prefix='login-throttle:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def hit(self, key, limit, window, now):
+        now_bucket, offset = divmod(now, window)
+        elapsed = offset / window
+        allowed, previous, current = self._script(
+            keys=[self.prefix + key],
+            args=[int(now_bucket), repr(elapsed), limit, int(window * 2)]
+        )
+        if allowed:
+            return 0
+        return max(_retry_after(int(previous), int(current), limit, elapsed) * window, 1)
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class LoginThrottle:
+    """
+    Sliding-window limit on login attempts, checked before any query or bcrypt
+    - LOGIN_THROTTLE_PER_ACCOUNT attempts per window for one IP and email pair
+    - LOGIN_THROTTLE_PER_IP attempts per window from one IP, across emails
+    - A successful login clears its IP and email pair
+    - LOGIN_THROTTLE_REDIS_URL shares the counters between workers; without
+      it each worker counts on its own (MemoryBackend)
+    """
+
+    def __init__(self):
+        self.window = 60
+        self.per_account = 5
+        self.per_ip = 30
+        self.enabled = True
+        self.backend = MemoryBackend()
+
+    def init_app(self, app):
+        config = app.config
+        self.window = config.setdefault('LOGIN_THROTTLE_WINDOW', self.window)
+        self.per_account = config.setdefault('LOGIN_THROTTLE_PER_ACCOUNT', self.per_account)
+        self.per_ip = config.setdefault('LOGIN_THROTTLE_PER_IP', self.per_ip)
+        self.enabled = config.setdefault('LOGIN_THROTTLE_ENABLED', self.enabled)
+        max_keys = config.setdefault('LOGIN_THROTTLE_MAX_KEYS', 100000)
+        redis_url = config.setdefault('LOGIN_THROTTLE_REDIS_URL', None)
+        self.backend = RedisBackend(redis_url) if redis_url else MemoryBackend(max_keys)
+
+    def check(self, scope, ip, username):
+        """
+        Count an attempt; returns 0 when it may proceed, else the seconds to
+        wait (for a Retry-After header)
+        """
+        if not self.enabled:
+            return 0
+        now = time.time()
+        account_key = f'{scope}:{ip}:{(username or "").strip().lower()}'
+        wait = self.backend.hit(account_key, self.per_account, self.window, now)
+        if not wait:
+            wait = self.backend.hit(f'{scope}:{ip}', self.per_ip, self.window, now)
+        return math.ceil(wait) if wait else 0
+
+    def succeeded(self, scope, ip, username):
+        if self.enabled:
+            self.backend.reset(f'{scope}:{ip}:{(username or "").strip().lower()}')
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,39 @@
+# benchmark_login_throttle.py - Measure the per-request cost of the login throttle
+import os
+import sys
+import time
+from app.throttle import LoginThrottle, MemoryBackend, RedisBackend
+
+
+def run(throttle, attempts, ips, emails):
+    """Time throttle.check() over a stuffing-style mix of IPs and emails"""
+    started = time.perf_counter()
+    rejected = 0
+    for i in range(attempts):
+        if throttle.check('customer', f'10.0.{i % ips // 256}.{i % 256}', f'user{i % emails}@example.com'):
+            rejected += 1
+    elapsed = time.perf_counter() - started
+    return elapsed / attempts * 1e6, rejected
+
+
+def benchmark_login_throttle(attempts=200000):
+    """Print microseconds per check for the memory backend (and Redis if configured)"""
+    print("⏱️  Login throttle overhead per request")
+    cases = [
+        ('memory, 1k IPs x 50k emails', MemoryBackend(100000), 1000, 50000),
+        ('memory, at the 10k key limit', MemoryBackend(10000), 5000, 200000)
+    ]
+    redis_url = os.getenv('LOGIN_THROTTLE_REDIS_URL')
+    if redis_url:
+        cases.append(('redis, 1k IPs x 50k emails', RedisBackend(redis_url), 1000, 50000))
+
+    for label, backend, ips, emails in cases:
+        throttle = LoginThrottle()
+        throttle.backend = backend
+        count = attempts if isinstance(backend, MemoryBackend) else attempts // 20
+        per_check, rejected = run(throttle, count, ips, emails)
+        print(f" {label}: {per_check:.2f} µs/check, {rejected}/{count} rejected")
+
+
+if __name__ == '__main__':
+    benchmark_login_throttle(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
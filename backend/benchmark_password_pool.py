@@ -0,0 +1,63 @@
+# benchmark_password_pool.py - Compare login throughput with inline bcrypt and the process pool
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from app.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def run(hasher, hashed, logins, threads):
+    """
+    check_password from `threads` request threads, as a threaded server would;
+    returns (logins per second, p50 ms, p95 ms, rejected as busy)
+    """
+    def login(_):
+        started = time.perf_counter()
+        try:
+            hasher.check_password('correct horse', hashed)
+        except PasswordHasherBusy:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(ms for ms in results if ms is not None)
+    if not latencies:
+        return 0, 0, 0, logins
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return len(latencies) / elapsed, p50, p95, logins - len(latencies)
+
+
+def benchmark_password_pool():
+    """Print login throughput and latency for inline bcrypt and pools of several sizes"""
+    parser = argparse.ArgumentParser(description='Benchmark bcrypt inline against the password process pool')
+    parser.add_argument('--logins', type=int, default=200, help='Password checks per case (default: 200)')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent request threads (default: 16)')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost of the stored hash (default: 12)')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 2
+    hashed = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(args.rounds)).decode('utf-8')
+    print(f"⏱️  Login password checks, cost {args.rounds}, {args.threads} request threads, {cpus} CPUs")
+
+    for workers in sorted({0, max(1, cpus // 2), cpus}):
+        hasher = PasswordHasher()
+        hasher.rounds = args.rounds
+        hasher.workers = workers
+        hasher.queue = args.threads  # Room for every thread, so nothing is rejected as busy
+        hasher.timeout = 60
+        if workers:
+            run(hasher, hashed, workers, workers)  # Start the worker processes before timing
+        per_second, p50, p95, busy = run(hasher, hashed, args.logins, args.threads)
+        hasher.shutdown()
+        label = 'inline' if not workers else f'pool of {workers}'
+        print(f" {label}: {per_second:.1f} logins/s, p50 {p50:.0f} ms, p95 {p95:.0f} ms, {busy} busy")
+
+
+if __name__ == '__main__':
+    benchmark_password_pool()
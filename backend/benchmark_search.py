@@ -0,0 +1,104 @@
+# benchmark_search.py - Compare leading-wildcard ILIKE search with the in-process SearchIndex
+import argparse
+import random
+import time
+from sqlalchemy import func, insert, or_
+from app import create_app
+from app.models import db, Product
+from app.search import SearchIndex
+
+FLAVOURS = ['mocha', 'caramel', 'vanilla', 'hazelnut', 'matcha', 'chocolate', 'cinnamon', 'pistachio',
+            'almond', 'coconut', 'honey', 'maple', 'lavender', 'raspberry', 'mint', 'toffee']
+DRINKS = ['latte', 'espresso', 'cappuccino', 'frappe', 'shake', 'americano', 'macchiato', 'cortado',
+          'smoothie', 'tea', 'cold brew', 'flat white']
+STYLES = ['iced', 'hot', 'salted', 'spiced', 'double', 'oat', 'skinny', 'signature', 'house', 'seasonal']
+WORDS = ['rich', 'smooth', 'creamy', 'bold', 'sweet', 'roasted', 'blend', 'milk', 'foam', 'syrup',
+         'topped', 'whipped', 'cream', 'beans', 'single', 'origin', 'chilled', 'steamed', 'dark', 'light']
+
+# (label, search text); the typo only matches through the index's fuzzy lookup
+QUERIES = [
+    ('single word', 'mocha'),
+    ('two words', 'caramel latte'),
+    ('prefix', 'pist'),
+    ('description word', 'whipped'),
+    ('typo', 'expresso')
+]
+
+PREFIX = 'Bench '
+
+
+def seed_products(count, seed=1):
+    """Insert synthetic products until the catalog has `count` benchmark rows"""
+    existing = db.session.query(func.count(Product.product_id)).filter(Product.name.like(PREFIX + '%')).scalar()
+    rng = random.Random(seed)
+    rows = []
+    for i in range(existing, count):
+        name = f'{PREFIX}{rng.choice(STYLES)} {rng.choice(FLAVOURS)} {rng.choice(DRINKS)} {i}'
+        description = ' '.join(rng.choice(WORDS + FLAVOURS) for _ in range(12))
+        rows.append({'name': name, 'description': description, 'price': rng.randint(300, 900), 'stock_quantity': 100})
+        if len(rows) == 5000:
+            db.session.execute(insert(Product), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Product), rows)
+    db.session.commit()
+    return count - existing if count > existing else 0
+
+
+def ilike_search(text):
+    """The original /api/products?search= path: ILIKE on name and description, then to_dict()"""
+    products = Product.eager_query().filter(or_(
+        Product.name.ilike(f'%{text}%'),
+        Product.description.ilike(f'%{text}%')
+    )).all()
+    return [product.to_dict() for product in products]
+
+
+def index_search(index, products_by_id, text):
+    """The current path: inverted index lookup over the cached catalog"""
+    return [products_by_id[pid] for pid in index.search(text)]
+
+
+def timed(fn, repeat):
+    """(milliseconds per call, last result)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def benchmark_search():
+    """Print per-query latency of both search paths over a large synthetic catalog"""
+    parser = argparse.ArgumentParser(description='Benchmark ILIKE product search against the SearchIndex')
+    parser.add_argument('--products', type=int, default=50000, help='Benchmark products in the catalog (default: 50000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query and path (default: 5)')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print("⏱️  Product search (use a scratch database, e.g. DATABASE_URL=sqlite:///bench.db)")
+        added = seed_products(args.products)
+        if added:
+            print(f" Seeded {added} benchmark products")
+
+        started = time.perf_counter()
+        products = [product.to_dict() for product in Product.eager_query().order_by(Product.product_id).all()]
+        loaded = time.perf_counter()
+        index = SearchIndex(products)
+        built = time.perf_counter()
+        products_by_id = {product['product_id']: product for product in products}
+        print(f" Catalog of {len(products)} products: load {(loaded - started) * 1000:.0f} ms, "
+              f"index build {(built - loaded) * 1000:.0f} ms (once per snapshot)")
+
+        for label, text in QUERIES:
+            ilike_ms, ilike_hits = timed(lambda: ilike_search(text), args.repeat)
+            index_ms, index_hits = timed(lambda: index_search(index, products_by_id, text), args.repeat)
+            db.session.rollback()
+            speedup = ilike_ms / index_ms if index_ms else float('inf')
+            print(f" {label} '{text}': ILIKE {ilike_ms:.1f} ms ({len(ilike_hits)} hits), "
+                  f"index {index_ms:.2f} ms ({len(index_hits)} hits), {speedup:.0f}x")
+
+
+if __name__ == '__main__':
+    benchmark_search()
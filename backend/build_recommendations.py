@@ -0,0 +1,31 @@
+# build_recommendations.py - Update the "customers also bought" recommendations
+import argparse
+from app import create_app
+from app.recommendations import build
+
+
+def build_recommendations():
+    """Fold new orders into the co-purchase counts and republish the top-K table"""
+    parser = argparse.ArgumentParser(description='Build co-purchase recommendations from order history')
+    parser.add_argument('--full', action='store_true', help='Discard the stored counts and recount every order')
+    parser.add_argument('--top-k', type=int, help='Recommendations kept per product (default: RECOMMENDATIONS_TOP_K)')
+    parser.add_argument('--chunk-orders', type=int, default=100000, help='Orders per transaction (default: 100000)')
+    parser.add_argument('--settle-minutes', type=int, default=5, help='Leave orders newer than this for the next run (default: 5)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Building co-purchase recommendations...")
+        result = build(
+            full=args.full,
+            top_k_size=args.top_k or app.config['RECOMMENDATIONS_TOP_K'],
+            chunk_orders=args.chunk_orders,
+            settle_minutes=args.settle_minutes,
+            log=lambda msg: print(f"   {msg}")
+        )
+        print(f" Done! {result['line_items']} new line items, {result['recommendations']} recommendations published.")
+
+
+if __name__ == '__main__':
+    build_recommendations()
@@ -0,0 +1,83 @@
+# check_order_concurrency.py - Fail if concurrent checkouts can oversell a product
+import argparse
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+from app import create_app
+from app.models import db, Customer, Product, OrderDetails
+
+
+def place_orders(app, token, product_id, quantity, orders, threads):
+    """POST orders in parallel; returns the status code of each"""
+    def place(_):
+        response = app.test_client().post(
+            '/api/orders',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'items': [{'product_id': product_id, 'quantity': quantity}], 'payment_method': 'Cash'}
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(place, range(orders)))
+
+
+def check_order_concurrency():
+    """Fire parallel orders at a low-stock product; exit 1 on negative stock or oversell"""
+    parser = argparse.ArgumentParser(description='Check that concurrent orders cannot oversell stock')
+    parser.add_argument('--orders', type=int, default=50, help='Orders placed (default: 50)')
+    parser.add_argument('--threads', type=int, default=16, help='Orders in flight at once (default: 16)')
+    parser.add_argument('--stock', type=int, default=10, help='Starting stock of the product (default: 10)')
+    parser.add_argument('--quantity', type=int, default=1, help='Units per order (default: 1)')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print("🔍 Checking concurrent checkouts (use a scratch database, the test orders are kept)...")
+        run_id = uuid.uuid4().hex[:8]
+        customer = Customer(name='Concurrency Check', email=f'concurrency-{run_id}@example.com',
+                            password='!', reward_points=0)
+        product = Product(name=f'Concurrency Check {run_id}', price=100, stock_quantity=args.stock)
+        db.session.add_all([customer, product])
+        db.session.commit()
+        customer_id, product_id = customer.customer_id, product.product_id
+        token = create_access_token(identity=str(customer_id))
+
+    statuses = place_orders(app, token, product_id, args.quantity, args.orders, args.threads)
+
+    with app.app_context():
+        stock = db.session.get(Product, product_id).stock_quantity
+        sold = db.session.query(func.coalesce(func.sum(OrderDetails.quantity), 0))\
+                         .filter(OrderDetails.product_id == product_id)\
+                         .scalar()
+
+        placed = statuses.count(201)
+        rejected = statuses.count(400)
+        errors = len(statuses) - placed - rejected
+        expected = min(args.orders, args.stock // args.quantity)
+        print(f" {placed} placed, {rejected} rejected for stock, {errors} errors; "
+              f"stock {args.stock} -> {stock}, {sold} units in order lines")
+
+        failures = []
+        if stock < 0:
+            failures.append(f'stock went negative ({stock})')
+        if sold > args.stock:
+            failures.append(f'{sold} units sold from a stock of {args.stock}')
+        if sold != args.stock - stock or sold != placed * args.quantity:
+            failures.append('order lines, placed orders and the stock decrement disagree')
+        if errors:
+            failures.append(f'{errors} orders failed with an error instead of a stock rejection')
+        elif placed != expected:
+            failures.append(f'{placed} orders placed, expected {expected}')
+
+        if failures:
+            for failure in failures:
+                print(f" ❌ {failure}")
+            sys.exit(1)
+        print(" ✅ No oversell: every unit sold was in stock.")
+
+
+if __name__ == '__main__':
+    check_order_concurrency()
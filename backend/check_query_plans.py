@@ -0,0 +1,47 @@
+# check_query_plans.py - Fail if an endpoint's queries read a whole table
+import argparse
+import sys
+from app import create_app
+from app.query_plans import check_plans, PlanCheckError
+
+
+def check_query_plans():
+    """Call each checked endpoint, EXPLAIN every SELECT it ran; exit 1 on a full table scan"""
+    parser = argparse.ArgumentParser(description='Check endpoint query plans for full table scans')
+    parser.add_argument('--verbose', action='store_true', help='Print every query and plan, not only failing ones')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("🔍 Checking query plans (use a database with production-like row counts)...")
+        failures = 0
+        try:
+            results = check_plans(app)
+        except PlanCheckError as e:
+            print(f" ❌ {e}")
+            sys.exit(1)
+        for endpoint, status, plans in results:
+            scanned = sorted({table for sql, plan, tables in plans for table in tables})
+            if status >= 500 or 300 <= status < 400:
+                failures += 1
+                print(f" ❌ {endpoint}: returned {status}")
+            elif scanned:
+                failures += 1
+                print(f" ❌ {endpoint}: full scan of {', '.join(scanned)}")
+            else:
+                print(f" ✅ {endpoint} ({len(plans)} queries)")
+            for sql, plan, tables in plans:
+                if tables or args.verbose:
+                    print(f"      {' '.join(sql.split())}")
+                    for step in plan:
+                        print(f"        {step}")
+    
+        if failures:
+            print(f" {failures} endpoints failed the check.")
+            sys.exit(1)
+        print(" All query plans use an index.")
+
+
+if __name__ == '__main__':
+    check_query_plans()
@@ -0,0 +1,107 @@
+# check_reward_points.py - Fail if concurrent point changes let balances drift from the ledger
+import argparse
+import random
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from app import create_app
+from app.models import db, Customer, RewardTransaction
+from app.points import change_points, InsufficientPoints
+from app.ledger import reconcile
+
+
+def change_concurrently(app, customer_ids, changes, threads, seed):
+    """
+    Run change_points from many threads, each call in its own transaction;
+    returns (applied, rejected for insufficient points, errors)
+    """
+    rng = random.Random(seed)
+    plan = [(rng.choice(customer_ids), rng.choice((0, 10, 50, 200)), rng.choice((0, 0, 100, 150)))
+            for _ in range(changes)]
+
+    def change(entry):
+        customer_id, earned, redeemed = entry
+        with app.app_context():
+            try:
+                change_points(customer_id, [
+                    (0, redeemed, 'Concurrency check redemption'),
+                    (earned, 0, 'Concurrency check accrual')
+                ])
+                db.session.commit()
+                return 'applied'
+            except InsufficientPoints:
+                db.session.rollback()
+                return 'rejected'
+            except Exception:
+                db.session.rollback()
+                return 'error'
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(change, plan))
+    return outcomes.count('applied'), outcomes.count('rejected'), outcomes.count('error')
+
+
+def check_reward_points():
+    """Stress change_points from parallel threads; exit 1 on a negative or drifted balance"""
+    parser = argparse.ArgumentParser(description='Check reward balances against the ledger under concurrent changes')
+    parser.add_argument('--customers', type=int, default=5, help='Customers whose points are changed (default: 5)')
+    parser.add_argument('--changes', type=int, default=500, help='change_points calls (default: 500)')
+    parser.add_argument('--threads', type=int, default=16, help='Calls in flight at once (default: 16)')
+    parser.add_argument('--starting-points', type=int, default=1000, help='Points each customer starts with (default: 1000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the changes (default: 1)')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print("🔍 Checking reward balances under concurrent changes (use a scratch database)...")
+        run_id = uuid.uuid4().hex[:8]
+        customers = [Customer(name='Points Check', email=f'points-{run_id}-{i}@example.com', password='!', reward_points=0)
+                     for i in range(args.customers)]
+        db.session.add_all(customers)
+        db.session.flush()
+        customer_ids = [customer.customer_id for customer in customers]
+        for customer_id in customer_ids:
+            change_points(customer_id, [(args.starting_points, 0, 'Concurrency check starting points')])
+        db.session.commit()
+
+    applied, rejected, errors = change_concurrently(app, customer_ids, args.changes, args.threads, args.seed)
+    print(f" {applied} changes applied, {rejected} rejected for insufficient points, {errors} errors")
+
+    with app.app_context():
+        net = func.coalesce(func.sum(
+            func.coalesce(RewardTransaction.points_earned, 0) - func.coalesce(RewardTransaction.points_redeemed, 0)
+        ), 0)
+        ledger = dict(db.session.query(RewardTransaction.customer_id, net)
+                                .filter(RewardTransaction.customer_id.in_(customer_ids))
+                                .group_by(RewardTransaction.customer_id)
+                                .all())
+        balances = dict(db.session.query(Customer.customer_id, Customer.reward_points)
+                                  .filter(Customer.customer_id.in_(customer_ids))
+                                  .all())
+
+        failures = []
+        for customer_id in customer_ids:
+            balance, expected = balances[customer_id] or 0, int(ledger.get(customer_id, 0))
+            if balance < 0:
+                failures.append(f'customer #{customer_id} has a negative balance ({balance})')
+            if balance != expected:
+                failures.append(f'customer #{customer_id}: balance {balance}, ledger {expected}')
+
+        summary = reconcile(log=lambda msg: None)
+        drifted = [d for d in summary['drift'] if d['customer_id'] in balances]
+        if drifted:
+            failures.append(f'reconcile_rewards reports drift for {len(drifted)} checked customers')
+        if errors:
+            failures.append(f'{errors} changes failed with an error')
+
+        if failures:
+            for failure in failures:
+                print(f" ❌ {failure}")
+            sys.exit(1)
+        print(f" ✅ {len(customer_ids)} balances match the ledger ({summary['drifted']} drifted customers in the whole table).")
+
+
+if __name__ == '__main__':
+    check_reward_points()
@@ -0,0 +1,30 @@
+# expire_points.py - Expire old reward points and recalculate customer tiers
+import argparse
+from app import create_app
+from app.loyalty import run
+
+
+def expire_points():
+    """Expire points past POINTS_EXPIRY_MONTHS and re-tier customers by recent spend"""
+    parser = argparse.ArgumentParser(description='Expire old reward points and recalculate loyalty tiers')
+    parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint and start from the first customer')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Customers per transaction (default: 1000)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Expiring reward points and recalculating tiers...")
+        totals = run(
+            expiry_months=app.config['POINTS_EXPIRY_MONTHS'],
+            tier_months=app.config['TIER_WINDOW_MONTHS'],
+            chunk_size=args.chunk_size,
+            restart=args.restart,
+            log=lambda msg: print(f"   {msg}")
+        )
+        print(f" Done! {totals['customers']} customers, {totals['points_expired']} points expired "
+              f"for {totals['customers_expired']}, {totals['tiers_changed']} tier changes.")
+
+
+if __name__ == '__main__':
+    expire_points()
@@ -1,4 +1,7 @@
 # init_db.py - Database initialization script
+import os
+from flask_migrate import stamp
+from sqlalchemy import inspect
 from app import create_app
 from app.models import db, Category, Product, Admin
 import bcrypt
@@ -9,7 +12,12 @@ def init_database():
     
     with app.app_context():
         print("🔄 Creating database tables...")
+        existing = inspect(db.engine).has_table('Orders')
         db.create_all()
+        if not existing:
+            # A fresh create_all already has the current schema, so mark
+            # every migration as applied; older databases use `flask db upgrade`
+            stamp(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
         
         # Check if data already exists
         if Category.query.first():
@@ -108,7 +116,7 @@ def init_database():
         
         print("👤 Creating admin account...")
         # Create default admin (username: admin, password: admin123)
-        hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt(app.config['BCRYPT_ROUNDS'])).decode('utf-8')
         admin = Admin(
             username='admin',
             password=hashed_password,
@@ -0,0 +1,198 @@
+"""Baseline schema (the tables the app shipped with before migrations)
+
+Revision ID: 1b6d0e4c8a27
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+Databases created before migrations already have these tables, so each one
+is only created when it is missing; `flask db upgrade` then works on both
+old and empty databases. The tables added alongside the first revisions
+(ledger snapshots, rollups, idempotency records, recommendations, job
+checkpoints and customer segments) are created here the same way; columns
+added to existing tables come in later revisions.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6d0e4c8a27'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'Customer' not in existing:
+        op.create_table(
+            'Customer',
+            sa.Column('customer_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('name', sa.String(100), nullable=False),
+            sa.Column('email', sa.String(100), nullable=False, unique=True),
+            sa.Column('password', sa.String(255), nullable=False),
+            sa.Column('phone', sa.String(20)),
+            sa.Column('address', sa.String(255)),
+            sa.Column('reward_points', sa.Integer())
+        )
+    if 'Category' not in existing:
+        op.create_table(
+            'Category',
+            sa.Column('category_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('category_name', sa.String(100), nullable=False, unique=True)
+        )
+    if 'Admin' not in existing:
+        op.create_table(
+            'Admin',
+            sa.Column('admin_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('username', sa.String(100), nullable=False, unique=True),
+            sa.Column('password', sa.String(255), nullable=False),
+            sa.Column('role', sa.Enum('Manager', 'Staff'))
+        )
+    if 'Product' not in existing:
+        op.create_table(
+            'Product',
+            sa.Column('product_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('name', sa.String(100), nullable=False),
+            sa.Column('category_id', sa.Integer(), sa.ForeignKey('Category.category_id', onupdate='CASCADE', ondelete='SET NULL')),
+            sa.Column('description', sa.Text()),
+            sa.Column('price', sa.Numeric(10, 2), nullable=False),
+            sa.Column('stock_quantity', sa.Integer()),
+            sa.Column('image_url', sa.String(255))
+        )
+    if 'Orders' not in existing:
+        op.create_table(
+            'Orders',
+            sa.Column('order_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('customer_id', sa.Integer(), sa.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('order_date', sa.DateTime()),
+            sa.Column('total_amount', sa.Numeric(10, 2), nullable=False),
+            sa.Column('status', sa.Enum('Pending', 'Completed', 'Cancelled'))
+        )
+    if 'OrderDetails' not in existing:
+        op.create_table(
+            'OrderDetails',
+            sa.Column('order_detail_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('order_id', sa.Integer(), sa.ForeignKey('Orders.order_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='RESTRICT'), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('subtotal', sa.Numeric(10, 2), nullable=False)
+        )
+    if 'Payment' not in existing:
+        op.create_table(
+            'Payment',
+            sa.Column('payment_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('order_id', sa.Integer(), sa.ForeignKey('Orders.order_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False, unique=True),
+            sa.Column('payment_date', sa.DateTime()),
+            sa.Column('payment_method', sa.Enum('CreditCard', 'Cash', 'Online'), nullable=False),
+            sa.Column('amount', sa.Numeric(10, 2), nullable=False),
+            sa.Column('status', sa.Enum('Paid', 'Pending', 'Refunded'))
+        )
+    if 'Review' not in existing:
+        op.create_table(
+            'Review',
+            sa.Column('review_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('customer_id', sa.Integer(), sa.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('rating', sa.Integer(), nullable=False),
+            sa.Column('comment', sa.Text()),
+            sa.Column('review_date', sa.DateTime()),
+            sa.CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range')
+        )
+    if 'RewardTransaction' not in existing:
+        op.create_table(
+            'RewardTransaction',
+            sa.Column('reward_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('customer_id', sa.Integer(), sa.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('points_earned', sa.Integer()),
+            sa.Column('points_redeemed', sa.Integer()),
+            sa.Column('transaction_date', sa.DateTime()),
+            sa.Column('description', sa.String(255))
+        )
+
+    if 'RewardSnapshot' not in existing:
+        op.create_table(
+            'RewardSnapshot',
+            sa.Column('customer_id', sa.Integer(), sa.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('last_reward_id', sa.Integer(), primary_key=True),
+            sa.Column('balance', sa.Integer(), nullable=False),
+            sa.Column('taken_at', sa.DateTime(), nullable=False)
+        )
+    if 'DailySalesRollup' not in existing:
+        op.create_table(
+            'DailySalesRollup',
+            sa.Column('rollup_date', sa.Date(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('status', sa.Enum('Pending', 'Completed', 'Cancelled'), primary_key=True),
+            sa.Column('category_id', sa.Integer()),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Numeric(12, 2), nullable=False),
+            sa.Column('order_count', sa.Integer(), nullable=False)
+        )
+    if 'DailyOrderRollup' not in existing:
+        op.create_table(
+            'DailyOrderRollup',
+            sa.Column('rollup_date', sa.Date(), primary_key=True),
+            sa.Column('status', sa.Enum('Pending', 'Completed', 'Cancelled'), primary_key=True),
+            sa.Column('payment_method', sa.String(20), primary_key=True),
+            sa.Column('revenue', sa.Numeric(12, 2), nullable=False),
+            sa.Column('order_count', sa.Integer(), nullable=False)
+        )
+    if 'IdempotencyRecord' not in existing:
+        op.create_table(
+            'IdempotencyRecord',
+            sa.Column('scope', sa.String(100), primary_key=True),
+            sa.Column('idempotency_key', sa.String(255), primary_key=True),
+            sa.Column('request_hash', sa.String(64), nullable=False),
+            sa.Column('status', sa.Enum('Processing', 'Completed'), nullable=False),
+            sa.Column('response_code', sa.Integer()),
+            sa.Column('response_body', sa.Text()),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False)
+        )
+        op.create_index('ix_IdempotencyRecord_expires_at', 'IdempotencyRecord', ['expires_at'])
+    if 'CoPurchaseCount' not in existing:
+        op.create_table(
+            'CoPurchaseCount',
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('other_product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('order_count', sa.Integer(), nullable=False)
+        )
+    if 'ProductRecommendation' not in existing:
+        op.create_table(
+            'ProductRecommendation',
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('rank', sa.Integer(), primary_key=True),
+            sa.Column('recommended_product_id', sa.Integer(), sa.ForeignKey('Product.product_id', onupdate='CASCADE', ondelete='CASCADE'), nullable=False),
+            sa.Column('score', sa.Float(), nullable=False)
+        )
+    if 'JobCheckpoint' not in existing:
+        op.create_table(
+            'JobCheckpoint',
+            sa.Column('job_name', sa.String(50), primary_key=True),
+            sa.Column('last_id', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime())
+        )
+    if 'CustomerSegment' not in existing:
+        op.create_table(
+            'CustomerSegment',
+            sa.Column('customer_id', sa.Integer(), sa.ForeignKey('Customer.customer_id', onupdate='CASCADE', ondelete='CASCADE'), primary_key=True),
+            sa.Column('last_order_date', sa.DateTime()),
+            sa.Column('recency_days', sa.Integer()),
+            sa.Column('frequency', sa.Integer(), nullable=False),
+            sa.Column('monetary', sa.Numeric(12, 2), nullable=False),
+            sa.Column('r_score', sa.Integer(), nullable=False),
+            sa.Column('f_score', sa.Integer(), nullable=False),
+            sa.Column('m_score', sa.Integer(), nullable=False),
+            sa.Column('segment', sa.String(30), nullable=False),
+            sa.Column('computed_at', sa.DateTime(), nullable=False)
+        )
+        op.create_index('ix_CustomerSegment_monetary', 'CustomerSegment', ['monetary'])
+        op.create_index('ix_CustomerSegment_segment', 'CustomerSegment', ['segment'])
+
+
+def downgrade():
+    # The baseline is where migrations start; dropping it would drop all data
+    pass
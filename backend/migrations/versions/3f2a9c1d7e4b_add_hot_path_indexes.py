@@ -0,0 +1,90 @@
+"""Add indexes for the hot filters and sorts and a unique review per customer and product
+
+Revision ID: 3f2a9c1d7e4b
+Revises: 1b6d0e4c8a27
+Create Date: 2026-10-16 10:00:00.000000
+
+Databases created by init_db.py already have these (init_db stamps them at
+head); run `flask db upgrade` on databases created before this revision.
+Duplicate reviews are copied to RemovedDuplicateReview and logged before
+they are deleted; downgrade puts them back.
+
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7e4b'
+down_revision = '1b6d0e4c8a27'
+branch_labels = None
+depends_on = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+INDEXES = (
+    ('ix_Orders_customer_id_order_date', 'Orders', ['customer_id', 'order_date']),
+    ('ix_Orders_status_order_date', 'Orders', ['status', 'order_date']),
+    ('ix_Orders_order_date', 'Orders', ['order_date']),
+    ('ix_Review_product_id_review_date', 'Review', ['product_id', 'review_date']),
+    ('ix_Review_review_date', 'Review', ['review_date']),
+    ('ix_RewardTransaction_customer_id_transaction_date', 'RewardTransaction', ['customer_id', 'transaction_date']),
+    ('ix_Product_category_id_price', 'Product', ['category_id', 'price'])
+)
+
+REVIEW_COLUMNS = 'review_id, customer_id, product_id, rating, comment, review_date'
+
+# Every review except the first one per customer and product
+DUPLICATES = (
+    'SELECT ' + REVIEW_COLUMNS + ' FROM Review WHERE review_id NOT IN ('
+    'SELECT keep_id FROM (SELECT MIN(review_id) AS keep_id FROM Review GROUP BY customer_id, product_id) AS keepers)'
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    if 'uq_Review_customer_id_product_id' in {c['name'] for c in inspector.get_unique_constraints('Review')}:
+        return
+
+    # Keep the first review of any duplicate pair so the constraint can be
+    # added; the others are archived and logged first
+    op.create_table(
+        'RemovedDuplicateReview',
+        sa.Column('review_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('comment', sa.Text()),
+        sa.Column('review_date', sa.DateTime()),
+        sa.Column('removed_at', sa.DateTime(), nullable=False, server_default=sa.func.now())
+    )
+    op.execute(f'INSERT INTO RemovedDuplicateReview ({REVIEW_COLUMNS}) {DUPLICATES}')
+    removed = op.get_bind().execute(sa.text(
+        'SELECT review_id, customer_id, product_id, rating FROM RemovedDuplicateReview ORDER BY review_id'
+    )).all()
+    for review_id, customer_id, product_id, rating in removed:
+        log.info('Removing duplicate review #%s (customer %s, product %s, rating %s)',
+                 review_id, customer_id, product_id, rating)
+    if removed:
+        log.info('%s duplicate reviews copied to RemovedDuplicateReview', len(removed))
+        op.execute('DELETE FROM Review WHERE review_id IN (SELECT review_id FROM RemovedDuplicateReview)')
+
+    with op.batch_alter_table('Review') as batch_op:
+        batch_op.create_unique_constraint('uq_Review_customer_id_product_id', ['customer_id', 'product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('Review') as batch_op:
+        batch_op.drop_constraint('uq_Review_customer_id_product_id', type_='unique')
+
+    if sa.inspect(op.get_bind()).has_table('RemovedDuplicateReview'):
+        op.execute(f'INSERT INTO Review ({REVIEW_COLUMNS}) SELECT {REVIEW_COLUMNS} FROM RemovedDuplicateReview')
+        op.drop_table('RemovedDuplicateReview')
+
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,79 @@
+"""Add Product rating aggregates and Customer.tier, and backfill the ratings
+
+Revision ID: 5c7e1a9b3d42
+Revises: 8d4b7f2e6c90
+Create Date: 2026-10-17 10:00:00.000000
+
+Each column is only added when it is missing (create_app's db.create_all()
+already creates it on empty databases). The rating counters are then
+rebuilt from Review the way rebuild_ratings.py does; every customer starts
+in Bronze until expire_points.py recalculates tiers from recent spend.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e1a9b3d42'
+down_revision = '8d4b7f2e6c90'
+branch_labels = None
+depends_on = None
+
+STARS = range(1, 6)
+RATING_COLUMNS = ['rating_count', 'rating_sum'] + [f'rating_{star}' for star in STARS]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    product_columns = {column['name'] for column in inspector.get_columns('Product')}
+    customer_columns = {column['name'] for column in inspector.get_columns('Customer')}
+
+    added = [name for name in RATING_COLUMNS if name not in product_columns]
+    for name in added:
+        op.add_column('Product', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+    if 'tier' not in customer_columns:
+        op.add_column('Customer', sa.Column('tier', sa.String(20), nullable=False, server_default='Bronze'))
+
+    if added:
+        backfill_ratings()
+
+
+def backfill_ratings():
+    """Recompute every product's aggregates from the Review table"""
+    bind = op.get_bind()
+    review = sa.table('Review', sa.column('product_id'), sa.column('rating'))
+    product = sa.table('Product', sa.column('product_id'), *[sa.column(name) for name in RATING_COLUMNS])
+
+    stats = {}
+    rows = bind.execute(
+        sa.select(review.c.product_id, review.c.rating, sa.func.count())
+        .group_by(review.c.product_id, review.c.rating)
+    ).all()
+    for product_id, rating, count in rows:
+        row = stats.setdefault(product_id, {f'rating_{star}': 0 for star in STARS})
+        row[f'rating_{rating}'] = count
+
+    if stats:
+        bind.execute(
+            product.update()
+            .where(product.c.product_id == sa.bindparam('b_product_id'))
+            .values({name: sa.bindparam(f'b_{name}') for name in RATING_COLUMNS}),
+            [
+                dict(
+                    {f'b_{name}': count for name, count in row.items()},
+                    b_product_id=product_id,
+                    b_rating_count=sum(row[f'rating_{star}'] for star in STARS),
+                    b_rating_sum=sum(star * row[f'rating_{star}'] for star in STARS)
+                )
+                for product_id, row in stats.items()
+            ]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('Customer') as batch_op:
+        batch_op.drop_column('tier')
+    with op.batch_alter_table('Product') as batch_op:
+        for name in reversed(RATING_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,31 @@
+"""Index OrderDetails.order_id for loading the items of a page of orders
+
+Revision ID: 8d4b7f2e6c90
+Revises: 3f2a9c1d7e4b
+Create Date: 2026-10-17 09:00:00.000000
+
+MySQL already indexes the foreign key column, so the index is only created
+where no index starts with order_id.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b7f2e6c90'
+down_revision = '3f2a9c1d7e4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = sa.inspect(op.get_bind()).get_indexes('OrderDetails')
+    if not any(index['column_names'][:1] == ['order_id'] for index in indexes):
+        op.create_index('ix_OrderDetails_order_id', 'OrderDetails', ['order_id'])
+
+
+def downgrade():
+    indexes = sa.inspect(op.get_bind()).get_indexes('OrderDetails')
+    if 'ix_OrderDetails_order_id' in {index['name'] for index in indexes}:
+        op.drop_index('ix_OrderDetails_order_id', table_name='OrderDetails')
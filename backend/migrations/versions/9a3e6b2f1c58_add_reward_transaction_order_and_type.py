@@ -0,0 +1,88 @@
+"""Add RewardTransaction.order_id and entry_type, and backfill them
+
+Revision ID: 9a3e6b2f1c58
+Revises: 5c7e1a9b3d42
+Create Date: 2026-10-18 10:00:00.000000
+
+Each column is only added when it is missing (create_app's db.create_all()
+already creates it on empty databases). Existing rows are classified once
+from the descriptions their writers used; from here on the writers set both
+columns, so nothing reads the descriptions again.
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e6b2f1c58'
+down_revision = '5c7e1a9b3d42'
+branch_labels = None
+depends_on = None
+
+# (entry_type, description LIKE pattern) for rows that are not 'standard'
+ENTRY_TYPES = (
+    ('reversal', 'Points deducted due to Order #% cancellation'),
+    ('expiry', 'Points earned before % expired'),
+    ('adjustment', 'Reconciliation adjustment')
+)
+
+ORDER_NUMBER = re.compile(r'Order #(\d+)')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('RewardTransaction')}
+    indexes = {index['name'] for index in inspector.get_indexes('RewardTransaction')}
+
+    added = 'entry_type' not in columns
+    with op.batch_alter_table('RewardTransaction') as batch_op:
+        if 'order_id' not in columns:
+            batch_op.add_column(sa.Column('order_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_RewardTransaction_order_id', 'Orders', ['order_id'], ['order_id'],
+                                        onupdate='CASCADE', ondelete='SET NULL')
+        if added:
+            batch_op.add_column(sa.Column('entry_type', sa.String(20), nullable=False, server_default='standard'))
+        if 'ix_RewardTransaction_order_id' not in indexes:
+            batch_op.create_index('ix_RewardTransaction_order_id', ['order_id'])
+
+    if added:
+        backfill()
+
+
+def backfill():
+    """Set entry_type and order_id on the rows written before the columns existed"""
+    bind = op.get_bind()
+    reward = sa.table('RewardTransaction', sa.column('reward_id'), sa.column('order_id'),
+                      sa.column('entry_type'), sa.column('description'))
+    orders = sa.table('Orders', sa.column('order_id'))
+
+    for entry_type, pattern in ENTRY_TYPES:
+        bind.execute(reward.update().where(reward.c.description.like(pattern)).values(entry_type=entry_type))
+
+    existing = set(bind.execute(sa.select(orders.c.order_id)).scalars())
+    rows = bind.execute(
+        sa.select(reward.c.reward_id, reward.c.description)
+        .where(reward.c.order_id.is_(None), reward.c.description.like('%Order #%'))
+    ).all()
+    links = []
+    for reward_id, description in rows:
+        match = ORDER_NUMBER.search(description)
+        if match and int(match.group(1)) in existing:
+            links.append({'b_reward_id': reward_id, 'b_order_id': int(match.group(1))})
+    if links:
+        bind.execute(
+            reward.update()
+            .where(reward.c.reward_id == sa.bindparam('b_reward_id'))
+            .values(order_id=sa.bindparam('b_order_id')),
+            links
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('RewardTransaction') as batch_op:
+        batch_op.drop_index('ix_RewardTransaction_order_id')
+        batch_op.drop_constraint('fk_RewardTransaction_order_id', type_='foreignkey')
+        batch_op.drop_column('entry_type')
+        batch_op.drop_column('order_id')
@@ -0,0 +1,23 @@
+# rebuild_ratings.py - Backfill or rebuild the per-product rating aggregates
+from app import create_app
+from app.models import db
+from app.ratings import rebuild_ratings as rebuild
+
+
+def rebuild_ratings():
+    """Recompute Product.rating_count/rating_sum/rating_1..5 from Review"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding product rating aggregates...")
+        try:
+            count = rebuild()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        print(f" Ratings rebuilt for {count} reviewed products!")
+
+
+if __name__ == '__main__':
+    rebuild_ratings()
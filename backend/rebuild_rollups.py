@@ -0,0 +1,25 @@
+# rebuild_rollups.py - Backfill or rebuild the daily sales rollup tables
+import argparse
+from datetime import date
+from app import create_app
+from app.rollup import rebuild
+
+
+def rebuild_rollups():
+    """Recompute DailySalesRollup/DailyOrderRollup from Orders in day chunks"""
+    parser = argparse.ArgumentParser(description='Backfill or rebuild the daily sales rollups')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD), default: oldest order')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD), default: newest order')
+    parser.add_argument('--chunk-days', type=int, default=31, help='Days per transaction (default: 31)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Rebuilding daily sales rollups...")
+        rebuild(args.start, args.end, chunk_days=args.chunk_days, log=lambda msg: print(f"   {msg}"))
+        print(" Rollups rebuilt successfully!")
+
+
+if __name__ == '__main__':
+    rebuild_rollups()
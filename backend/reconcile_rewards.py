@@ -0,0 +1,32 @@
+# reconcile_rewards.py - Check reward balances against the ledger and take snapshots
+import argparse
+from app import create_app
+from app.ledger import reconcile
+
+
+def reconcile_rewards():
+    """Compare Customer.reward_points with earned - redeemed and optionally fix drift"""
+    parser = argparse.ArgumentParser(description='Reconcile reward balances with the RewardTransaction ledger')
+    parser.add_argument('--fix', action='store_true', help='Write the ledger balance back to drifted customers')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Customers per query and transaction (default: 5000)')
+    parser.add_argument('--snapshot-every', type=int, help='Ledger rows between balance snapshots (default: REWARD_SNAPSHOT_EVERY)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Reconciling reward balances...")
+        summary = reconcile(
+            fix=args.fix,
+            chunk_size=args.chunk_size,
+            snapshot_every=args.snapshot_every or app.config['REWARD_SNAPSHOT_EVERY'],
+            log=lambda msg: print(f"   {msg}")
+        )
+        for drift in summary['drift']:
+            print(f"   Customer #{drift['customer_id']}: balance {drift['reward_points']}, ledger {drift['ledger_balance']}")
+        print(f" Done! {summary['customers']} customers checked, {summary['drifted']} drifted, "
+              f"{summary['fixed']} fixed, {summary['snapshots']} snapshots taken.")
+
+
+if __name__ == '__main__':
+    reconcile_rewards()
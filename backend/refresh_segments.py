@@ -0,0 +1,25 @@
+# refresh_segments.py - Recompute RFM customer segments (run from cron)
+from app import create_app
+from app.models import db
+from app.segments import refresh_segments as refresh
+
+
+def refresh_segments():
+    """Replace the CustomerSegment table with fresh RFM scores"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Refreshing customer segments...")
+        try:
+            counts = refresh()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        for segment, count in sorted(counts.items()):
+            print(f"   {segment}: {count}")
+        print(" Customer segments refreshed!")
+
+
+if __name__ == '__main__':
+    refresh_segments()
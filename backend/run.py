@@ -2,7 +2,10 @@
 from app import create_app
 import os
 
-app = create_app()
+# bcrypt pool workers (app/passwords.py) are spawned, which re-imports this
+# script as __mp_main__; they only need bcrypt, not a second app and DB setup
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', 5000))
@@ -12,6 +12,8 @@ interface Product {
   image_url?: string;
   category_id?: number;
   stock_quantity?: number;
+  rating_count?: number;
+  average_rating?: number;
 }
 
 export default function MenuPage() {
@@ -116,8 +116,21 @@ export const ordersAPI = {
     points_to_redeem?: number;
   }) => {
     console.log('create order', data);
-    const response = await api.post('/orders', data);
-    return response.data;
+    // Same key on the retry so the backend returns the first order instead of placing a second one
+    const idempotencyKey =
+      typeof crypto !== 'undefined' && 'randomUUID' in crypto
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    const config = { headers: { 'Idempotency-Key': idempotencyKey } };
+    try {
+      const response = await api.post('/orders', data, config);
+      return response.data;
+    } catch (error: any) {
+      // Retry once if the request never got a response (e.g. dropped connection)
+      if (error.response) throw error;
+      const response = await api.post('/orders', data, config);
+      return response.data;
+    }
   },
 
   getAll: async () => {